@@ -0,0 +1,68 @@
+"""Compare les moteurs de rendu (moviepy / ffmpeg) sur des images et un audio synthétiques
+
+Usage:
+    python benchmarks/render_backends.py [--images 5] [--duration 60] [--runs 3] [--threads 2]
+"""
+import os
+import io
+import sys
+import time
+import base64
+import argparse
+import tempfile
+import statistics
+import subprocess
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.video_service import RENDER_BACKENDS
+
+
+def make_images(count: int) -> list:
+    """Images PNG 1024x1792 de couleurs différentes, encodées en base64 comme celles de l'IA"""
+    images = []
+    for i in range(count):
+        buffer = io.BytesIO()
+        Image.new("RGB", (1024, 1792), ((i * 53) % 256, (i * 97) % 256, (i * 151) % 256)).save(buffer, "PNG")
+        images.append({"data": base64.b64encode(buffer.getvalue()).decode(), "mime_type": "image/png"})
+    return images
+
+
+def make_audio(duration: int) -> bytes:
+    """MP3 synthétique de la durée demandée (comme la sortie TTS)"""
+    return subprocess.run(
+        ["ffmpeg", "-loglevel", "error", "-f", "lavfi", "-i", f"sine=frequency=440:duration={duration}",
+         "-f", "mp3", "pipe:1"],
+        check=True, capture_output=True
+    ).stdout
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=5)
+    parser.add_argument("--duration", type=int, default=60)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=2)
+    args = parser.parse_args()
+
+    images = make_images(args.images)
+    audio = make_audio(args.duration)
+    script_data = {"title": "benchmark"}
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        for name, render in RENDER_BACKENDS.items():
+            durations = []
+            for _ in range(args.runs):
+                started = time.perf_counter()
+                output_path = render(images, audio, script_data, output_dir, args.threads)
+                durations.append(time.perf_counter() - started)
+                size = os.path.getsize(output_path)
+                os.remove(output_path)
+
+            print(f"{name:8} médiane {statistics.median(durations):7.2f}s  "
+                  f"min {min(durations):7.2f}s  fichier {size / 1e6:.1f} Mo")
+
+
+if __name__ == "__main__":
+    main()
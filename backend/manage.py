@@ -0,0 +1,84 @@
+"""Commandes d'administration de la base
+
+Usage:
+    python manage.py rebuild-niches
+    python manage.py rebuild-learning-stats
+    python manage.py rebuild-virality-model
+    python manage.py ensure-indexes
+    python manage.py check-indexes
+"""
+import os
+import sys
+import asyncio
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from services.niche_analyzer import NicheAnalyzer
+from services.learning_service import LearningService
+from services.virality_model import ViralityModel
+from services.indexes import ensure_indexes as create_registered_indexes, check_indexes as report_indexes
+from utils import get_database_name
+
+load_dotenv()
+
+
+async def rebuild_niches(db):
+    """Recalcule entièrement les statistiques de niches"""
+    niches = await NicheAnalyzer(db).analyze_niches()
+    print(f"✓ {len(niches)} niches recalculées")
+
+
+async def rebuild_learning_stats(db):
+    """Recalcule les statistiques journalières d'apprentissage depuis learning_data"""
+    await LearningService(db).rebuild_stats()
+    buckets = await db.learning_stats.count_documents({})
+    print(f"✓ {buckets} agrégats journaliers recalculés")
+
+
+async def rebuild_virality_model(db):
+    """Réentraîne le modèle local de viralité depuis learning_data"""
+    samples = await ViralityModel(db).rebuild()
+    print(f"✓ Modèle de viralité entraîné sur {samples} vidéos")
+
+
+async def ensure_indexes(db):
+    """Crée les index déclarés dans le registre"""
+    created = await create_registered_indexes(db)
+    for collection, names in created.items():
+        print(f"✓ {collection}: {', '.join(names) or 'aucun index'}")
+
+
+async def check_indexes(db):
+    """Affiche les index manquants, hors registre ou inutilisés"""
+    report = await report_indexes(db)
+    for collection, status in report.items():
+        print(f"{collection}:")
+        for key in ("missing", "unregistered", "unused"):
+            print(f"  {key}: {', '.join(status[key]) or '-'}")
+
+
+COMMANDS = {
+    "rebuild-niches": rebuild_niches,
+    "rebuild-learning-stats": rebuild_learning_stats,
+    "rebuild-virality-model": rebuild_virality_model,
+    "ensure-indexes": ensure_indexes,
+    "check-indexes": check_indexes,
+}
+
+
+def main():
+    if len(sys.argv) != 2 or sys.argv[1] not in COMMANDS:
+        print(__doc__)
+        sys.exit(1)
+
+    mongo_url = os.getenv("MONGO_URL")
+    if not mongo_url:
+        raise ValueError("MONGO_URL environment variable is required")
+
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[get_database_name(mongo_url)]
+    asyncio.run(COMMANDS[sys.argv[1]](db))
+
+
+if __name__ == "__main__":
+    main()
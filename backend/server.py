@@ -1,26 +1,120 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, UploadFile, File, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict
 from datetime import datetime
 from motor.motor_asyncio import AsyncIOMotorClient
-import os
+from pymongo.errors import DuplicateKeyError
 from dotenv import load_dotenv
+import os
 import uuid
 import asyncio
 
 # Import services
 from services.ai_service import AIService
-from services.video_service import VideoService
+from services.video_service import VideoService, RENDER_BACKENDS, RENDER_PROFILES
+from services.render_engine import RenderEngine
+from services.video_delivery import VideoDelivery
 from services.niche_analyzer import NicheAnalyzer
 from services.learning_service import LearningService
-from utils import serialize_doc, serialize_docs
+from services.learning_analytics import LearningAnalytics
+from services.virality_model import ViralityModel
+from services.job_queue import JobQueue, QueueFullError
+from services.cache import build_response_cache
+from services.pipeline import GenerationPipeline
+from services.dashboard_service import DashboardService
+from services.indexes import ensure_indexes, check_indexes
+from services.trend_ingest import TrendIngestService, parse_json_array, iter_json_array, iter_ndjson, iter_csv
+from services.analytics_ingest import AnalyticsIngestService
+from services.batch_service import BatchService
+from utils import serialize_doc, serialize_docs, get_database_name, decode_cursor, paginate, ndjson_stream
 
 load_dotenv()
 
-app = FastAPI(title="TikTok Automation API")
+# Nombre maximum de vidéos par lot
+BATCH_MAX_VIDEOS = int(os.getenv("BATCH_MAX_VIDEOS", "100"))
+# Nombre maximum de scripts candidats par appel LLM
+SCRIPT_CANDIDATES_MAX = int(os.getenv("SCRIPT_CANDIDATES_MAX", "10"))
+
+# Services, créés au démarrage de l'application (voir lifespan) et jamais à l'import:
+# les processus de rendu (spawn) importent ce module sans recréer client Mongo,
+# services ni file de jobs
+client = db = None
+response_cache = virality_model = ai_service = render_engine = video_service = video_delivery = None
+learning_service = pipeline = niche_analyzer = dashboard_service = learning_analytics = None
+trend_ingest = analytics_ingest = job_queue = batch_service = None
+
+
+def init_services():
+    """Crée le client MongoDB et les services de l'application"""
+    global client, db, response_cache, virality_model, ai_service, render_engine, video_service
+    global video_delivery, learning_service, pipeline, niche_analyzer, dashboard_service
+    global learning_analytics, trend_ingest, analytics_ingest, job_queue, batch_service
+
+    # MongoDB setup
+    mongo_url = os.getenv("MONGO_URL")
+    if not mongo_url:
+        raise ValueError("MONGO_URL environment variable is required")
+
+    client = AsyncIOMotorClient(mongo_url)
+
+    # Extract database name from connection string
+    db = client[get_database_name(mongo_url)]
+
+    response_cache = build_response_cache(db)
+    virality_model = ViralityModel(db)
+    ai_service = AIService(cache=response_cache, virality_model=virality_model)
+    render_engine = RenderEngine()
+    video_service = VideoService(render_engine)
+    video_delivery = VideoDelivery()
+    learning_service = LearningService(db, virality_model)
+    pipeline = GenerationPipeline(db, ai_service, video_service, learning_service)
+    niche_analyzer = NicheAnalyzer(db)
+    dashboard_service = DashboardService(db)
+    learning_analytics = LearningAnalytics(db)
+    trend_ingest = TrendIngestService(db, niche_analyzer)
+    analytics_ingest = AnalyticsIngestService(db, niche_analyzer, learning_service)
+
+    # File de jobs: la génération tourne dans un pool de workers borné
+    job_queue = JobQueue(db)
+    job_queue.register("generate_video", run_generation)
+    job_queue.register("finalize_video", pipeline.finalize)
+    batch_service = BatchService(db, ai_service, job_queue)
+    job_queue.register("generate_batch", batch_service.run)
+
+
+async def run_generation(job, progress):
+    result = await pipeline.run(job, progress)
+    dashboard_service.invalidate()
+    return result
+
+
+async def backfill_learning_stats():
+    try:
+        if await learning_service.ensure_stats():
+            print("Learning stats rebuilt from learning_data")
+    except Exception as e:
+        print(f"Error rebuilding learning stats: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Démarrage: services, index, statistiques d'apprentissage et workers; arrêt: workers et rendu"""
+    init_services()
+    await ensure_indexes(db)
+    await backfill_learning_stats()
+    await job_queue.start()
+    try:
+        yield
+    finally:
+        await job_queue.stop()
+        render_engine.shutdown()
+        client.close()
+
+
+app = FastAPI(title="TikTok Automation API", lifespan=lifespan)
 
 # CORS configuration
 app.add_middleware(
@@ -31,26 +125,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# MongoDB setup
-MONGO_URL = os.getenv("MONGO_URL")
-if not MONGO_URL:
-    raise ValueError("MONGO_URL environment variable is required")
-
-client = AsyncIOMotorClient(MONGO_URL)
-
-# Extract database name from connection string
-from urllib.parse import urlparse
-parsed_url = urlparse(MONGO_URL)
-db_name = parsed_url.path.lstrip('/') or 'tiktok_automation'
-db = client[db_name]
-
-# Initialize services
-ai_service = AIService()
-video_service = VideoService()
-
-# Create generated_videos directory and mount it
-os.makedirs("/app/backend/generated_videos", exist_ok=True)
-app.mount("/videos", StaticFiles(directory="/app/backend/generated_videos"), name="videos")
 
 # Pydantic models
 class TrendInput(BaseModel):
@@ -75,6 +149,25 @@ class VideoGenerationRequest(BaseModel):
     inspiration_url: Optional[str] = None
     tone: str = "engageant"
     voice: str = "nova"
+    render_backend: Optional[str] = None  # moviepy ou ffmpeg (défaut: RENDER_BACKEND)
+    render_profile: Optional[str] = None  # draft, preview, production ou thumbnail (défaut: RENDER_PROFILE)
+    candidates: int = 1  # scripts candidats générés et notés en lot; seul le meilleur est rendu
+
+class BatchItem(BaseModel):
+    niche: str
+    tone: str = "engageant"
+    voice: str = "nova"
+    count: int = 1
+    candidates: Optional[int] = None  # scripts candidats (≥ count); les `count` meilleurs sont rendus
+
+class BatchGenerationRequest(BaseModel):
+    items: List[BatchItem]
+    render_backend: Optional[str] = None
+    render_profile: Optional[str] = None
+
+class FinalizeRequest(BaseModel):
+    render_profile: Optional[str] = None  # défaut: RENDER_PROFILE
+    render_backend: Optional[str] = None  # défaut: moteur utilisé pour la génération
 
 class FeedbackInput(BaseModel):
     video_id: str
@@ -86,6 +179,29 @@ class FeedbackInput(BaseModel):
 
 # Routes
 
+async def list_documents(key: str, collection, query: Dict, sort_field: str, limit: int,
+                         cursor: Optional[str], format: str):
+    """Réponse de liste paginée par curseur, ou flux NDJSON si format=ndjson (limit=0: tout exporter)"""
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    if format == "ndjson":
+        return StreamingResponse(
+            ndjson_stream(collection, query, sort_field, limit, cursor),
+            media_type="application/x-ndjson"
+        )
+    if format != "json":
+        raise HTTPException(status_code=400, detail="Format inconnu (json ou ndjson)")
+    if limit <= 0:
+        raise HTTPException(status_code=400, detail="limit doit être positif en format json")
+    
+    docs, next_cursor = await paginate(collection, query, sort_field, limit, cursor)
+    
+    return {key: serialize_docs(docs), "count": len(docs), "next_cursor": next_cursor}
+
 @app.get("/api/health")
 async def health_check():
     return {"status": "healthy", "service": "TikTok Automation API"}
@@ -100,28 +216,64 @@ async def add_trend(trend: TrendInput):
         trend_data['date_added'] = datetime.utcnow()
     
     trend_data['_id'] = str(uuid.uuid4())
-    await db.trends.insert_one(trend_data)
+    async with niche_analyzer.writing():
+        try:
+            await db.trends.insert_one(trend_data)
+        except DuplicateKeyError:
+            raise HTTPException(status_code=409, detail="Une tendance avec cette URL existe déjà")
+        await niche_analyzer.apply_trends([trend_data])
+    dashboard_service.invalidate()
     
     return {"message": "Tendance ajoutée avec succès", "id": trend_data['_id']}
 
+async def bulk_rows(request: Request):
+    """Lignes d'un import en masse selon le Content-Type (tableau JSON, NDJSON ou CSV)"""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    
+    if content_type == "application/json":
+        try:
+            return iter_json_array(parse_json_array(await request.body()))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"JSON invalide: {e}")
+    if content_type in ("application/x-ndjson", "application/ndjson"):
+        return iter_ndjson(request.stream())
+    if content_type in ("text/csv", "application/csv"):
+        return iter_csv(request.stream())
+    
+    raise HTTPException(
+        status_code=415,
+        detail="Content-Type attendu: application/json, application/x-ndjson ou text/csv"
+    )
+
+@app.post("/api/trends/bulk")
+async def add_trends_bulk(request: Request):
+    """Importe des tendances en masse (tableau JSON, NDJSON ou CSV), dédupliquées par URL"""
+    rows = await bulk_rows(request)
+    report = await trend_ingest.ingest(rows, TrendInput)
+    if report["inserted"]:
+        dashboard_service.invalidate()
+    
+    return report
+
 @app.get("/api/trends")
-async def get_trends(niche: Optional[str] = None, limit: int = 50):
+async def get_trends(niche: Optional[str] = None, limit: int = 50,
+                     cursor: Optional[str] = None, format: str = "json"):
     """Récupère la liste des tendances"""
     query = {}
     if niche:
         query['niche'] = niche
     
-    cursor = db.trends.find(query).sort("views", -1).limit(limit)
-    trends = await cursor.to_list(length=limit)
-    
-    return {"trends": serialize_docs(trends), "count": len(trends)}
+    return await list_documents("trends", db.trends, query, "views", limit, cursor, format)
 
 @app.delete("/api/trends/{trend_id}")
 async def delete_trend(trend_id: str):
     """Supprime une tendance"""
-    result = await db.trends.delete_one({"_id": trend_id})
-    if result.deleted_count == 0:
-        raise HTTPException(status_code=404, detail="Tendance non trouvée")
+    async with niche_analyzer.writing():
+        trend = await db.trends.find_one_and_delete({"_id": trend_id})
+        if not trend:
+            raise HTTPException(status_code=404, detail="Tendance non trouvée")
+        await niche_analyzer.apply_trends([trend], sign=-1)
+    dashboard_service.invalidate()
     
     return {"message": "Tendance supprimée"}
 
@@ -135,10 +287,12 @@ async def add_analytics(analytics: AnalyticsInput):
         analytics_data['date'] = datetime.utcnow()
     
     analytics_data['_id'] = str(uuid.uuid4())
-    await db.analytics.insert_one(analytics_data)
+    async with niche_analyzer.writing():
+        await db.analytics.insert_one(analytics_data)
+        await niche_analyzer.apply_analytics([analytics_data])
+    dashboard_service.invalidate()
     
     # Enregistre pour le learning
-    learning_service = LearningService(db)
     await learning_service.record_performance(
         analytics_data['video_id'],
         {
@@ -152,116 +306,141 @@ async def add_analytics(analytics: AnalyticsInput):
     
     return {"message": "Analytics ajoutées avec succès", "id": analytics_data['_id']}
 
+@app.post("/api/analytics/bulk")
+async def add_analytics_bulk(request: Request):
+    """Importe des snapshots d'analytics en masse (tableau JSON, NDJSON ou CSV)"""
+    rows = await bulk_rows(request)
+    report = await analytics_ingest.ingest(rows, AnalyticsInput)
+    if report["inserted"]:
+        dashboard_service.invalidate()
+    
+    return report
+
 @app.get("/api/analytics")
-async def get_analytics(video_id: Optional[str] = None):
+async def get_analytics(video_id: Optional[str] = None, limit: int = 100,
+                        cursor: Optional[str] = None, format: str = "json"):
     """Récupère les analytics"""
     query = {}
     if video_id:
         query['video_id'] = video_id
     
-    cursor = db.analytics.find(query).sort("date", -1)
-    analytics = await cursor.to_list(length=100)
-    
-    return {"analytics": serialize_docs(analytics), "count": len(analytics)}
+    return await list_documents("analytics", db.analytics, query, "date", limit, cursor, format)
 
 # ===== NICHE RECOMMENDATIONS =====
 
 @app.get("/api/niches/recommended")
 async def get_recommended_niches(limit: int = 5):
     """Obtient les niches recommandées basées sur l'analyse"""
-    analyzer = NicheAnalyzer(db)
-    niches = await analyzer.get_recommended_niches(limit)
+    niches = await niche_analyzer.get_recommended_niches(limit)
     
     return {"niches": serialize_docs(niches), "count": len(niches)}
 
 @app.get("/api/niches/all")
-async def get_all_niches():
+async def get_all_niches(limit: int = 100, cursor: Optional[str] = None, format: str = "json"):
     """Liste toutes les niches analysées"""
-    cursor = db.niches.find({}).sort("profitability_score", -1)
-    niches = await cursor.to_list(length=100)
+    return await list_documents(
+        "niches", db.niches, NicheAnalyzer.ACTIVE_FILTER, "profitability_score", limit, cursor, format
+    )
+
+@app.post("/api/niches/rebuild")
+async def rebuild_niches():
+    """Recalcule entièrement les statistiques de niches (backfill)"""
+    niches = await niche_analyzer.analyze_niches()
+    dashboard_service.invalidate()
     
-    return {"niches": serialize_docs(niches), "count": len(niches)}
+    return {"message": "Statistiques de niches recalculées", "count": len(niches)}
 
 @app.get("/api/niches/{niche}/trends")
 async def get_niche_trends(niche: str, limit: int = 10):
     """Récupère les vidéos virales d'une niche"""
-    analyzer = NicheAnalyzer(db)
-    trends = await analyzer.search_viral_videos(niche, limit)
+    trends = await niche_analyzer.search_viral_videos(niche, limit)
     
     return {"niche": niche, "trends": serialize_docs(trends), "count": len(trends)}
 
 # ===== VIDEO GENERATION =====
 
-@app.post("/api/videos/generate")
+@app.post("/api/videos/generate", status_code=202)
 async def generate_video(request: VideoGenerationRequest):
-    """Génère une vidéo complète optimisée pour TikTok"""
+    """Met en file la génération d'une vidéo et retourne immédiatement l'id du job"""
+    if request.render_backend and request.render_backend not in RENDER_BACKENDS:
+        raise HTTPException(status_code=400, detail=f"Moteur de rendu inconnu (choix: {', '.join(RENDER_BACKENDS)})")
+    if request.render_profile and request.render_profile not in RENDER_PROFILES:
+        raise HTTPException(status_code=400, detail=f"Profil de rendu inconnu (choix: {', '.join(RENDER_PROFILES)})")
+    if not 1 <= request.candidates <= SCRIPT_CANDIDATES_MAX:
+        raise HTTPException(status_code=400, detail=f"candidates doit être entre 1 et {SCRIPT_CANDIDATES_MAX}")
+    
     try:
-        video_id = str(uuid.uuid4())
-        
-        # 1. Génère le script
-        script_data = await ai_service.generate_script(
-            niche=request.niche,
-            inspiration_url=request.inspiration_url,
-            tone=request.tone
-        )
-        
-        # 2. Calcule le score de viralité
-        virality_score = await ai_service.calculate_virality_score(script_data)
-        
-        # 3. Génère les images
-        images = await ai_service.generate_images(script_data['script'], count=5)
-        
-        # 4. Génère la voix-off
-        audio_bytes = await ai_service.generate_voiceover(
-            script_data['script'],
-            voice=request.voice
+        job = await job_queue.enqueue("generate_video", request.dict())
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    
+    return {
+        "job_id": job['_id'],
+        "status": job['status'],
+        "status_url": f"/api/jobs/{job['_id']}",
+        "message": "Génération de la vidéo mise en file"
+    }
+
+@app.post("/api/videos/generate/batch", status_code=202)
+async def generate_videos_batch(request: BatchGenerationRequest):
+    """Met en file un lot de vidéos (niche, ton, voix, nombre) et retourne l'id du lot"""
+    if not request.items:
+        raise HTTPException(status_code=400, detail="Le lot doit contenir au moins un élément")
+    if any(item.count < 1 for item in request.items):
+        raise HTTPException(status_code=400, detail="count doit être positif")
+    if any(max(item.count, item.candidates or 0) > SCRIPT_CANDIDATES_MAX for item in request.items):
+        raise HTTPException(status_code=400, detail=f"Au plus {SCRIPT_CANDIDATES_MAX} scripts par élément (count/candidates)")
+    total = sum(item.count for item in request.items)
+    if total > BATCH_MAX_VIDEOS:
+        raise HTTPException(status_code=400, detail=f"Lot trop grand ({total} vidéos, maximum {BATCH_MAX_VIDEOS})")
+    if request.render_backend and request.render_backend not in RENDER_BACKENDS:
+        raise HTTPException(status_code=400, detail=f"Moteur de rendu inconnu (choix: {', '.join(RENDER_BACKENDS)})")
+    if request.render_profile and request.render_profile not in RENDER_PROFILES:
+        raise HTTPException(status_code=400, detail=f"Profil de rendu inconnu (choix: {', '.join(RENDER_PROFILES)})")
+    
+    try:
+        batch = await batch_service.create(
+            [item.dict() for item in request.items],
+            {"render_backend": request.render_backend, "render_profile": request.render_profile}
         )
-        
-        # 5. Assemble la vidéo
-        video_path = await video_service.create_video(images, audio_bytes, script_data)
-        
-        # 6. Sauvegarde dans la DB
-        video_doc = {
-            "_id": video_id,
-            "title": script_data['title'],
-            "niche": request.niche,
-            "script_data": script_data,
-            "virality_score": virality_score,
-            "video_path": video_path,
-            "video_url": f"/api/videos/{video_id}/download",
-            "created_at": datetime.utcnow(),
-            "status": "completed"
-        }
-        
-        await db.videos.insert_one(video_doc)
-        
-        # 7. Obtient des suggestions d'amélioration
-        learning_service = LearningService(db)
-        suggestions = await learning_service.suggest_improvements(video_doc)
-        
-        return {
-            "video_id": video_id,
-            "script": script_data,
-            "virality_score": virality_score,
-            "video_url": video_doc['video_url'],
-            "suggestions": suggestions,
-            "message": "Vidéo générée avec succès!"
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erreur lors de la génération: {str(e)}")
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    
+    return {
+        "batch_id": batch['_id'],
+        "job_id": batch['job_id'],
+        "total": batch['total'],
+        "status_url": f"/api/batches/{batch['_id']}",
+        "message": "Lot de vidéos mis en file"
+    }
+
+@app.get("/api/batches/{batch_id}")
+async def get_batch(batch_id: str):
+    """Récupère l'état d'un lot et l'avancement agrégé de ses vidéos"""
+    batch = await batch_service.get(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Lot non trouvé")
+    
+    return serialize_doc(batch)
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Récupère le statut et l'avancement par étape d'un job"""
+    job = await job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job non trouvé")
+    
+    return serialize_doc(job)
 
 @app.get("/api/videos")
-async def list_videos(niche: Optional[str] = None, limit: int = 20):
+async def list_videos(niche: Optional[str] = None, limit: int = 20,
+                      cursor: Optional[str] = None, format: str = "json"):
     """Liste les vidéos générées"""
     query = {}
     if niche:
         query['niche'] = niche
     
-    cursor = db.videos.find(query).sort("created_at", -1).limit(limit)
-    videos = await cursor.to_list(length=limit)
-    
-    return {"videos": serialize_docs(videos), "count": len(videos)}
+    return await list_documents("videos", db.videos, query, "created_at", limit, cursor, format)
 
 @app.get("/api/videos/{video_id}")
 async def get_video(video_id: str):
@@ -272,22 +451,89 @@ async def get_video(video_id: str):
     
     return serialize_doc(video)
 
-@app.get("/api/videos/{video_id}/download")
-async def download_video(video_id: str):
-    """Télécharge une vidéo générée"""
+# Types des fichiers produits par les profils de rendu
+MEDIA_TYPES = {".mp4": "video/mp4", ".jpg": "image/jpeg"}
+
+@app.api_route("/api/videos/{video_id}/download", methods=["GET", "HEAD"])
+async def download_video(video_id: str, request: Request, inline: bool = False):
+    """Télécharge une vidéo générée (requêtes Range et conditionnelles; inline=true pour la lecture)"""
     video = await db.videos.find_one({"_id": video_id})
     if not video:
         raise HTTPException(status_code=404, detail="Vidéo non trouvée")
     
-    video_path = video.get('video_path')
-    if not video_path or not os.path.exists(video_path):
+    # Sert le rendu final s'il existe, sinon le proxy basse résolution
+    for tier, field in (("final", "video_path"), ("proxy", "proxy_path")):
+        video_path = video.get(field)
+        if video_path and os.path.exists(video_path):
+            break
+    else:
         raise HTTPException(status_code=404, detail="Fichier vidéo non trouvé")
     
-    return FileResponse(
-        video_path,
-        media_type="video/mp4",
-        filename=f"{video['title']}.mp4"
+    # Le profil thumbnail ne produit qu'une image JPEG
+    extension = os.path.splitext(video_path)[1]
+    response = await video_delivery.serve(request, video_path, media_type=MEDIA_TYPES.get(extension, "video/mp4"),
+                                          filename=f"{video['title']}{extension}", inline=inline)
+    response.headers["x-video-tier"] = tier
+    return response
+
+@app.api_route("/api/videos/{video_id}/thumbnail", methods=["GET", "HEAD"])
+async def get_video_thumbnail(video_id: str, request: Request):
+    """Miniature JPEG d'une vidéo générée en mode aperçu"""
+    video = await db.videos.find_one({"_id": video_id})
+    if not video:
+        raise HTTPException(status_code=404, detail="Vidéo non trouvée")
+    
+    thumbnail_path = video.get('thumbnail_path')
+    if not thumbnail_path or not os.path.exists(thumbnail_path):
+        raise HTTPException(status_code=404, detail="Miniature non trouvée")
+    
+    return await video_delivery.serve(request, thumbnail_path, media_type="image/jpeg", inline=True)
+
+@app.post("/api/videos/{video_id}/finalize", status_code=202)
+async def finalize_video(video_id: str, options: Optional[FinalizeRequest] = None):
+    """Met en file le rendu final d'une vidéo en statut proxy"""
+    options = options or FinalizeRequest()
+    if options.render_backend and options.render_backend not in RENDER_BACKENDS:
+        raise HTTPException(status_code=400, detail=f"Moteur de rendu inconnu (choix: {', '.join(RENDER_BACKENDS)})")
+    if options.render_profile and (options.render_profile not in RENDER_PROFILES
+                                   or RENDER_PROFILES[options.render_profile].get('thumbnail')):
+        raise HTTPException(status_code=400, detail="Profil de rendu final invalide")
+    
+    # Passage atomique proxy → finalizing: une seule finalisation à la fois
+    video = await db.videos.find_one_and_update(
+        {"_id": video_id, "status": "proxy"},
+        {"$set": {"status": "finalizing"}}
     )
+    if not video:
+        existing = await db.videos.find_one({"_id": video_id}, {"status": 1})
+        if not existing:
+            raise HTTPException(status_code=404, detail="Vidéo non trouvée")
+        raise HTTPException(status_code=409, detail=f"Vidéo non finalisable (statut: {existing.get('status')})")
+    
+    try:
+        job = await job_queue.enqueue("finalize_video", {"video_id": video_id, **options.dict()})
+    except QueueFullError as e:
+        await db.videos.update_one({"_id": video_id}, {"$set": {"status": "proxy"}})
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    
+    await db.videos.update_one({"_id": video_id}, {"$set": {"finalize_job_id": job['_id']}})
+    
+    return {
+        "job_id": job['_id'],
+        "status": job['status'],
+        "status_url": f"/api/jobs/{job['_id']}",
+        "message": "Rendu final mis en file"
+    }
+
+@app.api_route("/videos/{filename}", methods=["GET", "HEAD"])
+async def serve_video_file(filename: str, request: Request):
+    """Fichiers de /app/backend/generated_videos (remplace l'ancien montage statique)"""
+    video_path = os.path.join(video_service.output_dir, os.path.basename(filename))
+    extension = os.path.splitext(filename)[1]
+    if extension not in MEDIA_TYPES or not os.path.isfile(video_path):
+        raise HTTPException(status_code=404, detail="Fichier vidéo non trouvé")
+    
+    return await video_delivery.serve(request, video_path, media_type=MEDIA_TYPES[extension], inline=True)
 
 @app.delete("/api/videos/{video_id}")
 async def delete_video(video_id: str):
@@ -296,12 +542,21 @@ async def delete_video(video_id: str):
     if not video:
         raise HTTPException(status_code=404, detail="Vidéo non trouvée")
     
-    # Supprime le fichier
-    if video.get('video_path') and os.path.exists(video['video_path']):
-        os.remove(video['video_path'])
+    # Supprime les fichiers (rendu final, proxy, miniature, assets)
+    video_service.delete_files(video)
+    for field in ("video_path", "proxy_path", "thumbnail_path"):
+        if video.get(field):
+            video_delivery.forget(video[field])
     
-    # Supprime de la DB
-    await db.videos.delete_one({"_id": video_id})
+    # Supprime de la DB; ses analytics sortent des totaux de niche, comme au recalcul complet
+    async with niche_analyzer.writing():
+        result = await db.videos.delete_one({"_id": video_id})
+        if result.deleted_count:
+            analytics = await db.analytics.find(
+                {"video_id": video_id}, {"video_id": 1, "revenue": 1}
+            ).to_list(length=None)
+            await niche_analyzer.apply_analytics(analytics, videos={video_id: video}, sign=-1)
+    dashboard_service.invalidate()
     
     return {"message": "Vidéo supprimée"}
 
@@ -310,8 +565,6 @@ async def delete_video(video_id: str):
 @app.post("/api/learning/feedback")
 async def submit_feedback(feedback: FeedbackInput):
     """Soumet un feedback sur une vidéo publiée pour le rétro-apprentissage"""
-    learning_service = LearningService(db)
-    
     await learning_service.record_performance(
         feedback.video_id,
         {
@@ -326,52 +579,59 @@ async def submit_feedback(feedback: FeedbackInput):
     return {"message": "Feedback enregistré pour l'apprentissage"}
 
 @app.get("/api/learning/insights")
-async def get_learning_insights(niche: Optional[str] = None):
-    """Obtient les insights d'apprentissage"""
-    learning_service = LearningService(db)
+async def get_learning_insights(niche: Optional[str] = None, mode: str = "summary", days: int = 30):
+    """Obtient les insights d'apprentissage (mode=full: corrélations, quantiles et détail par niche)"""
+    if mode == "full":
+        if days <= 0:
+            raise HTTPException(status_code=400, detail="days doit être positif")
+        return await learning_analytics.compute(niche, days)
+    if mode != "summary":
+        raise HTTPException(status_code=400, detail="Mode inconnu (summary ou full)")
+    
     insights = await learning_service.get_optimization_insights(niche)
     
     return insights
 
+@app.get("/api/learning/virality-model")
+async def get_virality_model_stats():
+    """État du modèle local de viralité et répartition des scores local / LLM"""
+    await virality_model.refresh()
+    return {
+        **virality_model.stats(),
+        "local_scores": ai_service.local_scores,
+        "llm_scores": ai_service.llm_scores
+    }
+
+# ===== ADMIN =====
+
+@app.get("/api/admin/indexes")
+async def get_index_report():
+    """Rapport des index manquants, hors registre ou inutilisés"""
+    return await check_indexes(db)
+
+# ===== CACHE =====
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """Statistiques du cache des réponses IA (hits/misses par niveau)"""
+    if response_cache is None:
+        return {"enabled": False}
+    
+    return {"enabled": True, "shared_requests": ai_service.shared_requests, **response_cache.stats()}
+
+@app.get("/api/llm/pool")
+async def get_llm_pool_stats():
+    """Statistiques du pool de clients LLM (créés, réutilisés, abandonnés, inactifs)"""
+    return ai_service.llm_pool.stats()
+
 # ===== DASHBOARD STATS =====
 
 @app.get("/api/dashboard/stats")
 async def get_dashboard_stats():
     """Récupère les statistiques du dashboard"""
-    # Count documents
-    total_trends = await db.trends.count_documents({})
-    total_videos = await db.videos.count_documents({})
-    total_niches = await db.niches.count_documents({})
-    
-    # Get recent analytics
-    analytics_cursor = db.analytics.find({}).sort("date", -1).limit(100)
-    analytics_list = await analytics_cursor.to_list(length=100)
-    
-    total_views = sum(a.get('views', 0) for a in analytics_list)
-    total_revenue = sum(a.get('revenue', 0) for a in analytics_list)
-    
-    # Get top performing videos
-    top_videos_cursor = db.analytics.find({}).sort("views", -1).limit(5)
-    top_analytics = await top_videos_cursor.to_list(length=5)
-    
-    top_videos = []
-    for analytic in top_analytics:
-        video = await db.videos.find_one({"_id": analytic['video_id']})
-        if video:
-            top_videos.append({
-                "video": video,
-                "performance": analytic
-            })
-    
-    return {
-        "total_trends": total_trends,
-        "total_videos": total_videos,
-        "total_niches": total_niches,
-        "total_views": total_views,
-        "total_revenue": total_revenue,
-        "top_videos": top_videos
-    }
+    return await dashboard_service.get_stats()
+
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+    uvicorn.run("server:app", host="0.0.0.0", port=8001)
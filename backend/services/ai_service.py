@@ -1,31 +1,187 @@
 import os
 import asyncio
 import base64
+from typing import Optional
 from dotenv import load_dotenv
-from emergentintegrations.llm.chat import LlmChat, UserMessage, ImageContent
+from emergentintegrations.llm.chat import UserMessage, ImageContent
 from emergentintegrations.llm.openai import OpenAITextToSpeech
 
+from services.llm_pool import LlmClientPool
+from services.cache import ResponseCache
+from services.voiceover import split_sentences, assemble_segments
+from services.llm_json import IncrementalJsonExtractor, extract_json, validate_script
+
 load_dotenv()
 
+SCRIPT_SYSTEM_MESSAGE = "Tu es un expert en création de contenu viral TikTok. Tu génères des scripts courts, accrocheurs et optimisés pour maximiser l'engagement et les revenus."
+IMAGE_SYSTEM_MESSAGE = "Tu es un créateur d'images pour TikTok."
+ANALYSIS_SYSTEM_MESSAGE = "Tu analyses des scripts et crée des prompts d'images."
+REPAIR_SYSTEM_MESSAGE = "Tu corriges des réponses JSON invalides sans en modifier le contenu."
+VIRALITY_SYSTEM_MESSAGE = "Tu es un expert en analyse de viralité TikTok. Tu évalues le potentiel viral d'un script sur une échelle de 0 à 100."
+# Score neutre quand la réponse LLM n'est pas exploitable (jamais utilisé pour la calibration)
+DEFAULT_VIRALITY_SCORE = 50.0
+
+# Angles imposés aux scripts générés en série: deux demandes de scripts (éléments d'un lot,
+# candidats) ne partagent jamais le même prompt, donc ni le cache ni un appel en cours
+SCRIPT_ANGLES = [
+    "une anecdote surprenante",
+    "un tutoriel rapide étape par étape",
+    "un mythe courant démonté",
+    "une liste de conseils concrets",
+    "une histoire personnelle",
+    "une question posée au public",
+    "une comparaison avant/après",
+    "une erreur fréquente à éviter",
+    "un chiffre choc expliqué",
+    "un défi à relever",
+]
+
 class AIService:
-    def __init__(self):
+    def __init__(self, cache=None, virality_model=None):
         self.api_key = os.getenv("EMERGENT_LLM_KEY")
         if not self.api_key:
             raise ValueError("EMERGENT_LLM_KEY not found in environment")
         self.tts = OpenAITextToSpeech(api_key=self.api_key)
+        self.llm_pool = LlmClientPool(self.api_key)
+        
+        # Génération d'images: parallélisme borné, timeout et retries par image
+        self.image_timeout = float(os.getenv("IMAGE_TIMEOUT_SECONDS", "90"))
+        self.image_retries = int(os.getenv("IMAGE_RETRIES", "2"))
+        self._image_semaphore = asyncio.Semaphore(int(os.getenv("IMAGE_CONCURRENCY", "3")))
+        
+        # Cache des réponses (ResponseCache ou None pour le désactiver)
+        self.cache = cache
+        # Appels identiques en cours (ex: générations en lot), partagés entre les demandeurs
+        self._inflight = {}
+        self.shared_requests = 0
+        # Les générations de scripts ne sont pas déterministes: deux demandes identiques doivent
+        # donner deux scripts différents. Cache des scripts sur option (développement, tests)
+        self.cache_scripts = os.getenv("AI_CACHE_SCRIPTS", "false").lower() == "true"
+        
+        # Modèle local de viralité (ViralityModel ou None): le LLM ne note que les cas limites
+        self.virality_model = virality_model
+        self.borderline_min = float(os.getenv("VIRALITY_BORDERLINE_MIN", "35"))
+        self.borderline_max = float(os.getenv("VIRALITY_BORDERLINE_MAX", "65"))
+        self.local_scores = 0
+        self.llm_scores = 0
+        
+        # Voix-off: synthèse par phrase en parallèle, puis assemblage
+        self._tts_semaphore = asyncio.Semaphore(int(os.getenv("TTS_CONCURRENCY", "4")))
+        self.tts_min_chars = int(os.getenv("TTS_MIN_SENTENCE_CHARS", "20"))
+        self.tts_pause_ms = int(os.getenv("TTS_SENTENCE_PAUSE_MS", "0"))
+        
+        # Réponses de script invalides: tentatives de réparation avant d'abandonner
+        self.script_repair_attempts = int(os.getenv("SCRIPT_REPAIR_ATTEMPTS", "1"))
+        self.script_repairs = 0
     
-    async def generate_script(self, niche: str, inspiration_url: str = None, tone: str = "engageant") -> dict:
-        """Génère un script viral optimisé pour TikTok"""
-        chat = LlmChat(
-            api_key=self.api_key,
-            session_id=f"script-gen-{asyncio.get_event_loop().time()}",
-            system_message="Tu es un expert en création de contenu viral TikTok. Tu génères des scripts courts, accrocheurs et optimisés pour maximiser l'engagement et les revenus."
-        )
-        chat.with_model("openai", "gpt-5.2")
+    async def _cached(self, kind: str, model: str, prompt: str, params: dict, compute, cacheable=None):
+        """Retourne la réponse en cache pour (modèle, prompt, paramètres) ou appelle l'API
+
+        Un appel identique déjà en cours est partagé au lieu d'être relancé. L'appel partagé
+        survit à l'annulation d'un demandeur tant qu'il en reste d'autres; il est annulé
+        quand le dernier abandonne (ex: job en échec ou arrêté).
+        """
+        key = ResponseCache.make_key(kind, model, prompt, params)
+        entry = self._inflight.get(key)
+        if entry is not None:
+            self.shared_requests += 1
+        else:
+            if self.cache is None:
+                task = asyncio.ensure_future(compute())
+            else:
+                task = asyncio.ensure_future(self.cache.get_or_compute(key, compute, cacheable))
+            # [tâche, nombre de demandeurs en attente]
+            entry = self._inflight[key] = [task, 0]
+            task.add_done_callback(lambda _: self._inflight.pop(key, None) if self._inflight.get(key) is entry else None)
         
+        task = entry[0]
+        entry[1] += 1
+        try:
+            # shield: l'annulation d'un demandeur n'interrompt pas directement l'appel partagé
+            return await asyncio.shield(task)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not task.done():
+                task.cancel()
+                if self._inflight.get(key) is entry:
+                    del self._inflight[key]
+    
+    async def _chat(self, provider: str, model: str, system_message: str, prompt: str,
+                    on_text=None, cacheable=None, cache: bool = True) -> str:
+        """Envoie un message texte via un client du pool, avec cache des réponses
+
+        `on_text` reçoit la réponse par morceaux si le client sait la diffuser en flux,
+        sinon en une fois (réponse en cache, appel partagé ou client sans flux).
+        `cacheable` écarte du cache les réponses inutilisables; `cache=False` envoie l'appel
+        sans cache ni partage avec un appel identique en cours.
+        """
+        streamed = False
+        
+        async def send():
+            nonlocal streamed
+            async with self.llm_pool.client(provider, model, system_message) as chat:
+                stream = getattr(chat, "stream_message", None)
+                if on_text is None or stream is None:
+                    return await chat.send_message(UserMessage(text=prompt))
+                streamed = True
+                parts = []
+                async for chunk in stream(UserMessage(text=prompt)):
+                    parts.append(chunk)
+                    on_text(chunk)
+                return "".join(parts)
+        
+        if not cache:
+            response = await send()
+        else:
+            response = await self._cached(
+                "chat", f"{provider}/{model}", prompt, {"system": system_message}, send, cacheable
+            )
+        if on_text is not None and not streamed:
+            on_text(response)
+        return response
+    
+    @staticmethod
+    def _is_valid_script(response) -> bool:
+        try:
+            validate_script(extract_json(response, (dict,)))
+            return True
+        except ValueError:
+            return False
+    
+    async def _repair_script(self, response: str, error: Exception) -> dict:
+        """Demande la correction d'une réponse de script invalide (reformatage seul, sans régénération)"""
+        for attempt in range(self.script_repair_attempts):
+            self.script_repairs += 1
+            prompt = f"""
+Cette réponse devait être un objet JSON de script TikTok mais elle est invalide ({error}):
+
+{response}
+
+Corrige-la sans changer le contenu. Champs: title, script, hook, duration_seconds (nombre),
+hashtags (liste), description, call_to_action.
+Réponds UNIQUEMENT avec l'objet JSON.
+"""
+            response = await self._chat(
+                "openai", "gpt-5.2", REPAIR_SYSTEM_MESSAGE, prompt, cacheable=self._is_valid_script
+            )
+            try:
+                return validate_script(extract_json(response, (dict,)))
+            except ValueError as e:
+                error = e
+        raise ValueError(f"Script invalide après {self.script_repair_attempts} réparation(s): {error}")
+    
+    async def generate_script(self, niche: str, inspiration_url: str = None, tone: str = "engageant",
+                              on_script=None, angle: str = None, cache: bool = None) -> dict:
+        """Génère un script viral optimisé pour TikTok
+
+        `on_script` reçoit le texte du champ `script` dès qu'il est complet dans le flux,
+        avant la fin de la réponse. `cache` remplace AI_CACHE_SCRIPTS pour cet appel.
+        Lève ValueError si la réponse reste invalide après réparation.
+        """
         prompt = f"""
 Crée un script TikTok viral pour la niche: {niche}
 Tone: {tone}
+{f"Angle: {angle}" if angle else ""}
 
 {f"Inspire-toi de cette vidéo: {inspiration_url}" if inspiration_url else ""}
 
@@ -48,44 +204,118 @@ Réponds au format JSON:
 }}
 """
         
-        message = UserMessage(text=prompt)
-        response = await chat.send_message(message)
+        extractor = IncrementalJsonExtractor(
+            ["script"],
+            on_field=(lambda field, value: on_script(value)) if on_script else None
+        )
+        response = await self._chat(
+            "openai", "gpt-5.2", SCRIPT_SYSTEM_MESSAGE, prompt,
+            on_text=extractor.feed, cacheable=self._is_valid_script,
+            cache=self.cache_scripts if cache is None else cache
+        )
         
-        # Parse JSON response
-        import json
         try:
-            script_data = json.loads(response)
-        except:
-            # Fallback if not valid JSON
-            script_data = {
-                "title": "Script Généré",
-                "script": response,
-                "hook": response[:100],
-                "duration_seconds": 45,
-                "hashtags": ["#fyp", "#viral"],
-                "description": "Contenu viral TikTok",
-                "call_to_action": "Abonne-toi!"
-            }
+            return validate_script(extract_json(response, (dict,)))
+        except ValueError as e:
+            print(f"Invalid script response for {niche}: {e}")
+            script_data = await self._repair_script(response, e)
         
+        # Le texte déjà transmis aux étapes suivantes fait foi
+        if "script" in extractor.fields:
+            script_data["script"] = extractor.fields["script"]
         return script_data
     
-    async def generate_images(self, script_content: str, count: int = 5) -> list:
-        """Génère des images pour accompagner le script"""
-        chat = LlmChat(
-            api_key=self.api_key,
-            session_id=f"image-gen-{asyncio.get_event_loop().time()}",
-            system_message="Tu es un créateur d'images pour TikTok."
+    async def generate_scripts(self, niche: str, count: int, tone: str = "engageant",
+                               inspirations: list = None, variant: int = 0) -> list:
+        """Génère `count` scripts distincts pour une niche en un seul appel LLM
+
+        Chaque script reçoit un angle de SCRIPT_ANGLES, décalé selon `variant` (ex: index de
+        l'élément d'un lot). Les scripts manquants ou invalides sont complétés par generate_script.
+        """
+        inspirations = inspirations or []
+        angles = [SCRIPT_ANGLES[(variant * count + i) % len(SCRIPT_ANGLES)] for i in range(count)]
+        angle_lines = "\n".join(f"{i + 1}. {angle}" for i, angle in enumerate(angles))
+        inspiration_lines = "\n".join(
+            "- " + " ".join(filter(None, [
+                t.get('title'), f"({t['views']} vues)" if t.get('views') else None, t.get('url')
+            ]))
+            for t in inspirations
         )
-        chat.with_model("gemini", "gemini-3-pro-image-preview").with_params(modalities=["image", "text"])
+        prompt = f"""
+Crée {count} scripts TikTok viraux DIFFÉRENTS pour la niche: {niche}
+Tone: {tone}
+
+{f"Tendances actuelles de la niche dont tu peux t'inspirer:{chr(10)}{inspiration_lines}" if inspiration_lines else ""}
+
+Chaque script doit:
+- Commencer par un hook PUISSANT (3 premières secondes)
+- Durée totale: 30-60 secondes
+- Structure claire avec émotions fortes
+- Inclure des appels à l'action subtils
+- Utiliser des mots-clés tendance
+- Avoir un angle différent des autres scripts
+
+Angles à utiliser, un par script et dans l'ordre:
+{angle_lines}
+
+Réponds UNIQUEMENT avec un tableau JSON de {count} objets:
+[
+  {{
+    "title": "Titre accrocheur",
+    "script": "Le script complet...",
+    "hook": "La première phrase d'accroche",
+    "duration_seconds": 45,
+    "hashtags": ["#tendance1", "#tendance2"],
+    "description": "Description optimisée SEO",
+    "call_to_action": "CTA à la fin"
+  }}
+]
+"""
         
-        # Analyse le script pour créer des prompts d'images
-        analysis_chat = LlmChat(
-            api_key=self.api_key,
-            session_id=f"analysis-{asyncio.get_event_loop().time()}",
-            system_message="Tu analyses des scripts et crée des prompts d'images."
+        response = await self._chat(
+            "openai", "gpt-5.2", SCRIPT_SYSTEM_MESSAGE, prompt, cache=self.cache_scripts
         )
-        analysis_chat.with_model("openai", "gpt-5.2")
         
+        # Tableau attendu (éventuellement sous une clé "scripts"); seuls les scripts entiers
+        # d'une réponse tronquée sont gardés, les autres places sont complétées ci-dessous
+        try:
+            parsed = extract_json(response, (list,))
+        except ValueError:
+            parsed = []
+        scripts = []
+        for item in parsed:
+            try:
+                scripts.append(validate_script(item))
+            except ValueError:
+                continue
+        scripts = scripts[:count]
+        
+        # Complète avec des générations unitaires si la réponse est incomplète: chaque place
+        # garde son angle, hors cache et sans partage pour ne pas obtenir N copies d'un script
+        if len(scripts) < count:
+            missing = range(len(scripts), count)
+            print(f"Batch script response incomplete for {niche}: {len(missing)} missing")
+            scripts += await asyncio.gather(*[
+                self.generate_script(
+                    niche,
+                    inspirations[slot % len(inspirations)].get('url') if inspirations else None,
+                    tone,
+                    angle=angles[slot],
+                    cache=False
+                )
+                for slot in missing
+            ])
+        
+        return scripts
+    
+    async def generate_images(self, script_content: str, count: int = 5) -> list:
+        """Génère des images pour accompagner le script"""
+        results = await self.generate_image_results(script_content, count)
+        return [img for result in results for img in result['images']]
+    
+    async def generate_image_results(self, script_content: str, count: int = 5) -> list:
+        """Génère les images en parallèle et retourne un résultat par prompt (dans l'ordre des prompts)"""
+        # Analyse le script pour créer des prompts d'images
         analysis_prompt = f"""
 Analyse ce script TikTok et crée {count} prompts d'images descriptifs pour l'accompagner:
 
@@ -94,55 +324,217 @@ Analyse ce script TikTok et crée {count} prompts d'images descriptifs pour l'ac
 Réponds avec une liste de prompts séparés par |||
 """
         
-        analysis_msg = UserMessage(text=analysis_prompt)
-        prompts_text = await analysis_chat.send_message(analysis_msg)
+        prompts_text = await self._chat("openai", "gpt-5.2", ANALYSIS_SYSTEM_MESSAGE, analysis_prompt)
         image_prompts = [p.strip() for p in prompts_text.split("|||")[:count]]
         
-        # Génère les images
-        images = []
-        for i, prompt in enumerate(image_prompts):
+        # Génère les images en parallèle (gather conserve l'ordre des prompts)
+        return await asyncio.gather(*[
+            self._generate_image(i, prompt) for i, prompt in enumerate(image_prompts)
+        ])
+    
+    async def _generate_image(self, index: int, prompt: str) -> dict:
+        """Génère une image avec timeout et retries, sous le sémaphore de concurrence"""
+        result = {"index": index, "prompt": prompt, "images": [], "error": None, "attempts": 0}
+        
+        for attempt in range(1, self.image_retries + 2):
+            result['attempts'] = attempt
+            msg = UserMessage(
+                text=f"Crée une image verticale (9:16) optimisée TikTok: {prompt}. Style moderne, coloré, accrocheur."
+            )
+            async def request_image():
+                async with self._image_semaphore:
+                    async with self.llm_pool.client(
+                        "gemini", "gemini-3-pro-image-preview", IMAGE_SYSTEM_MESSAGE, modalities=["image", "text"]
+                    ) as chat:
+                        text_response, image_list = await asyncio.wait_for(
+                            chat.send_message_multimodal_response(msg),
+                            timeout=self.image_timeout
+                        )
+                return image_list
+            
             try:
-                msg = UserMessage(
-                    text=f"Crée une image verticale (9:16) optimisée TikTok: {prompt}. Style moderne, coloré, accrocheur."
+                # Seules les réponses contenant des images sont mises en cache
+                image_list = await self._cached(
+                    "image", "gemini/gemini-3-pro-image-preview", msg.text, {"system": IMAGE_SYSTEM_MESSAGE, "modalities": ["image", "text"]},
+                    request_image, cacheable=bool
                 )
-                text_response, image_list = await chat.send_message_multimodal_response(msg)
+                if not image_list:
+                    raise ValueError("aucune image retournée")
                 
-                if image_list:
-                    for img in image_list:
-                        images.append({
-                            "data": img['data'],
-                            "mime_type": img['mime_type'],
-                            "prompt": prompt
-                        })
+                result['images'] = [
+                    {"data": img['data'], "mime_type": img['mime_type'], "prompt": prompt}
+                    for img in image_list
+                ]
+                result['error'] = None
+                return result
+            except asyncio.TimeoutError:
+                result['error'] = f"timeout après {self.image_timeout}s"
             except Exception as e:
-                print(f"Error generating image {i}: {e}")
-                continue
+                result['error'] = str(e)
+            
+            # Backoff exponentiel hors du sémaphore pour ne pas bloquer les autres images
+            if attempt <= self.image_retries:
+                await asyncio.sleep(2 ** (attempt - 1))
         
-        return images
+        print(f"Error generating image {index}: {result['error']}")
+        return result
     
     async def generate_voiceover(self, script_text: str, voice: str = "nova") -> bytes:
         """Génère la voix-off du script"""
+        return (await self.generate_voiceover_segments(script_text, voice))["audio"]
+    
+    async def _synthesize(self, text: str, params: dict) -> bytes:
+        async def request_speech():
+            async with self._tts_semaphore:
+                return await self.tts.generate_speech(text=text, model="tts-1-hd", **params)
+        
+        return await self._cached("tts", "openai/tts-1-hd", text, params, request_speech)
+    
+    async def generate_voiceover_segments(self, script_text: str, voice: str = "nova") -> dict:
+        """Génère la voix-off phrase par phrase en parallèle (cache par phrase)
+
+        Retourne {"audio": MP3 assemblé, "segments": [{"text", "start", "end"}]}: les timings
+        servent aux sous-titres et au découpage des images.
+        """
+        params = {"voice": voice, "speed": 1.1}  # Légèrement plus rapide pour TikTok
+        sentences = split_sentences(script_text, self.tts_min_chars) or [script_text]
         try:
-            audio_bytes = await self.tts.generate_speech(
-                text=script_text,
-                model="tts-1-hd",
-                voice=voice,
-                speed=1.1  # Légèrement plus rapide pour TikTok
+            audio_parts = await asyncio.gather(*[self._synthesize(sentence, params) for sentence in sentences])
+            audio, segments = await asyncio.to_thread(
+                assemble_segments, list(zip(sentences, audio_parts)), self.tts_pause_ms
             )
-            return audio_bytes
+            return {"audio": audio, "segments": segments}
         except Exception as e:
             print(f"Error generating voiceover: {e}")
             raise
     
-    async def calculate_virality_score(self, script_data: dict) -> float:
-        """Calcule le score de viralité d'un script"""
-        chat = LlmChat(
-            api_key=self.api_key,
-            session_id=f"virality-score-{asyncio.get_event_loop().time()}",
-            system_message="Tu es un expert en analyse de viralité TikTok. Tu évalues le potentiel viral d'un script sur une échelle de 0 à 100."
+    async def _local_virality_score(self, script_data: dict, niche: str = None):
+        """Score du modèle local s'il est entraîné, calibré et hors de la zone limite, sinon None"""
+        if self.virality_model is None:
+            return None
+        score = await self.virality_model.score(script_data, niche)
+        if score is None or self.borderline_min <= score <= self.borderline_max:
+            return None
+        self.local_scores += 1
+        return score
+    
+    async def score_scripts(self, scripts: list, niche: str = None) -> list:
+        """Calcule le score de viralité de plusieurs scripts (dans l'ordre)
+
+        Le modèle local note d'abord tous les scripts; seuls les cas limites (ou tous si le
+        modèle n'est pas entraîné ou pas encore calibré) sont envoyés au LLM, en un seul appel.
+        Les scores LLM calibrent le modèle local: les deux sont sur la même échelle.
+        """
+        scores = [await self._local_virality_score(script, niche) for script in scripts]
+        pending = [i for i, score in enumerate(scores) if score is None]
+        if pending:
+            llm_scores = await self._llm_score_scripts([scripts[i] for i in pending])
+            for i, score in zip(pending, llm_scores):
+                scores[i] = score
+            await self._calibrate([(scripts[i], niche, scores[i]) for i in pending])
+        # Réponse LLM inexploitable: score neutre pour le classement, hors calibration
+        return [DEFAULT_VIRALITY_SCORE if score is None else score for score in scores]
+    
+    async def _calibrate(self, samples: list):
+        """Transmet des scores LLM au modèle local pour l'aligner sur la grille LLM"""
+        if self.virality_model is None:
+            return
+        try:
+            await self.virality_model.calibrate(samples)
+        except Exception as e:
+            print(f"Error calibrating virality model: {e}")
+    
+    async def _llm_score_scripts(self, scripts: list) -> list:
+        """Note plusieurs scripts en un seul appel LLM
+
+        Les scores absents ou invalides sont recalculés un par un.
+        """
+        if not scripts:
+            return []
+        if len(scripts) == 1:
+            return [await self._llm_virality_score(scripts[0])]
+        
+        listing = "\n\n".join(
+            f"""Script {i + 1}:
+Titre: {script.get('title', '')}
+Hook: {script.get('hook', '')}
+Script: {script.get('script', '')}
+Hashtags: {script.get('hashtags', [])}"""
+            for i, script in enumerate(scripts)
         )
-        chat.with_model("openai", "gpt-5.2")
+        prompt = f"""
+Évalue le potentiel viral de chacun de ces {len(scripts)} scripts TikTok sur 100:
+
+{listing}
+
+Critères:
+- Hook impactant (0-25 points)
+- Structure narrative (0-25 points)
+- Timing et rythme (0-20 points)
+- Déclencheurs émotionnels (0-20 points)
+- SEO et hashtags (0-10 points)
+
+Réponds UNIQUEMENT avec un tableau JSON de {len(scripts)} nombres entre 0 et 100, dans l'ordre des scripts.
+"""
+        
+        response = await self._chat("openai", "gpt-5.2", VIRALITY_SYSTEM_MESSAGE, prompt)
+        self.llm_scores += len(scripts)
+        
+        try:
+            parsed = extract_json(response, (list,))
+        except ValueError:
+            parsed = []
         
+        scores = []
+        for i, script in enumerate(scripts):
+            try:
+                scores.append(min(100, max(0, float(parsed[i]))))
+            except (IndexError, TypeError, ValueError):
+                scores.append(None)
+        
+        missing = [i for i, score in enumerate(scores) if score is None]
+        if missing:
+            print(f"Batch virality response incomplete: {len(missing)} scripts rescored")
+            rescored = await asyncio.gather(*[self._llm_virality_score(scripts[i]) for i in missing])
+            for i, score in zip(missing, rescored):
+                scores[i] = score
+        
+        return scores
+    
+    async def rank_scripts(self, niche: str, candidates: int, tone: str = "engageant",
+                           inspirations: list = None, variant: int = 0) -> list:
+        """Génère `candidates` scripts en un appel et les note en un appel
+
+        Retourne [{"script", "virality_score"}] trié par score décroissant: l'appelant ne garde
+        que les meilleurs pour les étapes coûteuses (images, voix, rendu).
+        """
+        scripts = await self.generate_scripts(niche, candidates, tone, inspirations, variant)
+        scores = await self.score_scripts(scripts, niche)
+        return sorted(
+            ({"script": script, "virality_score": score} for script, score in zip(scripts, scores)),
+            key=lambda candidate: candidate["virality_score"],
+            reverse=True
+        )
+    
+    async def calculate_virality_score(self, script_data: dict, niche: str = None) -> float:
+        """Calcule le score de viralité d'un script (modèle local, LLM pour les cas limites)"""
+        score = await self._local_virality_score(script_data, niche)
+        if score is not None:
+            return score
+        score = await self._llm_virality_score(script_data)
+        await self._calibrate([(script_data, niche, score)])
+        return DEFAULT_VIRALITY_SCORE if score is None else score
+    
+    @staticmethod
+    def _parse_virality_score(response: str) -> Optional[float]:
+        """Score 0-100 d'une réponse LLM, None si elle n'est pas un nombre"""
+        try:
+            return min(100, max(0, float(response.strip())))
+        except (TypeError, ValueError):
+            return None
+    
+    async def _llm_virality_score(self, script_data: dict) -> Optional[float]:
+        """Note un script avec le LLM (None si la réponse n'est pas un nombre)"""
         prompt = f"""
 Évalue le potentiel viral de ce script TikTok sur 100:
 
@@ -161,11 +553,13 @@ Critères:
 Réponds UNIQUEMENT avec un nombre entre 0 et 100.
 """
         
-        message = UserMessage(text=prompt)
-        response = await chat.send_message(message)
+        response = await self._chat(
+            "openai", "gpt-5.2", VIRALITY_SYSTEM_MESSAGE, prompt,
+            cacheable=lambda text: self._parse_virality_score(text) is not None
+        )
+        self.llm_scores += 1
         
-        try:
-            score = float(response.strip())
-            return min(100, max(0, score))
-        except:
-            return 50.0  # Score par défaut
+        score = self._parse_virality_score(response)
+        if score is None:
+            print(f"Invalid virality score response: {response[:100]!r}")
+        return score
@@ -0,0 +1,61 @@
+import uuid
+from typing import Dict, List, Tuple
+from datetime import datetime
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError
+
+from services.trend_ingest import ChunkedIngestService
+
+
+class AnalyticsIngestService(ChunkedIngestService):
+    """Import en masse d'analytics: un $in vidéos par lot, analytics et learning_data écrits en bulk"""
+
+    def __init__(self, db, niche_analyzer, learning_service, chunk_size: int = None):
+        super().__init__(db, chunk_size)
+        self.niche_analyzer = niche_analyzer
+        self.learning_service = learning_service
+
+    async def _process_chunk(self, chunk: List[Tuple[int, Dict]], model, report: Dict):
+        now = datetime.utcnow()
+        op_rows: List[Tuple[int, Dict]] = []
+
+        for row_number, row in chunk:
+            analytics_data = self._validate(report, row_number, row, model)
+            if analytics_data is None:
+                continue
+            if not analytics_data.get('date'):
+                analytics_data['date'] = now
+            analytics_data['_id'] = str(uuid.uuid4())
+            op_rows.append((row_number, analytics_data))
+
+        if not op_rows:
+            return
+
+        async with self.niche_analyzer.writing():
+            failed_ops = set()
+            try:
+                await self.db.analytics.bulk_write(
+                    [InsertOne(analytics_data) for _, analytics_data in op_rows],
+                    ordered=False
+                )
+            except BulkWriteError as e:
+                for error in e.details.get('writeErrors', []):
+                    failed_ops.add(error['index'])
+                    self._error(report, op_rows[error['index']][0], error.get('errmsg', 'Erreur d\'écriture'))
+
+            inserted = [analytics_data for i, (_, analytics_data) in enumerate(op_rows) if i not in failed_ops]
+            report["inserted"] += len(inserted)
+
+            # Les vidéos du lot sont chargées une seule fois pour le learning et les niches
+            videos = await self.learning_service.load_videos(a['video_id'] for a in inserted)
+            await self.learning_service.record_performance_batch(
+                [
+                    {
+                        "video_id": a['video_id'],
+                        "performance": {key: a[key] for key in ('views', 'likes', 'shares', 'comments', 'revenue')}
+                    }
+                    for a in inserted
+                ],
+                videos=videos
+            )
+            await self.niche_analyzer.apply_analytics(inserted, videos=videos)
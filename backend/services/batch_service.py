@@ -0,0 +1,164 @@
+import uuid
+import asyncio
+from typing import Dict, List, Optional
+from datetime import datetime
+
+
+class BatchService:
+    """Génération de vidéos en lot: travail partagé entre les éléments, puis un job par vidéo
+
+    Une seule requête de tendances pour toutes les niches, un appel LLM par élément pour
+    tous ses scripts et un pour leur notation, puis des jobs `generate_video` dont les
+    rendus se répartissent sur le pool de rendu. Les appels images/voix identiques sont
+    dédupliqués par AIService.
+    """
+
+    def __init__(self, db, ai_service, job_queue):
+        self.db = db
+        self.ai_service = ai_service
+        self.job_queue = job_queue
+
+    async def create(self, items: List[Dict], options: Dict) -> Dict:
+        """Enregistre le lot et met en file la préparation des scripts"""
+        batch = {
+            "_id": str(uuid.uuid4()),
+            "status": "queued",
+            "items": items,
+            "options": options,
+            "total": sum(item["count"] for item in items),
+            "created_at": datetime.utcnow()
+        }
+        await self.db.batches.insert_one(batch)
+        try:
+            job = await self.job_queue.enqueue("generate_batch", {"batch_id": batch["_id"]})
+        except Exception:
+            await self.db.batches.delete_one({"_id": batch["_id"]})
+            raise
+
+        await self.db.batches.update_one({"_id": batch["_id"]}, {"$set": {"job_id": job["_id"]}})
+        batch["job_id"] = job["_id"]
+        return batch
+
+    async def _top_trends(self, niches: List[str], limit: int) -> Dict[str, List[Dict]]:
+        """Meilleures tendances de chaque niche, en une seule agrégation
+
+        $topN (MongoDB 5.2+) ne garde que `limit` tendances par niche pendant le
+        groupement, au lieu d'accumuler toute la niche avant de la tronquer.
+        """
+        pipeline = [
+            {"$match": {"niche": {"$in": niches}}},
+            {"$group": {
+                "_id": "$niche",
+                "trends": {"$topN": {
+                    "n": limit,
+                    "sortBy": {"views": -1},
+                    "output": {"title": "$title", "url": "$url", "views": "$views"}
+                }}
+            }}
+        ]
+        groups = await self.db.trends.aggregate(pipeline).to_list(length=None)
+        return {group["_id"]: group["trends"] for group in groups}
+
+    async def run(self, job: Dict, progress) -> Dict:
+        """Job `generate_batch`: tendances, scripts groupés, puis un job de génération par vidéo"""
+        batch_id = job["payload"]["batch_id"]
+        batch = await self.db.batches.find_one({"_id": batch_id})
+        if not batch:
+            raise ValueError(f"Lot introuvable: {batch_id}")
+        await self.db.batches.update_one({"_id": batch_id}, {"$set": {"status": "scripting"}})
+
+        items = batch["items"]
+        try:
+            async with progress.track("trends") as details:
+                trends = await self._top_trends(
+                    list({item["niche"] for item in items}),
+                    max(item["count"] for item in items)
+                )
+                details["niches"] = len(trends)
+
+            # Par élément: N candidats générés en un appel, notés en un appel, les `count` meilleurs gardés.
+            # L'index de l'élément varie les angles: deux éléments identiques (ex: voix différentes)
+            # n'obtiennent pas les mêmes scripts
+            async with progress.track("scripts") as details:
+                ranked = await asyncio.gather(*[
+                    self.ai_service.rank_scripts(
+                        item["niche"], max(item["count"], item.get("candidates") or 0),
+                        item.get("tone", "engageant"),
+                        inspirations=trends.get(item["niche"], []),
+                        variant=index
+                    )
+                    for index, item in enumerate(items)
+                ])
+                scripts = [item_ranked[:item["count"]] for item, item_ranked in zip(items, ranked)]
+                details["generated"] = sum(len(item_ranked) for item_ranked in ranked)
+                details["kept"] = sum(len(item_scripts) for item_scripts in scripts)
+        except Exception as e:
+            await self.db.batches.update_one({"_id": batch_id}, {"$set": {"status": "failed", "error": str(e)}})
+            raise
+
+        payloads = [
+            {
+                "niche": item["niche"],
+                "tone": item.get("tone", "engageant"),
+                "voice": item.get("voice", "nova"),
+                "script": candidate["script"],
+                "virality_score": candidate["virality_score"],
+                "batch_id": batch_id,
+                **batch["options"]
+            }
+            for item, item_scripts in zip(items, scripts)
+            for candidate in item_scripts
+        ]
+        try:
+            jobs = await self.job_queue.enqueue_many("generate_video", payloads)
+        except Exception as e:
+            # Ex: file saturée pendant la préparation des scripts
+            await self.db.batches.update_one({"_id": batch_id}, {"$set": {"status": "failed", "error": str(e)}})
+            raise
+
+        await self.db.batches.update_one({"_id": batch_id}, {"$set": {
+            "status": "rendering",
+            "job_ids": [j["_id"] for j in jobs]
+        }})
+        return {"batch_id": batch_id, "jobs": len(jobs)}
+
+    async def get(self, batch_id: str) -> Optional[Dict]:
+        """État du lot avec l'avancement agrégé de ses jobs de génération"""
+        batch = await self.db.batches.find_one({"_id": batch_id})
+        if not batch:
+            return None
+
+        groups = await self.db.jobs.aggregate([
+            {"$match": {"payload.batch_id": batch_id}},
+            {"$group": {
+                "_id": "$status",
+                "count": {"$sum": 1},
+                "video_ids": {"$push": "$result.video_id"}
+            }}
+        ]).to_list(length=None)
+
+        counts = {status: 0 for status in ("queued", "running", "completed", "failed")}
+        video_ids = []
+        for group in groups:
+            counts[group["_id"]] = group["count"]
+            if group["_id"] == "completed":
+                video_ids = [video_id for video_id in group["video_ids"] if video_id]
+
+        status = batch["status"]
+        finished = counts["completed"] + counts["failed"]
+        if status == "rendering" and finished == batch["total"]:
+            status = "completed" if counts["failed"] == 0 else "completed_with_errors"
+        elif status in ("queued", "scripting"):
+            # La préparation a pu échouer sans que le lot soit mis à jour (ex: arrêt du serveur)
+            job = await self.db.jobs.find_one({"_id": batch.get("job_id")}, {"status": 1, "error": 1})
+            if job and job["status"] == "failed":
+                status = "failed"
+                batch["error"] = job.get("error")
+
+        return {
+            **batch,
+            "status": status,
+            "jobs": counts,
+            "progress": finished / batch["total"] if batch["total"] else 1.0,
+            "video_ids": video_ids
+        }
@@ -0,0 +1,325 @@
+import os
+import json
+import time
+import base64
+import asyncio
+import hashlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
+
+from bson import Binary
+
+# Marqueur des octets (ex: audio TTS) dans la sérialisation JSON des valeurs
+BYTES_TAG = "__bytes__"
+
+
+def encode_value(value: Any) -> bytes:
+    """Sérialise une valeur en JSON (octets en base64): la relecture n'exécute aucun code"""
+    def default(obj):
+        if isinstance(obj, (bytes, bytearray)):
+            return {BYTES_TAG: base64.b64encode(obj).decode("ascii")}
+        raise TypeError(f"valeur non sérialisable: {type(obj).__name__}")
+
+    return json.dumps(value, default=default, ensure_ascii=False).encode()
+
+
+def decode_value(raw: bytes) -> Any:
+    def object_hook(obj):
+        if len(obj) == 1 and BYTES_TAG in obj:
+            return base64.b64decode(obj[BYTES_TAG])
+        return obj
+
+    return json.loads(raw, object_hook=object_hook)
+
+
+class CacheBackend(ABC):
+    """Interface d'un niveau de cache (mémoire, disque, Mongo)"""
+
+    name = "backend"
+
+    @abstractmethod
+    async def get(self, key: str) -> Tuple[bool, Any]:
+        """Retourne (trouvé, octets)"""
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: float):
+        """Enregistre des octets pour `ttl` secondes"""
+
+    def stats(self) -> Dict:
+        return {}
+
+
+class MemoryCache(CacheBackend):
+    """Cache LRU en mémoire, borné en nombre d'entrées et en octets"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._bytes = 0
+
+    async def get(self, key: str) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at < time.time():
+            self._remove(key)
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        if len(value) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.time() + ttl, value)
+        self._bytes += len(value)
+
+        # Éviction LRU par nombre d'entrées et par taille
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str):
+        _, value = self._entries.pop(key)
+        self._bytes -= len(value)
+
+    def stats(self) -> Dict:
+        return {"entries": len(self._entries), "bytes": self._bytes}
+
+
+class DiskCache(CacheBackend):
+    """Cache sur disque (un fichier par clé), borné en octets (éviction des plus anciens)"""
+
+    name = "disk"
+
+    def __init__(self, directory: str, max_bytes: int = 2 * 1024 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+        self._bytes = None
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.bin")
+
+    def _read(self, key: str) -> Tuple[bool, Any]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                expires_at = float(f.readline())
+                value = f.read()
+        except (OSError, ValueError):
+            return False, None
+        if expires_at < time.time():
+            removed = self._unlink(path)
+            if self._bytes is not None:
+                self._bytes -= removed
+            return False, None
+        os.utime(path)  # L'heure de modification sert d'ordre LRU
+        return True, value
+
+    def _write(self, key: str, value: bytes, ttl: float):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(f"{time.time() + ttl}\n".encode())
+            f.write(value)
+        written = os.path.getsize(tmp_path)
+        try:
+            # Une clé réécrite remplace l'ancien fichier: sa taille ne compte plus
+            previous = os.path.getsize(path)
+        except OSError:
+            previous = 0
+        os.replace(tmp_path, path)
+
+        if self._bytes is None:
+            self._bytes = sum(e.stat().st_size for e in os.scandir(self.directory) if e.is_file())
+        else:
+            self._bytes += written - previous
+        if self._bytes > self.max_bytes:
+            self._prune()
+
+    def _prune(self):
+        entries = sorted(
+            (e for e in os.scandir(self.directory) if e.is_file()),
+            key=lambda e: e.stat().st_mtime
+        )
+        total = sum(e.stat().st_size for e in entries)
+        # Descend à 90% de la limite pour ne pas élaguer à chaque écriture
+        for entry in entries:
+            if total <= self.max_bytes * 0.9:
+                break
+            total -= entry.stat().st_size
+            self._unlink(entry.path)
+        self._bytes = total
+
+    def _unlink(self, path: str) -> int:
+        """Supprime un fichier et retourne sa taille (0 s'il n'existait plus)"""
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            return size
+        except OSError:
+            return 0
+
+    async def get(self, key: str) -> Tuple[bool, Any]:
+        return await asyncio.to_thread(self._read, key)
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        await asyncio.to_thread(self._write, key, value, ttl)
+
+    def stats(self) -> Dict:
+        return {"directory": self.directory, "bytes": self._bytes}
+
+
+class MongoCache(CacheBackend):
+    """Cache dans la collection `ai_cache`; l'expiration est gérée par un index TTL sur `expires_at`"""
+
+    name = "mongo"
+
+    # Limite BSON de 16 Mo par document
+    MAX_VALUE_BYTES = 15 * 1024 * 1024
+
+    def __init__(self, db):
+        self.collection = db.ai_cache
+        self._index_ready = False
+
+    async def get(self, key: str) -> Tuple[bool, Any]:
+        doc = await self.collection.find_one({"_id": key})
+        # L'index TTL ne passe que toutes les 60s: on vérifie aussi l'expiration ici
+        if not doc or doc['expires_at'] < datetime.utcnow():
+            return False, None
+        return True, bytes(doc['value'])
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        if len(value) > self.MAX_VALUE_BYTES:
+            return
+        if not self._index_ready:
+            await self.collection.create_index("expires_at", expireAfterSeconds=0)
+            self._index_ready = True
+        await self.collection.update_one(
+            {"_id": key},
+            {"$set": {
+                "value": Binary(value),
+                "size": len(value),
+                "expires_at": datetime.utcnow() + timedelta(seconds=ttl)
+            }},
+            upsert=True
+        )
+
+
+class ResponseCache:
+    """Cache des réponses IA adressé par contenu: (modèle, prompt, hash des paramètres)
+
+    Les niveaux sont consultés dans l'ordre; un succès sur un niveau inférieur
+    repeuple les niveaux supérieurs.
+    """
+
+    def __init__(self, tiers: List[CacheBackend], ttl: float = 7 * 24 * 3600):
+        self.tiers = tiers
+        self.ttl = ttl
+        self.hits = {tier.name: 0 for tier in tiers}
+        self.misses = 0
+        self.errors = 0
+
+    @staticmethod
+    def make_key(kind: str, model: str, prompt: str, params: Optional[Dict] = None) -> str:
+        """Calcule la clé de cache d'un appel"""
+        params_hash = hashlib.sha256(
+            json.dumps(params or {}, sort_keys=True, default=str).encode()
+        ).hexdigest()
+        payload = json.dumps([kind, model, prompt, params_hash], ensure_ascii=False)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    async def get(self, key: str) -> Tuple[bool, Any]:
+        for i, tier in enumerate(self.tiers):
+            try:
+                found, raw = await tier.get(key)
+            except Exception as e:
+                self.errors += 1
+                print(f"Cache {tier.name} get error: {e}")
+                continue
+            if not found:
+                continue
+            try:
+                value = decode_value(raw)
+            except ValueError as e:
+                # Entrée illisible (ancien format, fichier corrompu): traitée comme absente
+                self.errors += 1
+                print(f"Cache {tier.name} decode error: {e}")
+                continue
+            self.hits[tier.name] += 1
+            for upper in self.tiers[:i]:
+                await self._set_tier(upper, key, raw)
+            return True, value
+        self.misses += 1
+        return False, None
+
+    async def set(self, key: str, value: Any):
+        try:
+            raw = encode_value(value)
+        except TypeError as e:
+            self.errors += 1
+            print(f"Cache encode error: {e}")
+            return
+        for tier in self.tiers:
+            await self._set_tier(tier, key, raw)
+
+    async def _set_tier(self, tier: CacheBackend, key: str, raw: bytes):
+        try:
+            await tier.set(key, raw, self.ttl)
+        except Exception as e:
+            self.errors += 1
+            print(f"Cache {tier.name} set error: {e}")
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]],
+                             cacheable: Callable[[Any], bool] = None) -> Any:
+        """Retourne la valeur en cache ou la calcule puis la met en cache"""
+        found, value = await self.get(key)
+        if found:
+            return value
+        value = await compute()
+        if cacheable is None or cacheable(value):
+            await self.set(key, value)
+        return value
+
+    def stats(self) -> Dict:
+        total_hits = sum(self.hits.values())
+        lookups = total_hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": total_hits / lookups if lookups else 0.0,
+            "tiers": {tier.name: tier.stats() for tier in self.tiers}
+        }
+
+
+def build_response_cache(db=None) -> Optional[ResponseCache]:
+    """Construit le cache des réponses IA selon AI_CACHE_BACKEND (disk, mongo, memory ou none)"""
+    backend = os.getenv("AI_CACHE_BACKEND", "disk").lower()
+    if backend == "none":
+        return None
+
+    tiers: List[CacheBackend] = [MemoryCache(
+        max_entries=int(os.getenv("AI_CACHE_MEMORY_ENTRIES", "256")),
+        max_bytes=int(os.getenv("AI_CACHE_MEMORY_MB", "256")) * 1024 * 1024
+    )]
+    if backend == "disk":
+        tiers.append(DiskCache(
+            os.getenv("AI_CACHE_DIR", "/app/backend/cache"),
+            max_bytes=int(os.getenv("AI_CACHE_DISK_MB", "2048")) * 1024 * 1024
+        ))
+    elif backend == "mongo":
+        if db is None:
+            raise ValueError("AI_CACHE_BACKEND=mongo nécessite une base de données")
+        tiers.append(MongoCache(db))
+    elif backend != "memory":
+        raise ValueError(f"AI_CACHE_BACKEND inconnu: {backend}")
+
+    return ResponseCache(tiers, ttl=float(os.getenv("AI_CACHE_TTL_SECONDS", str(7 * 24 * 3600))))
@@ -0,0 +1,86 @@
+import os
+import time
+import asyncio
+from typing import Dict, Optional
+
+
+class DashboardService:
+    """Statistiques du dashboard calculées par agrégation, avec un cache court invalidé à l'écriture"""
+
+    def __init__(self, db, ttl: float = None):
+        self.db = db
+        self.ttl = ttl if ttl is not None else float(os.getenv("DASHBOARD_CACHE_TTL_SECONDS", "15"))
+        self._stats: Optional[Dict] = None
+        self._expires_at = 0.0
+        self._version = 0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        """À appeler après toute écriture qui modifie les statistiques"""
+        self._stats = None
+        self._version += 1
+
+    async def get_stats(self) -> Dict:
+        """Retourne les statistiques, depuis le cache si elles sont encore fraîches"""
+        if self._stats is not None and time.monotonic() < self._expires_at:
+            return self._stats
+
+        # Un seul calcul à la fois: les requêtes concurrentes réutilisent son résultat
+        async with self._lock:
+            if self._stats is not None and time.monotonic() < self._expires_at:
+                return self._stats
+
+            version = self._version
+            stats = await self._compute()
+            # Une écriture pendant le calcul rend le résultat potentiellement obsolète
+            if version == self._version:
+                self._stats = stats
+                self._expires_at = time.monotonic() + self.ttl
+            return stats
+
+    async def _compute(self) -> Dict:
+        analytics_pipeline = [
+            {"$facet": {
+                # Totaux sur toutes les analytics (pas seulement les plus récentes)
+                "totals": [
+                    {"$group": {
+                        "_id": None,
+                        "total_views": {"$sum": {"$ifNull": ["$views", 0]}},
+                        "total_revenue": {"$sum": {"$ifNull": ["$revenue", 0]}}
+                    }}
+                ],
+                # Top vidéos: jointure en une seule requête au lieu d'un find_one par vidéo
+                "top_videos": [
+                    {"$sort": {"views": -1}},
+                    {"$limit": 5},
+                    {"$replaceWith": {"performance": "$$ROOT"}},
+                    {"$lookup": {
+                        "from": "videos",
+                        "localField": "performance.video_id",
+                        "foreignField": "_id",
+                        "as": "video"
+                    }},
+                    {"$unwind": "$video"},
+                    {"$project": {"video": 1, "performance": 1, "_id": 0}}
+                ]
+            }}
+        ]
+
+        facets, total_trends, total_videos, total_niches = await asyncio.gather(
+            self.db.analytics.aggregate(analytics_pipeline).to_list(length=1),
+            self.db.trends.estimated_document_count(),
+            self.db.videos.estimated_document_count(),
+            self.db.niches.count_documents({"trend_count": {"$gt": 0}})
+        )
+
+        facet = facets[0] if facets else {"totals": [], "top_videos": []}
+        totals = facet["totals"][0] if facet["totals"] else {}
+
+        return {
+            "total_trends": total_trends,
+            "total_videos": total_videos,
+            "total_niches": total_niches,
+            "total_views": totals.get("total_views", 0),
+            "total_revenue": totals.get("total_revenue", 0),
+            "top_videos": facet["top_videos"]
+        }
@@ -0,0 +1,105 @@
+from typing import Dict, List
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+
+# Registre déclaratif des index: collection -> index attendus.
+# Les noms par défaut de MongoDB (ex: "niche_1_views_-1") servent à comparer avec l'existant.
+# Les index de tri se terminent par _id: c'est le départage de la pagination par curseur.
+INDEXES: Dict[str, List[IndexModel]] = {
+    "trends": [
+        IndexModel([("niche", ASCENDING), ("views", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("views", DESCENDING), ("_id", DESCENDING)]),
+        # Déduplication des imports en masse (upsert sur l'URL): l'unicité protège des imports concurrents.
+        # $type et non $exists: les tendances sans URL sont stockées avec url=None et ne doivent pas se bloquer
+        IndexModel([("url", ASCENDING)], unique=True, partialFilterExpression={"url": {"$type": "string"}}),
+    ],
+    "analytics": [
+        IndexModel([("video_id", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("date", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("views", DESCENDING)]),
+    ],
+    "videos": [
+        IndexModel([("niche", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ],
+    "niches": [
+        IndexModel([("name", ASCENDING)], unique=True),
+        # Tri par score avec filtre trend_count > 0 (clé de tri avant la clé de plage)
+        IndexModel([("profitability_score", DESCENDING), ("_id", DESCENDING), ("trend_count", ASCENDING)]),
+    ],
+    "learning_data": [
+        IndexModel([("timestamp", DESCENDING)]),
+        IndexModel([("features.niche", ASCENDING), ("timestamp", DESCENDING)]),
+    ],
+    "learning_stats": [
+        IndexModel([("niche", ASCENDING), ("bucket", DESCENDING)]),
+    ],
+    "jobs": [
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)]),
+        # Avancement des lots de génération
+        IndexModel([("payload.batch_id", ASCENDING), ("status", ASCENDING)], sparse=True),
+    ],
+    "ai_cache": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+}
+
+
+# Options comparées pour détecter un index du registre redéfini depuis sa création
+INDEX_OPTIONS = ("unique", "sparse", "partialFilterExpression", "expireAfterSeconds")
+
+
+async def _drop_redefined(collection, indexes: List[IndexModel]) -> List[str]:
+    """Supprime les index existants dont les options ne correspondent plus au registre (ex: url_1 devenu unique)"""
+    existing = await collection.index_information()
+    dropped = []
+    for index in indexes:
+        name = index.document["name"]
+        info = existing.get(name)
+        if info is None:
+            continue
+        if any(info.get(option) != index.document.get(option) for option in INDEX_OPTIONS):
+            await collection.drop_index(name)
+            dropped.append(name)
+    return dropped
+
+
+async def ensure_indexes(db) -> Dict[str, List[str]]:
+    """Crée les index du registre (idempotent: les index existants sont laissés tels quels,
+    sauf ceux dont les options ont changé, qui sont recréés)"""
+    created = {}
+    for collection, indexes in INDEXES.items():
+        try:
+            await _drop_redefined(db[collection], indexes)
+            created[collection] = await db[collection].create_indexes(indexes)
+        except OperationFailure as e:
+            # Ex: doublons empêchant un index unique; les autres collections sont quand même traitées
+            print(f"Error creating indexes on {collection}: {e}")
+            created[collection] = []
+    return created
+
+
+async def check_indexes(db) -> Dict[str, Dict[str, List]]:
+    """Compare les index existants au registre
+
+    Retourne par collection les index manquants, ceux présents mais hors
+    registre, et ceux jamais utilisés depuis le démarrage du serveur MongoDB.
+    """
+    report = {}
+    for collection, indexes in INDEXES.items():
+        expected = {index.document["name"] for index in indexes}
+        existing = set((await db[collection].index_information()).keys()) - {"_id_"}
+
+        usage = await db[collection].aggregate([{"$indexStats": {}}]).to_list(length=None)
+        unused = sorted(
+            stat["name"] for stat in usage
+            if stat["name"] != "_id_" and stat.get("accesses", {}).get("ops", 0) == 0
+        )
+
+        report[collection] = {
+            "missing": sorted(expected - existing),
+            "unregistered": sorted(existing - expected),
+            "unused": unused
+        }
+    return report
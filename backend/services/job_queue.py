@@ -0,0 +1,284 @@
+import os
+import uuid
+import socket
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, List, Optional
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+
+
+class QueueFullError(Exception):
+    """Levée quand la file de jobs a atteint sa capacité maximale"""
+
+
+class JobQueue:
+    """File de jobs persistée dans MongoDB (collection `jobs`) et consommée par un pool de workers
+
+    Un job en cours porte l'identifiant du processus qui l'exécute (`owner`) et un battement
+    (`heartbeat_at`) rafraîchi périodiquement. Seuls les jobs dont le battement s'est arrêté
+    (processus disparu) sont remis en file, par n'importe quel processus; au-delà de
+    `max_attempts` réservations, un job qui fait tomber son processus est marqué en échec.
+    """
+
+    def __init__(self, db, workers: int = None, max_pending: int = None, max_attempts: int = None,
+                 heartbeat_seconds: float = None, stale_seconds: float = None):
+        self.db = db
+        self.workers = workers or int(os.getenv("JOB_WORKERS", "2"))
+        self.max_pending = max_pending or int(os.getenv("JOB_QUEUE_SIZE", "20"))
+        self.max_attempts = max_attempts or int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+        self.heartbeat_seconds = heartbeat_seconds or float(os.getenv("JOB_HEARTBEAT_SECONDS", "15"))
+        self.stale_seconds = stale_seconds or float(os.getenv("JOB_STALE_SECONDS", "60"))
+        self.owner = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.handlers: Dict[str, Callable[[Dict, "JobProgress"], Awaitable[Dict]]] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        # Jobs persistés par enqueue_many, pas encore placés dans la file
+        self._backlog = 0
+
+    def register(self, job_type: str, handler: Callable[[Dict, "JobProgress"], Awaitable[Dict]]):
+        """Associe un type de job à la coroutine qui l'exécute"""
+        self.handlers[job_type] = handler
+
+    async def start(self):
+        """Démarre les workers et reprend les jobs interrompus (processus arrêté ou disparu)"""
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+
+        # Les jobs d'un processus disparu sont remis en file (ou en échec) avant la reprise
+        await self._requeue_stale()
+
+        for i in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker(i)))
+        self._tasks.append(asyncio.create_task(self._recover()))
+        self._tasks.append(asyncio.create_task(self._heartbeat()))
+
+    async def stop(self):
+        """Arrête les workers et rend à la file les jobs qu'ils exécutaient
+
+        L'arrêt n'est pas un échec du job: sa tentative n'est pas comptée.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._backlog = 0
+        await self.db.jobs.update_many(
+            {"status": "running", "owner": self.owner},
+            {"$set": {"status": "queued", "updated_at": datetime.utcnow()}, "$inc": {"attempts": -1}}
+        )
+
+    async def enqueue(self, job_type: str, payload: Dict) -> Dict:
+        """Crée un job et le place dans la file, ou lève QueueFullError si elle est pleine"""
+        if job_type not in self.handlers:
+            raise ValueError(f"Type de job inconnu: {job_type}")
+        if self._queue is None or self.pending() >= self.max_pending:
+            raise QueueFullError(f"File de jobs pleine ({self.max_pending} en attente)")
+
+        job = self._new_job(job_type, payload)
+        await self.db.jobs.insert_one(job)
+        try:
+            self._queue.put_nowait(job["_id"])
+        except asyncio.QueueFull:
+            await self.db.jobs.delete_one({"_id": job["_id"]})
+            raise QueueFullError(f"File de jobs pleine ({self.max_pending} en attente)")
+
+        return job
+
+    async def enqueue_many(self, job_type: str, payloads: List[Dict]) -> List[Dict]:
+        """Crée un lot de jobs en une écriture; ils sont placés en file au rythme des workers
+
+        Comme enqueue, le lot est refusé (QueueFullError) si la file est déjà pleine. Un lot
+        admis peut dépasser la capacité de la file (sa taille est bornée par l'appelant): le
+        surplus, persisté immédiatement, compte dans les jobs en attente et fait refuser les
+        nouveaux jobs jusqu'à ce que les workers l'aient résorbé.
+        """
+        if job_type not in self.handlers:
+            raise ValueError(f"Type de job inconnu: {job_type}")
+        if self._queue is None:
+            raise QueueFullError("File de jobs non démarrée")
+        if self.pending() >= self.max_pending:
+            raise QueueFullError(f"File de jobs pleine ({self.max_pending} en attente)")
+
+        jobs = [self._new_job(job_type, payload) for payload in payloads]
+        if jobs:
+            await self.db.jobs.insert_many(jobs)
+            self._feed_later([job["_id"] for job in jobs])
+        return jobs
+
+    def _feed_later(self, job_ids: List[str]):
+        """Place des jobs en file en tâche de fond; ils comptent dès maintenant dans pending()"""
+        self._backlog += len(job_ids)
+        self._tasks = [task for task in self._tasks if not task.done()]
+        self._tasks.append(asyncio.create_task(self._feed(job_ids)))
+
+    def _new_job(self, job_type: str, payload: Dict) -> Dict:
+        now = datetime.utcnow()
+        return {
+            "_id": str(uuid.uuid4()),
+            "type": job_type,
+            "status": "queued",
+            "payload": payload,
+            "stages": {},
+            "result": None,
+            "error": None,
+            "attempts": 0,
+            "created_at": now,
+            "updated_at": now
+        }
+
+    async def _feed(self, job_ids: List[str]):
+        """Place des jobs en file en attendant les places libres (voir _feed_later)"""
+        remaining = len(job_ids)
+        try:
+            for job_id in job_ids:
+                await self._queue.put(job_id)
+                remaining -= 1
+                self._backlog -= 1
+        finally:
+            # Arrêt en cours de lot: les jobs restants sont repris au démarrage (statut queued)
+            self._backlog -= remaining
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        """Récupère l'état d'un job"""
+        return await self.db.jobs.find_one({"_id": job_id})
+
+    def pending(self) -> int:
+        """Nombre de jobs en attente (dans la file ou dans un lot pas encore placé)"""
+        return (self._queue.qsize() if self._queue else 0) + self._backlog
+
+    async def _recover(self):
+        """Remet en file les jobs persistés qui n'ont pas été exécutés"""
+        cursor = self.db.jobs.find({"status": "queued"}, {"_id": 1}).sort("created_at", 1)
+        async for job in cursor:
+            await self._queue.put(job["_id"])
+
+    async def _heartbeat(self):
+        """Signale périodiquement les jobs de ce processus comme vivants et reprend ceux des processus disparus"""
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            try:
+                await self.db.jobs.update_many(
+                    {"status": "running", "owner": self.owner},
+                    {"$set": {"heartbeat_at": datetime.utcnow()}}
+                )
+                requeued = await self._requeue_stale()
+                if requeued:
+                    self._feed_later(requeued)
+            except Exception as e:
+                print(f"Job heartbeat error: {e}")
+
+    async def _requeue_stale(self) -> List[str]:
+        """Remet en file les jobs "running" sans battement récent, ou les marque en échec
+        après `max_attempts` réservations (job qui fait tomber son processus)
+
+        Retourne les ids remis en file.
+        """
+        now = datetime.utcnow()
+        # Sans heartbeat_at (jobs antérieurs au battement): considérés comme abandonnés
+        stale = {"status": "running", "heartbeat_at": {"$not": {"$gte": now - timedelta(seconds=self.stale_seconds)}}}
+
+        await self.db.jobs.update_many(
+            {**stale, "attempts": {"$gte": self.max_attempts}},
+            {"$set": {
+                "status": "failed",
+                "error": f"Abandonné après {self.max_attempts} tentatives interrompues",
+                "finished_at": now,
+                "updated_at": now
+            }}
+        )
+
+        job_ids = [job["_id"] async for job in self.db.jobs.find(stale, {"_id": 1})]
+        if not job_ids:
+            return []
+        await self.db.jobs.update_many(
+            {**stale, "_id": {"$in": job_ids}},
+            {"$set": {"status": "queued", "updated_at": now}}
+        )
+        return job_ids
+
+    async def _worker(self, worker_id: int):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id, worker_id)
+            except Exception as e:
+                print(f"Job worker {worker_id} error on {job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str, worker_id: int):
+        # Réservation atomique: un job déjà pris (ou terminé) est ignoré
+        now = datetime.utcnow()
+        job = await self.db.jobs.find_one_and_update(
+            {"_id": job_id, "status": "queued"},
+            {"$set": {
+                "status": "running",
+                "owner": self.owner,
+                "worker": worker_id,
+                "started_at": now,
+                "heartbeat_at": now,
+                "updated_at": now
+            }, "$inc": {"attempts": 1}},
+            return_document=ReturnDocument.AFTER
+        )
+        if not job:
+            return
+
+        handler = self.handlers.get(job["type"])
+        progress = JobProgress(self.db, job_id)
+
+        try:
+            if handler is None:
+                raise ValueError(f"Type de job inconnu: {job['type']}")
+            result = await handler(job, progress)
+            update = {"status": "completed", "result": result}
+        except Exception as e:
+            update = {"status": "failed", "error": str(e)}
+
+        update["finished_at"] = datetime.utcnow()
+        update["updated_at"] = update["finished_at"]
+        # Un job repris entre-temps par un autre processus n'est pas écrasé
+        await self.db.jobs.update_one({"_id": job_id, "owner": self.owner}, {"$set": update})
+
+
+class JobProgress:
+    """Enregistre l'avancement par étape d'un job"""
+
+    def __init__(self, db, job_id: str):
+        self.db = db
+        self.job_id = job_id
+
+    async def stage(self, name: str, status: str, **details):
+        """Met à jour l'état d'une étape (running, completed, failed, cancelled)"""
+        now = datetime.utcnow()
+        fields = {
+            f"stages.{name}.status": status,
+            "updated_at": now
+        }
+        if status == "running":
+            fields[f"stages.{name}.started_at"] = now
+        else:
+            fields[f"stages.{name}.finished_at"] = now
+        for key, value in details.items():
+            fields[f"stages.{name}.{key}"] = value
+
+        await self.db.jobs.update_one({"_id": self.job_id}, {"$set": fields})
+
+    @asynccontextmanager
+    async def track(self, name: str):
+        """Marque une étape running, puis completed, failed ou cancelled selon son issue
+
+        Le dict produit peut être complété par l'appelant; il est enregistré avec l'étape.
+        """
+        details = {}
+        await self.stage(name, "running")
+        try:
+            yield details
+        except asyncio.CancelledError:
+            # Étape interrompue (échec d'une étape parallèle, arrêt du serveur)
+            await self.stage(name, "cancelled", **details)
+            raise
+        except Exception as e:
+            await self.stage(name, "failed", error=str(e), **details)
+            raise
+        await self.stage(name, "completed", **details)
@@ -0,0 +1,181 @@
+import os
+import asyncio
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta
+import numpy as np
+
+
+class LearningAnalytics:
+    """Analyse complète des données d'apprentissage sur tableaux NumPy colonnaires
+
+    Les documents de `learning_data` sont lus par lots et convertis en colonnes
+    (features, cibles, code de niche): le calcul ne dépend plus d'une limite de lignes.
+    """
+
+    # Features numériques extraites par LearningService.extract_features
+    FEATURES = ["virality_score", "duration_seconds", "hook_length", "hashtag_count", "has_cta"]
+    # Performances corrélées aux features
+    TARGETS = ["views", "revenue"]
+
+    def __init__(self, db, chunk_size: int = None):
+        self.db = db
+        self.chunk_size = chunk_size or int(os.getenv("LEARNING_CHUNK_SIZE", "5000"))
+
+    async def load_columns(self, query: Dict) -> Optional[Dict]:
+        """Charge les entrées en colonnes: features (n, f), targets (n, t), codes de niche (n,) et noms"""
+        projection = {
+            "_id": 0,
+            "features.niche": 1,
+            **{f"features.{feature}": 1 for feature in self.FEATURES},
+            **{f"performance.{target}": 1 for target in self.TARGETS}
+        }
+        cursor = self.db.learning_data.find(query, projection).batch_size(self.chunk_size)
+
+        niche_codes: Dict[str, int] = {}
+        feature_chunks, target_chunks, code_chunks = [], [], []
+        features, targets, codes = [], [], []
+
+        def flush():
+            feature_chunks.append(np.asarray(features, dtype=np.float64).reshape(-1, len(self.FEATURES)))
+            target_chunks.append(np.asarray(targets, dtype=np.float64).reshape(-1, len(self.TARGETS)))
+            code_chunks.append(np.asarray(codes, dtype=np.int32))
+            features.clear()
+            targets.clear()
+            codes.clear()
+
+        async for entry in cursor:
+            entry_features = entry.get('features', {})
+            performance = entry.get('performance', {})
+            niche = entry_features.get('niche') or 'general'
+            codes.append(niche_codes.setdefault(niche, len(niche_codes)))
+            features.append([float(entry_features.get(feature) or 0) for feature in self.FEATURES])
+            targets.append([float(performance.get(target) or 0) for target in self.TARGETS])
+            if len(codes) >= self.chunk_size:
+                flush()
+        if codes:
+            flush()
+
+        if not code_chunks:
+            return None
+
+        return {
+            "features": np.concatenate(feature_chunks),
+            "targets": np.concatenate(target_chunks),
+            "codes": np.concatenate(code_chunks),
+            "niches": list(niche_codes)
+        }
+
+    async def compute(self, niche: str = None, days: int = 30,
+                      high_quantile: float = 0.9, low_quantile: float = 0.25) -> Dict:
+        """Insights complets sur la fenêtre: corrélations, seuils par quantiles et détail par niche"""
+        query = {"timestamp": {"$gte": datetime.utcnow() - timedelta(days=days)}}
+        if niche:
+            query["features.niche"] = niche
+
+        columns = await self.load_columns(query)
+        if columns is None:
+            return {
+                "message": "Pas assez de données pour l'analyse",
+                "recommendations": []
+            }
+
+        # Calcul vectorisé hors de la boucle d'événements
+        insights = await asyncio.to_thread(self._analyze, columns, high_quantile, low_quantile)
+        insights["window_days"] = days
+        return insights
+
+    def _correlations(self, features: np.ndarray, targets: np.ndarray) -> Dict[str, Dict[str, Optional[float]]]:
+        """Corrélations de Pearson feature × cible (None si une colonne est constante)"""
+        centered_x = features - features.mean(axis=0)
+        centered_y = targets - targets.mean(axis=0)
+        covariance = centered_x.T @ centered_y
+        norms = np.outer(np.sqrt((centered_x ** 2).sum(axis=0)), np.sqrt((centered_y ** 2).sum(axis=0)))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            correlation = covariance / norms
+
+        return {
+            feature: {
+                target: (round(float(correlation[i, j]), 4) if np.isfinite(correlation[i, j]) else None)
+                for j, target in enumerate(self.TARGETS)
+            }
+            for i, feature in enumerate(self.FEATURES)
+        }
+
+    def _means(self, features: np.ndarray, mask: np.ndarray) -> Dict[str, float]:
+        if not mask.any():
+            return {}
+        means = features[mask].mean(axis=0)
+        return {feature: float(value) for feature, value in zip(self.FEATURES, means)}
+
+    def _niche_breakdown(self, columns: Dict, high: np.ndarray, low: np.ndarray) -> List[Dict]:
+        """Statistiques par niche via bincount sur les codes de niche"""
+        codes, features, targets = columns["codes"], columns["features"], columns["targets"]
+        size = len(columns["niches"])
+        counts = np.bincount(codes, minlength=size)
+
+        def mean_by_niche(values: np.ndarray) -> np.ndarray:
+            return np.bincount(codes, weights=values, minlength=size) / counts
+
+        target_means = [mean_by_niche(targets[:, j]) for j in range(len(self.TARGETS))]
+        feature_means = [mean_by_niche(features[:, i]) for i in range(len(self.FEATURES))]
+        high_counts = np.bincount(codes, weights=high, minlength=size)
+        low_counts = np.bincount(codes, weights=low, minlength=size)
+
+        breakdown = [
+            {
+                "niche": name,
+                "count": int(counts[k]),
+                "high_performers": int(high_counts[k]),
+                "low_performers": int(low_counts[k]),
+                "high_rate": float(high_counts[k] / counts[k]),
+                **{f"avg_{target}": float(target_means[j][k]) for j, target in enumerate(self.TARGETS)},
+                "features": {feature: float(feature_means[i][k]) for i, feature in enumerate(self.FEATURES)}
+            }
+            for k, name in enumerate(columns["niches"])
+        ]
+        return sorted(breakdown, key=lambda n: n["avg_views"], reverse=True)
+
+    def _analyze(self, columns: Dict, high_quantile: float, low_quantile: float) -> Dict:
+        features, targets = columns["features"], columns["targets"]
+        views = targets[:, self.TARGETS.index("views")]
+
+        # Seuils relatifs à la distribution observée au lieu de valeurs fixes
+        low_threshold, high_threshold = np.quantile(views, [low_quantile, high_quantile])
+        high = views >= high_threshold
+        low = views <= low_threshold
+        high_means = self._means(features, high)
+
+        insights = {
+            "total_videos": int(len(views)),
+            "high_performers": int(high.sum()),
+            "low_performers": int(low.sum()),
+            "thresholds": {
+                "high_views": float(high_threshold),
+                "low_views": float(low_threshold),
+                "high_quantile": high_quantile,
+                "low_quantile": low_quantile
+            },
+            "correlations": self._correlations(features, targets),
+            "averages": {"all": self._means(features, np.ones_like(high)), "high": high_means,
+                         "low": self._means(features, low)},
+            "niches": self._niche_breakdown(columns, high, low),
+            "recommendations": []
+        }
+
+        # Recommandations identiques au mode résumé, sur les performants par quantile
+        if high_means:
+            insights['optimal_duration'] = high_means['duration_seconds']
+            insights['recommendations'].append(
+                f"La durée optimale est autour de {int(high_means['duration_seconds'])} secondes"
+            )
+            insights['virality_threshold'] = high_means['virality_score']
+            insights['recommendations'].append(
+                f"Viser un score de viralité supérieur à {int(high_means['virality_score'])}"
+            )
+            insights['optimal_hashtags'] = int(high_means['hashtag_count'])
+            if high_means['hashtag_count'] > 0:
+                insights['recommendations'].append(
+                    f"Utiliser environ {int(high_means['hashtag_count'])} hashtags"
+                )
+
+        return insights
@@ -1,84 +1,238 @@
 from typing import Dict, List
 from datetime import datetime, timedelta
+from pymongo import UpdateOne
 
 class LearningService:
-    def __init__(self, db):
+    # Seuils de vues des vidéos performantes / peu performantes
+    HIGH_VIEWS = 10000
+    LOW_VIEWS = 1000
+    # Fenêtre d'analyse des insights, en jours (agrégats partiels par jour)
+    WINDOW_DAYS = 30
+    # Clé des statistiques toutes niches confondues
+    ALL_NICHES = "__all__"
+    # Features sommées dans les statistiques: nom de la somme -> feature
+    STAT_FEATURES = {
+        "duration_sum": "duration_seconds",
+        "virality_sum": "virality_score",
+        "hashtag_sum": "hashtag_count",
+    }
+    
+    def __init__(self, db, virality_model=None):
         self.db = db
+        # Modèle local de viralité, mis à jour à chaque performance enregistrée
+        self.virality_model = virality_model
     
-    async def record_performance(self, video_id: str, performance_data: Dict):
-        """Enregistre les performances d'une vidéo pour l'apprentissage"""
-        # Récupère la vidéo
-        video = await self.db.videos.find_one({"_id": video_id})
-        if not video:
-            return
-        
-        # Extrait les features
-        features = {
+    # Champs des vidéos nécessaires à l'extraction des features
+    VIDEO_PROJECTION = {"niche": 1, "virality_score": 1, "script_data": 1}
+    
+    @staticmethod
+    def extract_features(video: Dict) -> Dict:
+        """Extrait les features d'apprentissage d'une vidéo"""
+        script_data = video.get('script_data', {})
+        return {
             "niche": video.get('niche'),
             "virality_score": video.get('virality_score', 0),
-            "duration_seconds": video.get('script_data', {}).get('duration_seconds', 0),
-            "hook_length": len(video.get('script_data', {}).get('hook', '')),
-            "hashtag_count": len(video.get('script_data', {}).get('hashtags', [])),
-            "has_cta": bool(video.get('script_data', {}).get('call_to_action')),
+            "duration_seconds": script_data.get('duration_seconds', 0),
+            "hook_length": len(script_data.get('hook', '')),
+            "hashtag_count": len(script_data.get('hashtags', [])),
+            "has_cta": bool(script_data.get('call_to_action')),
         }
+    
+    async def load_videos(self, video_ids) -> Dict[str, Dict]:
+        """Charge en une requête $in les vidéos nécessaires à un lot"""
+        cursor = self.db.videos.find({"_id": {"$in": list(set(video_ids))}}, self.VIDEO_PROJECTION)
+        return {video['_id']: video async for video in cursor}
+    
+    async def record_performance(self, video_id: str, performance_data: Dict):
+        """Enregistre les performances d'une vidéo pour l'apprentissage"""
+        await self.record_performance_batch([{"video_id": video_id, "performance": performance_data}])
+    
+    async def record_performance_batch(self, entries: List[Dict], videos: Dict[str, Dict] = None) -> int:
+        """Enregistre un lot de performances ({video_id, performance}) en une lecture et une écriture
+
+        `videos` permet de réutiliser des vidéos déjà chargées par l'appelant.
+        Retourne le nombre d'entrées enregistrées (les vidéos inconnues sont ignorées).
+        """
+        if videos is None:
+            videos = await self.load_videos(entry['video_id'] for entry in entries)
         
-        # Enregistre dans learning_data
-        learning_entry = {
-            "video_id": video_id,
-            "features": features,
-            "performance": performance_data,
-            "timestamp": datetime.utcnow()
-        }
+        now = datetime.utcnow()
+        learning_entries = [
+            {
+                "video_id": entry['video_id'],
+                "features": self.extract_features(videos[entry['video_id']]),
+                "performance": entry['performance'],
+                "timestamp": now
+            }
+            for entry in entries if entry['video_id'] in videos
+        ]
         
-        await self.db.learning_data.insert_one(learning_entry)
+        if learning_entries:
+            await self.db.learning_data.insert_many(learning_entries, ordered=False)
+            await self._update_stats(learning_entries)
+            if self.virality_model is not None:
+                await self.virality_model.update(
+                    (videos[entry['video_id']].get('script_data') or {}, entry['features'].get('niche'),
+                     entry['performance'].get('views', 0))
+                    for entry in learning_entries
+                )
+        return len(learning_entries)
+    
+    def _performance_groups(self, views: float) -> List[str]:
+        """Groupes de statistiques d'une entrée selon ses vues (all, puis high ou low)"""
+        groups = ["all"]
+        if views > self.HIGH_VIEWS:
+            groups.append("high")
+        elif views < self.LOW_VIEWS:
+            groups.append("low")
+        return groups
+    
+    async def _update_stats(self, learning_entries: List[Dict]):
+        """Incrémente les statistiques journalières par niche (et toutes niches) pour de nouvelles entrées"""
+        increments = {}
+        for entry in learning_entries:
+            timestamp = entry['timestamp']
+            bucket = datetime(timestamp.year, timestamp.month, timestamp.day)
+            niche = entry['features'].get('niche')
+            keys = [self.ALL_NICHES] + ([niche] if niche else [])
+            
+            for key in keys:
+                inc = increments.setdefault((key, bucket), {})
+                for group in self._performance_groups(entry['performance'].get('views', 0)):
+                    inc[f"{group}.count"] = inc.get(f"{group}.count", 0) + 1
+                    for stat, feature in self.STAT_FEATURES.items():
+                        value = entry['features'].get(feature, 0) or 0
+                        inc[f"{group}.{stat}"] = inc.get(f"{group}.{stat}", 0) + value
+        
+        operations = [
+            UpdateOne(
+                {"_id": f"{niche}|{bucket.date().isoformat()}"},
+                {"$inc": inc, "$setOnInsert": {"niche": niche, "bucket": bucket}},
+                upsert=True
+            )
+            for (niche, bucket), inc in increments.items()
+        ]
+        await self.db.learning_stats.bulk_write(operations, ordered=False)
+    
+    def _stats_pipeline(self, niche_expr) -> List[Dict]:
+        """Pipeline qui recalcule les statistiques journalières depuis learning_data"""
+        def is_group(group: str) -> Dict:
+            if group == "high":
+                return {"$gt": ["$views", self.HIGH_VIEWS]}
+            if group == "low":
+                return {"$lt": ["$views", self.LOW_VIEWS]}
+            return True
+        
+        group_fields = {}
+        for group in ("all", "high", "low"):
+            group_fields[f"{group}_count"] = {"$sum": {"$cond": [is_group(group), 1, 0]}}
+            for stat in self.STAT_FEATURES:
+                group_fields[f"{group}_{stat}"] = {"$sum": {"$cond": [is_group(group), f"${stat}", 0]}}
+        
+        return [
+            {"$project": {
+                "niche": niche_expr,
+                "bucket": {"$dateTrunc": {"date": "$timestamp", "unit": "day"}},
+                "views": {"$ifNull": ["$performance.views", 0]},
+                **{stat: {"$ifNull": [f"$features.{feature}", 0]} for stat, feature in self.STAT_FEATURES.items()}
+            }},
+            {"$match": {"niche": {"$nin": [None, ""]}}},
+            {"$group": {"_id": {"niche": "$niche", "bucket": "$bucket"}, **group_fields}},
+            {"$project": {
+                "_id": {"$concat": [
+                    "$_id.niche", "|", {"$dateToString": {"date": "$_id.bucket", "format": "%Y-%m-%d"}}
+                ]},
+                "niche": "$_id.niche",
+                "bucket": "$_id.bucket",
+                **{
+                    group: {
+                        "count": f"${group}_count",
+                        **{stat: f"${group}_{stat}" for stat in self.STAT_FEATURES}
+                    }
+                    for group in ("all", "high", "low")
+                }
+            }},
+            {"$merge": {"into": "learning_stats", "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}
+        ]
+    
+    async def rebuild_stats(self):
+        """Recalcule entièrement les statistiques journalières depuis learning_data (backfill)"""
+        await self.db.learning_stats.delete_many({})
+        await self.db.learning_data.aggregate(
+            self._stats_pipeline("$features.niche"), allowDiskUse=True
+        ).to_list(length=None)
+        await self.db.learning_data.aggregate(
+            self._stats_pipeline({"$literal": self.ALL_NICHES}), allowDiskUse=True
+        ).to_list(length=None)
+    
+    async def ensure_stats(self) -> bool:
+        """Backfill des statistiques journalières si elles n'existent pas encore (base antérieure
+        aux statistiques): sans cela, les insights resteraient vides jusqu'à un rebuild manuel"""
+        if await self.db.learning_stats.find_one({}, {"_id": 1}):
+            return False
+        if not await self.db.learning_data.find_one({}, {"_id": 1}):
+            return False
+        await self.rebuild_stats()
+        return True
     
     async def get_optimization_insights(self, niche: str = None) -> Dict:
         """Analyse les données d'apprentissage pour obtenir des insights"""
-        # Requête pour les données récentes (30 derniers jours)
-        since_date = datetime.utcnow() - timedelta(days=30)
-        query = {"timestamp": {"$gte": since_date}}
-        
-        if niche:
-            query["features.niche"] = niche
+        # Somme des agrégats journaliers de la fenêtre (aujourd'hui inclus): WINDOW_DAYS documents
+        now = datetime.utcnow()
+        since_bucket = datetime(now.year, now.month, now.day) - timedelta(days=self.WINDOW_DAYS - 1)
+        cursor = self.db.learning_stats.find({
+            "niche": niche or self.ALL_NICHES,
+            "bucket": {"$gte": since_bucket}
+        })
         
-        cursor = self.db.learning_data.find(query)
-        data = await cursor.to_list(length=1000)
+        totals = {group: {"count": 0, **{stat: 0 for stat in self.STAT_FEATURES}} for group in ("all", "high", "low")}
+        async for bucket in cursor:
+            for group, group_totals in totals.items():
+                for field, value in bucket.get(group, {}).items():
+                    group_totals[field] = group_totals.get(field, 0) + value
         
-        if not data:
+        if not totals['all']['count']:
             return {
                 "message": "Pas assez de données pour l'analyse",
                 "recommendations": []
             }
         
-        # Analyse simple: corrélations
-        high_performers = [d for d in data if d['performance'].get('views', 0) > 10000]
-        low_performers = [d for d in data if d['performance'].get('views', 0) < 1000]
+        def averages(group: str) -> Dict:
+            count = totals[group]['count']
+            return {
+                feature: (totals[group][stat] / count if count else 0)
+                for stat, feature in self.STAT_FEATURES.items()
+            }
+        
+        high = averages('high')
+        has_high = totals['high']['count'] > 0
         
         insights = {
-            "total_videos": len(data),
-            "high_performers": len(high_performers),
-            "low_performers": len(low_performers),
+            "total_videos": totals['all']['count'],
+            "high_performers": totals['high']['count'],
+            "low_performers": totals['low']['count'],
+            "averages": {"high": high, "low": averages('low')},
             "recommendations": []
         }
         
         # Analyse durée optimale
-        if high_performers:
-            avg_duration_high = sum(d['features'].get('duration_seconds', 0) for d in high_performers) / len(high_performers)
+        if has_high:
+            avg_duration_high = high['duration_seconds']
             insights['optimal_duration'] = avg_duration_high
             insights['recommendations'].append(
                 f"La durée optimale est autour de {int(avg_duration_high)} secondes"
             )
         
         # Analyse score viralité
-        if high_performers:
-            avg_virality_high = sum(d['features'].get('virality_score', 0) for d in high_performers) / len(high_performers)
+        if has_high:
+            avg_virality_high = high['virality_score']
             insights['virality_threshold'] = avg_virality_high
             insights['recommendations'].append(
                 f"Viser un score de viralité supérieur à {int(avg_virality_high)}"
             )
         
         # Analyse hashtags
-        avg_hashtags_high = sum(d['features'].get('hashtag_count', 0) for d in high_performers) / len(high_performers) if high_performers else 0
+        avg_hashtags_high = high['hashtag_count']
         insights['optimal_hashtags'] = int(avg_hashtags_high)
         if avg_hashtags_high > 0:
             insights['recommendations'].append(
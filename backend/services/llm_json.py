@@ -0,0 +1,269 @@
+import re
+import json
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+# Nombre maximum de positions de départ essayées dans une réponse
+MAX_OPENERS = 32
+
+_decoder = json.JSONDecoder()
+
+
+class JsonExtractionError(ValueError):
+    pass
+
+
+class ScriptValidationError(ValueError):
+    pass
+
+
+def _decode_first(text: str, expected: Tuple[type, ...]):
+    """Premier JSON décodable du type attendu dans le texte (la prose autour est ignorée)"""
+    openers = [i for i, c in enumerate(text) if c in "{["][:MAX_OPENERS]
+    for start in openers:
+        try:
+            value, _ = _decoder.raw_decode(text, start)
+        except ValueError:
+            continue
+        if isinstance(value, expected):
+            return value
+    raise JsonExtractionError("Aucun JSON valide dans la réponse")
+
+
+def _repair(text: str) -> List[Tuple[str, bool]]:
+    """Réparations possibles d'un JSON abîmé: virgules finales retirées, structures tronquées refermées
+
+    Retourne des paires (texte, complet): le texte refermé tel quel, puis coupé à la dernière
+    virgule (valeur incomplète), puis à la dernière virgule entre éléments d'un tableau racine.
+    Une réparation n'est complète que si elle n'a refermé aucune chaîne ni structure tronquée,
+    ou si elle ne garde que des éléments entiers du tableau racine.
+    """
+    start = min((i for i in (text.find("{"), text.find("[")) if i >= 0), default=-1)
+    if start < 0:
+        return []
+
+    out: List[str] = []
+    stack: List[str] = []
+    cuts: List[Tuple[int, List[str]]] = []
+    in_string = escape = False
+    for char in text[start:]:
+        if in_string:
+            out.append(char)
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]":
+            # Virgule finale avant la fermeture
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            if not stack:
+                break
+            stack.pop()
+            out.append(char)
+            if not stack:
+                break
+            continue
+        elif char == ",":
+            cuts.append((len(out), list(stack)))
+        out.append(char)
+
+    closed = "".join(out) + ('"' if in_string else "")
+    closed = closed.rstrip().rstrip(",:")
+    repairs = [(closed + "".join(reversed(stack)), not in_string and not stack)]
+    if cuts:
+        position, cut_stack = cuts[-1]
+        repairs.append(("".join(out[:position]) + "".join(reversed(cut_stack)), cut_stack == ["]"]))
+        # Dernier élément entier du tableau racine (la dernière virgule est dans un élément tronqué)
+        element_cuts = [(position, cut_stack) for position, cut_stack in cuts if cut_stack == ["]"]]
+        if element_cuts and element_cuts[-1] != cuts[-1]:
+            position, cut_stack = element_cuts[-1]
+            repairs.append(("".join(out[:position]) + "]", True))
+    return repairs
+
+
+def extract_json(text: str, expected: Tuple[type, ...] = (dict, list), allow_truncated: bool = False):
+    """Extrait le JSON d'une réponse LLM: blocs ```json```, prose autour, virgules finales, troncature
+
+    Une réponse tronquée n'est refermée que si `allow_truncated`: sinon seuls les éléments
+    entiers d'un tableau sont gardés, et un objet coupé lève JsonExtractionError (à réparer).
+    """
+    if not isinstance(text, str):
+        raise JsonExtractionError("Réponse vide")
+    candidates = [match.group(1) for match in FENCE.finditer(text)] + [text]
+
+    for candidate in candidates:
+        try:
+            return _decode_first(candidate, expected)
+        except JsonExtractionError:
+            pass
+    for candidate in candidates:
+        for repaired, complete in _repair(candidate):
+            if not complete and not allow_truncated:
+                continue
+            try:
+                return _decode_first(repaired, expected)
+            except JsonExtractionError:
+                pass
+    raise JsonExtractionError("Aucun JSON valide dans la réponse")
+
+
+class IncrementalJsonExtractor:
+    """Lit une réponse JSON au fil du flux et signale chaque champ texte de premier niveau dès qu'il est complet
+
+    La prose ou les balises avant le premier `{` sont ignorées; un `{` de la prose qui ne
+    commence pas un objet JSON (ex: "{voir plus bas}") est abandonné au premier caractère
+    invalide, et la lecture reprend au `{` suivant.
+    """
+
+    def __init__(self, fields: Iterable[str], on_field: Callable[[str, str], None] = None):
+        self.watched = set(fields)
+        self.on_field = on_field
+        self.fields: Dict[str, str] = {}
+        self.buffer = ""
+        self._position = 0
+        self._depth = 0
+        self._started = False
+        self._done = False
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._start = 0
+        # Attendu au premier niveau: "key", "colon", "value" ou "rest" (suite d'une valeur)
+        self._expect = "key"
+        self._key: Optional[str] = None
+
+    def feed(self, chunk: str):
+        self.buffer += chunk
+        while self._position < len(self.buffer) and not self._done:
+            self._step(self.buffer[self._position])
+            self._position += 1
+
+    def _step(self, char: str):
+        if not self._started:
+            if char == "{":
+                self._started = True
+                self._start = self._position
+                self._depth = 1
+                self._expect = "key"
+            return
+
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+                if self._depth == 1:
+                    self._string_done(self.buffer[self._string_start:self._position + 1])
+            return
+
+        if self._depth == 1 and not char.isspace() and not self._top_level(char):
+            self._reset()
+            return
+
+        if char == '"':
+            self._in_string = True
+            self._string_start = self._position
+        elif char in "{[":
+            self._depth += 1
+        elif char in "}]":
+            self._depth -= 1
+            if self._depth == 0:
+                self._done = True
+
+    def _top_level(self, char: str) -> bool:
+        """Vérifie la syntaxe de l'objet racine (clé, deux-points, valeur) et avance l'état"""
+        if self._expect == "key":
+            return char in '"}'
+        if self._expect == "colon":
+            self._expect = "value"
+            return char == ":"
+        if self._expect == "value":
+            self._expect = "rest"
+            return char not in ",:}"
+        if char == ",":
+            self._expect = "key"
+        return char not in '":'
+
+    def _reset(self):
+        """Abandonne un `{` de la prose: la lecture reprend juste après lui"""
+        self._started = False
+        self._depth = 0
+        self._key = None
+        self._position = self._start
+
+    def _string_done(self, literal: str):
+        try:
+            value = json.loads(literal)
+        except ValueError:
+            self._reset()
+            return
+        if self._expect == "key":
+            self._key = value
+            self._expect = "colon"
+            return
+        self._expect = "rest"
+        if self._key in self.watched and self._key not in self.fields:
+            self.fields[self._key] = value
+            if self.on_field:
+                self.on_field(self._key, value)
+
+
+# Champs d'un script: (types acceptés, obligatoire)
+SCRIPT_SCHEMA = {
+    "title": (str, True),
+    "script": (str, True),
+    "hook": (str, False),
+    "duration_seconds": ((int, float), False),
+    "hashtags": (list, False),
+    "description": (str, False),
+    "call_to_action": (str, False),
+}
+
+
+def validate_script(data) -> Dict:
+    """Valide et normalise un script selon SCRIPT_SCHEMA (ScriptValidationError sinon)"""
+    if not isinstance(data, dict):
+        raise ScriptValidationError("le script doit être un objet JSON")
+
+    script = dict(data)
+    # Coercions tolérées: durée en texte, hashtags en une seule chaîne
+    if isinstance(script.get("duration_seconds"), str):
+        try:
+            script["duration_seconds"] = float(script["duration_seconds"].strip().rstrip("s"))
+        except ValueError:
+            pass
+    if isinstance(script.get("hashtags"), str):
+        script["hashtags"] = [tag for tag in re.split(r"[\s,]+", script["hashtags"]) if tag]
+
+    errors = []
+    for field, (types, required) in SCRIPT_SCHEMA.items():
+        value = script.get(field)
+        if value is None or value == "":
+            if required:
+                errors.append(f"{field} manquant")
+            continue
+        if not isinstance(value, types) or isinstance(value, bool):
+            errors.append(f"{field} invalide")
+    if isinstance(script.get("hashtags"), list) and not all(isinstance(tag, str) for tag in script["hashtags"]):
+        errors.append("hashtags invalide")
+    if errors:
+        raise ScriptValidationError(", ".join(errors))
+
+    if not script.get("hook"):
+        script["hook"] = re.split(r"(?<=[.!?])\s", script["script"].strip(), maxsplit=1)[0]
+    for field, default in (("duration_seconds", 45), ("hashtags", []), ("description", ""), ("call_to_action", "")):
+        if script.get(field) is None or script.get(field) == "":
+            script[field] = default
+    return script
@@ -0,0 +1,90 @@
+import os
+import uuid
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict, List, Tuple
+
+from emergentintegrations.llm.chat import LlmChat
+
+
+class LlmClientPool:
+    """Pool de clients LlmChat réutilisables par (fournisseur, modèle, message système, paramètres)
+
+    Les clients sont créés une fois puis recyclés entre les appels, avec un
+    plafond global d'appels simultanés. Avant d'être remis dans le pool, un
+    client retrouve l'historique qu'il avait à sa création (attribut public
+    `messages` de LlmChat, réassigné) pour qu'aucune conversation ne fuie d'un
+    appel à l'autre. Un client sans historique accessible n'est pas recyclé:
+    c'est signalé une fois et compté dans `discarded`.
+    """
+
+    def __init__(self, api_key: str, max_concurrency: int = None, max_idle: int = None):
+        self.api_key = api_key
+        self.max_idle = max_idle or int(os.getenv("LLM_POOL_MAX_IDLE", "4"))
+        self._semaphore = asyncio.Semaphore(max_concurrency or int(os.getenv("LLM_MAX_CONCURRENCY", "8")))
+        self._idle: Dict[Tuple, List[LlmChat]] = {}
+        self._initial_messages: Dict[int, list] = {}
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+        self._warned = False
+
+    def _create(self, provider: str, model: str, system_message: str, params: Dict) -> LlmChat:
+        chat = LlmChat(
+            api_key=self.api_key,
+            session_id=f"{provider}-{model}-{uuid.uuid4()}",
+            system_message=system_message
+        )
+        chat.with_model(provider, model)
+        if params:
+            chat.with_params(**params)
+
+        # Sans historique accessible, le client ne peut pas être remis à zéro: il ne sera pas recyclé
+        messages = getattr(chat, "messages", None)
+        if messages is not None:
+            self._initial_messages[id(chat)] = list(messages)
+        elif not self._warned:
+            print("LlmChat exposes no message history: LLM clients will not be reused")
+            self._warned = True
+        self.created += 1
+        return chat
+
+    def _release(self, key: Tuple, chat: LlmChat):
+        initial = self._initial_messages.get(id(chat))
+        idle = self._idle.setdefault(key, [])
+        if initial is None or len(idle) >= self.max_idle:
+            self._initial_messages.pop(id(chat), None)
+            self.discarded += 1
+            return
+        chat.messages = list(initial)
+        idle.append(chat)
+
+    @asynccontextmanager
+    async def client(self, provider: str, model: str, system_message: str, **params):
+        """Emprunte un client configuré; il est rendu au pool à la sortie du bloc"""
+        key = (provider, model, system_message, tuple(sorted((k, repr(v)) for k, v in params.items())))
+
+        async with self._semaphore:
+            idle = self._idle.get(key)
+            if idle:
+                chat = idle.pop()
+                self.reused += 1
+            else:
+                chat = self._create(provider, model, system_message, params)
+
+            try:
+                yield chat
+            except BaseException:
+                # État incertain après une erreur ou un timeout: le client est abandonné
+                self._initial_messages.pop(id(chat), None)
+                self.discarded += 1
+                raise
+            self._release(key, chat)
+
+    def stats(self) -> Dict:
+        return {
+            "created": self.created,
+            "reused": self.reused,
+            "discarded": self.discarded,
+            "idle": sum(len(clients) for clients in self._idle.values())
+        }
@@ -1,107 +1,209 @@
-from typing import List, Dict
+import uuid
 import asyncio
-from datetime import datetime
+from contextlib import asynccontextmanager
+from typing import List, Dict, Iterable
+from pymongo import UpdateOne
+
+
+def derived_fields_stages() -> List[Dict]:
+    """Étapes d'agrégation qui recalculent moyennes et score de profitabilité à partir des totaux
+
+    Utilisées comme pipeline de mise à jour: le calcul se fait côté serveur, de
+    façon atomique avec l'incrément des totaux.
+    """
+    def avg(total: str, count: str) -> Dict:
+        return {"$cond": [{"$gt": [f"${count}", 0]}, {"$divide": [f"${total}", f"${count}"]}, 0]}
+
+    return [
+        {"$set": {
+            "avg_views": avg("total_views", "trend_count"),
+            "avg_engagement": avg("total_engagement", "trend_count"),
+            "avg_revenue": avg("total_revenue", "video_count"),
+            "trending": {"$gte": ["$trend_count", 3]}
+        }},
+        # Score de profitabilité (0-100)
+        # Facteurs: vues moyennes, engagement, revenus, tendances récentes
+        {"$set": {
+            "profitability_score": {"$add": [
+                {"$min": [50, {"$multiply": [{"$divide": ["$avg_views", 100000]}, 50]}]},  # Max 50 points
+                {"$min": [20, {"$multiply": [{"$divide": ["$avg_engagement", 10000]}, 20]}]},  # Max 20 points
+                {"$min": [20, {"$multiply": [{"$divide": ["$avg_revenue", 100]}, 20]}]},  # Max 20 points
+                {"$cond": ["$trending", 10, 5]}  # 10 points si trending
+            ]},
+            "last_updated": "$$NOW"
+        }}
+    ]
+
+
+def _increment_update(deltas: Dict) -> List[Dict]:
+    """Pipeline de mise à jour qui ajoute des deltas aux totaux puis recalcule les champs dérivés"""
+    totals = {
+        field: {"$add": [{"$ifNull": [f"${field}", 0]}, delta]}
+        for field, delta in deltas.items()
+    }
+    return [{"$set": totals}] + derived_fields_stages()
+
 
 class NicheAnalyzer:
+    # Champs de totaux maintenus de façon incrémentale dans `niches`
+    TOTAL_FIELDS = ['trend_count', 'total_views', 'total_engagement', 'video_count', 'total_revenue']
+    # Niches visibles: celles qui ont au moins une tendance
+    ACTIVE_FILTER = {"trend_count": {"$gt": 0}}
+
     def __init__(self, db):
         self.db = db
-    
-    async def analyze_niches(self) -> List[Dict]:
-        """Analyse toutes les niches et calcule leur profitabilité"""
-        # Récupère toutes les tendances
-        trends_cursor = self.db.trends.find({})
-        trends = await trends_cursor.to_list(length=1000)
-        
-        # Récupère toutes les analytics
-        analytics_cursor = self.db.analytics.find({})
-        analytics = await analytics_cursor.to_list(length=1000)
-        
-        # Groupe par niche
-        niche_data = {}
-        
-        # Analyse des tendances
+        # Écritures incrémentales (concurrentes entre elles) et recalcul complet (exclusif)
+        self._state = asyncio.Condition()
+        self._writers = 0
+        self._rebuilds_waiting = 0
+        self._rebuilding = False
+
+    @asynccontextmanager
+    async def writing(self):
+        """Encadre l'écriture de données sources (tendances, analytics, vidéos) et de leurs deltas
+
+        Un recalcul attend les écritures en cours et bloque les nouvelles: un delta ne peut
+        pas être compté par l'agrégation puis réappliqué (ou perdu) au moment du $merge.
+        """
+        async with self._state:
+            await self._state.wait_for(lambda: not self._rebuilding and not self._rebuilds_waiting)
+            self._writers += 1
+        try:
+            yield
+        finally:
+            async with self._state:
+                self._writers -= 1
+                self._state.notify_all()
+
+    @asynccontextmanager
+    async def _rebuild(self):
+        async with self._state:
+            self._rebuilds_waiting += 1
+            try:
+                await self._state.wait_for(lambda: not self._rebuilding and self._writers == 0)
+            finally:
+                self._rebuilds_waiting -= 1
+                self._state.notify_all()
+            self._rebuilding = True
+        try:
+            yield
+        finally:
+            async with self._state:
+                self._rebuilding = False
+                self._state.notify_all()
+
+    async def _apply_deltas(self, niche_deltas: Dict[str, Dict]):
+        """Applique des deltas de totaux par niche, en une écriture groupée"""
+        operations = []
+        for niche, deltas in niche_deltas.items():
+            # Les totaux absents sont initialisés pour que les moyennes restent définies
+            full_deltas = {field: deltas.get(field, 0) for field in self.TOTAL_FIELDS}
+            operations.append(UpdateOne({"name": niche}, _increment_update(full_deltas), upsert=True))
+
+        if operations:
+            await self.db.niches.bulk_write(operations, ordered=False)
+
+    async def apply_trends(self, trends: Iterable[Dict], sign: int = 1):
+        """Met à jour les totaux de niche pour des tendances ajoutées (sign=1) ou supprimées (sign=-1)"""
+        niche_deltas = {}
         for trend in trends:
             niche = trend.get('niche', 'general')
-            if niche not in niche_data:
-                niche_data[niche] = {
-                    'name': niche,
-                    'trend_count': 0,
-                    'total_views': 0,
-                    'total_engagement': 0,
-                    'video_count': 0,
-                    'total_revenue': 0,
-                    'avg_views': 0,
-                    'avg_engagement': 0,
-                    'avg_revenue': 0,
-                    'profitability_score': 0,
-                    'trending': False
-                }
-            
-            niche_data[niche]['trend_count'] += 1
-            niche_data[niche]['total_views'] += trend.get('views', 0)
-            niche_data[niche]['total_engagement'] += trend.get('engagement', 0)
-        
-        # Analyse des analytics (performances réelles)
+            deltas = niche_deltas.setdefault(niche, {'trend_count': 0, 'total_views': 0, 'total_engagement': 0})
+            deltas['trend_count'] += sign
+            deltas['total_views'] += sign * trend.get('views', 0)
+            deltas['total_engagement'] += sign * trend.get('engagement', 0)
+
+        await self._apply_deltas(niche_deltas)
+
+    async def apply_analytics(self, analytics: Iterable[Dict], videos: Dict[str, Dict] = None, sign: int = 1):
+        """Met à jour les revenus de niche pour des analytics ajoutées (sign=1) ou retirées (sign=-1)
+
+        `videos` permet de réutiliser des vidéos déjà chargées par l'appelant (une seule requête sinon).
+        """
+        analytics = list(analytics)
+        if videos is None:
+            video_ids = list({a.get('video_id') for a in analytics})
+            cursor = self.db.videos.find({"_id": {"$in": video_ids}}, {"niche": 1})
+            videos = {v['_id']: v async for v in cursor}
+        video_niches = {video_id: v.get('niche', 'general') for video_id, v in videos.items()}
+
+        niche_deltas = {}
         for analytic in analytics:
-            # Récupère la vidéo associée
-            video = await self.db.videos.find_one({"_id": analytic.get('video_id')})
-            if video:
-                niche = video.get('niche', 'general')
-                if niche in niche_data:
-                    niche_data[niche]['video_count'] += 1
-                    niche_data[niche]['total_revenue'] += analytic.get('revenue', 0)
-        
-        # Calcule les moyennes et scores
-        niche_list = []
-        for niche, data in niche_data.items():
-            if data['trend_count'] > 0:
-                data['avg_views'] = data['total_views'] / data['trend_count']
-                data['avg_engagement'] = data['total_engagement'] / data['trend_count']
-            
-            if data['video_count'] > 0:
-                data['avg_revenue'] = data['total_revenue'] / data['video_count']
-            
-            # Score de profitabilité (0-100)
-            # Facteurs: vues moyennes, engagement, revenus, tendances récentes
-            views_score = min(50, (data['avg_views'] / 100000) * 50)  # Max 50 points
-            engagement_score = min(20, (data['avg_engagement'] / 10000) * 20)  # Max 20 points
-            revenue_score = min(20, (data['avg_revenue'] / 100) * 20)  # Max 20 points
-            trending_score = 10 if data['trend_count'] >= 3 else 5  # 10 points si trending
-            
-            data['profitability_score'] = views_score + engagement_score + revenue_score + trending_score
-            data['trending'] = data['trend_count'] >= 3
-            
-            niche_list.append(data)
-        
-        # Trie par score de profitabilité
-        niche_list.sort(key=lambda x: x['profitability_score'], reverse=True)
-        
-        # Mise à jour dans la DB
-        for niche_info in niche_list:
-            await self.db.niches.update_one(
-                {"name": niche_info['name']},
-                {"$set": {
-                    **niche_info,
-                    "last_updated": datetime.utcnow()
+            niche = video_niches.get(analytic.get('video_id'))
+            if niche is None:
+                continue
+            deltas = niche_deltas.setdefault(niche, {'video_count': 0, 'total_revenue': 0})
+            deltas['video_count'] += sign
+            deltas['total_revenue'] += sign * analytic.get('revenue', 0)
+
+        await self._apply_deltas(niche_deltas)
+
+    async def analyze_niches(self) -> List[Dict]:
+        """Recalcule entièrement les statistiques de toutes les niches (backfill)
+
+        Tout est calculé par un pipeline d'agrégation: regroupement des tendances,
+        jointure analytics → vidéos, score de profitabilité, puis $merge dans `niches`.
+        Sérialisé avec les écritures de ce processus (writing()).
+        """
+        async with self._rebuild():
+            await self._rebuild_niches()
+        return await self.get_all_niches()
+
+    async def _rebuild_niches(self):
+        rebuild_id = str(uuid.uuid4())
+        zero_totals = {field: {"$sum": 0} for field in self.TOTAL_FIELDS}
+
+        pipeline = [
+            # Totaux des tendances par niche
+            {"$group": {
+                **zero_totals,
+                "_id": {"$ifNull": ["$niche", "general"]},
+                "trend_count": {"$sum": 1},
+                "total_views": {"$sum": {"$ifNull": ["$views", 0]}},
+                "total_engagement": {"$sum": {"$ifNull": ["$engagement", 0]}}
+            }},
+            # Revenus réels: analytics rattachées à la niche de leur vidéo
+            {"$unionWith": {"coll": "analytics", "pipeline": [
+                {"$lookup": {
+                    "from": "videos",
+                    "localField": "video_id",
+                    "foreignField": "_id",
+                    "pipeline": [{"$project": {"niche": 1}}],
+                    "as": "video"
                 }},
-                upsert=True
-            )
-        
-        return niche_list
-    
+                {"$unwind": "$video"},
+                {"$group": {
+                    **zero_totals,
+                    "_id": {"$ifNull": ["$video.niche", "general"]},
+                    "video_count": {"$sum": 1},
+                    "total_revenue": {"$sum": {"$ifNull": ["$revenue", 0]}}
+                }}
+            ]}},
+            {"$group": {"_id": "$_id", **{field: {"$sum": f"${field}"} for field in self.TOTAL_FIELDS}}},
+            {"$project": {"_id": 0, "name": "$_id", "rebuild_id": rebuild_id,
+                          **{field: 1 for field in self.TOTAL_FIELDS}}},
+            *derived_fields_stages(),
+            {"$merge": {"into": "niches", "on": "name", "whenMatched": "replace", "whenNotMatched": "insert"}}
+        ]
+
+        # $merge sur "name" exige un index unique (aussi déclaré dans services/indexes.py)
+        await self.db.niches.create_index("name", unique=True)
+        await self.db.trends.aggregate(pipeline, allowDiskUse=True).to_list(length=None)
+
+        # Les niches absentes du recalcul n'ont plus aucune donnée source
+        await self.db.niches.delete_many({"rebuild_id": {"$ne": rebuild_id}})
+
+    async def get_all_niches(self, limit: int = 0) -> List[Dict]:
+        """Retourne les niches ayant au moins une tendance, triées par profitabilité"""
+        cursor = self.db.niches.find(self.ACTIVE_FILTER).sort("profitability_score", -1).limit(limit)
+        return await cursor.to_list(length=limit or None)
+
     async def get_recommended_niches(self, limit: int = 5) -> List[Dict]:
-        """Retourne les niches les plus recommandées"""
-        # Analyse d'abord si pas fait récemment
-        await self.analyze_niches()
-        
-        # Récupère les top niches
-        cursor = self.db.niches.find({}).sort("profitability_score", -1).limit(limit)
-        niches = await cursor.to_list(length=limit)
-        
-        return niches
-    
+        """Retourne les niches les plus recommandées (lecture des statistiques maintenues)"""
+        return await self.get_all_niches(limit)
+
     async def search_viral_videos(self, niche: str, limit: int = 10) -> List[Dict]:
         """Recherche les vidéos virales dans une niche (basé sur les tendances ajoutées)"""
         cursor = self.db.trends.find({"niche": niche}).sort("views", -1).limit(limit)
         trends = await cursor.to_list(length=limit)
-        return trends
\ No newline at end of file
+        return trends
@@ -0,0 +1,335 @@
+import time
+import uuid
+import asyncio
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+from datetime import datetime
+
+
+
+class StageGraph:
+    """Graphe de dépendances entre étapes: chaque étape démarre dès que ses dépendances sont prêtes"""
+
+    def __init__(self):
+        self.stages: Dict[str, Dict] = {}
+
+    def add(self, name: str, func: Callable[..., Awaitable], deps: Iterable[str] = (),
+            summary: Optional[Callable[[object], Dict]] = None):
+        """Déclare une étape
+
+        `func` reçoit les résultats des dépendances en arguments nommés; `summary`
+        extrait de son résultat les détails à enregistrer dans la progression du job.
+        """
+        deps = tuple(deps)
+        for dep in deps:
+            if dep not in self.stages:
+                raise ValueError(f"Étape inconnue: {dep} (requise par {name})")
+        self.stages[name] = {"func": func, "deps": deps, "summary": summary}
+        return self
+
+    async def run(self, progress=None, results: Dict = None) -> Dict:
+        """Exécute le graphe et retourne les résultats et les durées de chaque étape
+
+        `results` est rempli au fil des étapes terminées: après un échec, l'appelant
+        y retrouve ce qui a déjà été produit (fichiers à nettoyer).
+        """
+        results = {} if results is None else results
+        timings = {}
+        origin = time.monotonic()
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_stage(name: str, stage: Dict):
+            await asyncio.gather(*[tasks[dep] for dep in stage["deps"]])
+            kwargs = {dep: results[dep] for dep in stage["deps"]}
+
+            started = time.monotonic()
+            if progress is not None:
+                async with progress.track(name) as details:
+                    results[name] = await stage["func"](**kwargs)
+                    if stage["summary"]:
+                        details.update(stage["summary"](results[name]))
+            else:
+                results[name] = await stage["func"](**kwargs)
+
+            timings[name] = {
+                "started_at": round(started - origin, 3),
+                "duration": round(time.monotonic() - started, 3)
+            }
+
+        # add() impose que les dépendances soient déclarées avant: l'ordre est topologique
+        for name, stage in self.stages.items():
+            tasks[name] = asyncio.create_task(run_stage(name, stage))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except Exception:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+
+        timings["total"] = {"started_at": 0.0, "duration": round(time.monotonic() - origin, 3)}
+        return {"results": results, "timings": timings}
+
+
+class GenerationPipeline:
+    """Enchaîne les étapes de génération d'une vidéo (script → images + voix + viralité → rendu)"""
+
+    def __init__(self, db, ai_service, video_service, learning_service):
+        self.db = db
+        self.ai_service = ai_service
+        self.video_service = video_service
+        # Service partagé avec le serveur (modèle de viralité inclus)
+        self.learning_service = learning_service
+
+    def build_graph(self, request: Dict, video_id: str) -> StageGraph:
+        """Construit le graphe d'étapes d'une génération
+
+        Sans profil de rendu explicite, seuls un proxy basse résolution et une miniature
+        sont rendus; images et voix sont conservées pour le rendu final à la demande.
+        """
+        ai_service = self.ai_service
+        video_service = self.video_service
+        # Texte du script publié dès qu'il est complet dans le flux de la réponse
+        script_ready = asyncio.Event()
+        early = {}
+
+        def publish_script(text: str):
+            if not script_ready.is_set():
+                early["text"] = text
+                script_ready.set()
+
+        async def script():
+            # Script déjà généré (ex: lot de vidéos): pas d'appel LLM
+            if request.get("script"):
+                result = request["script"]
+            else:
+                result = await ai_service.generate_script(
+                    niche=request["niche"],
+                    inspiration_url=request.get("inspiration_url"),
+                    tone=request.get("tone", "engageant"),
+                    on_script=publish_script
+                )
+            publish_script(result["script"])
+            return result
+
+        async def streamed_script_text():
+            await script_ready.wait()
+            return early["text"]
+
+        async def script_text(script):
+            return script["script"]
+
+        async def virality(script):
+            # Score déjà calculé par une notation groupée (lot de vidéos)
+            if request.get("virality_score") is not None:
+                return request["virality_score"]
+            return await ai_service.calculate_virality_score(script, request["niche"])
+
+        async def candidates():
+            return await ai_service.rank_scripts(
+                request["niche"],
+                request["candidates"],
+                tone=request.get("tone", "engageant"),
+                inspirations=[{"url": request["inspiration_url"]}] if request.get("inspiration_url") else None
+            )
+
+        async def best_script(candidates):
+            return candidates[0]["script"]
+
+        async def best_score(candidates):
+            return candidates[0]["virality_score"]
+
+        async def images(script_text):
+            image_results = await ai_service.generate_image_results(script_text, count=5)
+            return {
+                "images": [img for result in image_results for img in result['images']],
+                "errors": [
+                    {"index": r['index'], "prompt": r['prompt'], "error": r['error'], "attempts": r['attempts']}
+                    for r in image_results if r['error']
+                ]
+            }
+
+        async def voiceover(script_text):
+            return await ai_service.generate_voiceover_segments(
+                script_text,
+                voice=request.get("voice", "nova")
+            )
+
+        def timed(script, voiceover):
+            # Timings par phrase: coupes d'images alignées sur les fins de phrases
+            return {**script, "sentence_timings": voiceover["segments"]}
+
+        async def render(script, images, voiceover):
+            return await video_service.create_video(
+                images['images'], voiceover["audio"], timed(script, voiceover),
+                backend=request.get("render_backend"),
+                profile=request.get("render_profile")
+            )
+
+        async def proxy(script, images, voiceover):
+            return await video_service.create_video(
+                images['images'], voiceover["audio"], timed(script, voiceover),
+                backend=request.get("render_backend"),
+                profile=video_service.proxy_profile
+            )
+
+        async def thumbnail(images):
+            return await video_service.create_video(images['images'], b"", {}, profile="thumbnail")
+
+        async def assets(images, voiceover):
+            return await asyncio.to_thread(video_service.save_assets, video_id, images['images'], voiceover["audio"])
+
+        # Viralité, images et voix ne dépendent que du script; le rendu démarre
+        # dès que les images et l'audio sont prêts, sans attendre le score
+        graph = StageGraph()
+        if (request.get("candidates") or 1) > 1 and not request.get("script"):
+            # N scripts générés et notés en deux appels; seul le meilleur passe aux étapes suivantes
+            graph = (
+                graph
+                .add("candidates", candidates,
+                     summary=lambda r: {"scores": [c["virality_score"] for c in r]})
+                .add("script", best_script, deps=["candidates"])
+                .add("virality", best_score, deps=["candidates"])
+                .add("script_text", script_text, deps=["script"])
+            )
+        else:
+            # Images et voix démarrent dès que le champ `script` est reçu, sans attendre la fin de la réponse
+            graph = (
+                graph
+                .add("script", script)
+                .add("virality", virality, deps=["script"])
+                .add("script_text", streamed_script_text)
+            )
+
+        graph = (
+            graph
+            .add("images", images, deps=["script_text"],
+                 summary=lambda r: {"generated": len(r['images']), "errors": r['errors']})
+            .add("voiceover", voiceover, deps=["script_text"],
+                 summary=lambda r: {"sentences": len(r["segments"])})
+        )
+        if request.get("render_profile"):
+            return graph.add("render", render, deps=["script", "images", "voiceover"])
+
+        return (
+            graph
+            .add("thumbnail", thumbnail, deps=["images"])
+            .add("proxy", proxy, deps=["script", "images", "voiceover"])
+            .add("assets", assets, deps=["images", "voiceover"])
+        )
+
+    def _video_doc(self, job: Dict, request: Dict, video_id: str, outcome: Dict) -> Dict:
+        """Document de la vidéo générée à partir des résultats des étapes"""
+        results = outcome["results"]
+        video_doc = {
+            "_id": video_id,
+            "job_id": job["_id"],
+            "title": results["script"]['title'],
+            "niche": request["niche"],
+            "script_data": {**results["script"], "sentence_timings": results["voiceover"]["segments"]},
+            "virality_score": results["virality"],
+            "image_errors": results["images"]["errors"],
+            "candidates": [
+                {"title": c["script"].get("title"), "virality_score": c["virality_score"]}
+                for c in results.get("candidates", [])
+            ],
+            "render_backend": request.get("render_backend"),
+            "batch_id": request.get("batch_id"),
+            "video_url": f"/api/videos/{video_id}/download",
+            "stage_timings": outcome["timings"],
+            "created_at": datetime.utcnow()
+        }
+        if "render" in results:
+            video_doc.update({
+                "video_path": results["render"],
+                "render_profile": request["render_profile"],
+                "status": "completed"
+            })
+        else:
+            video_doc.update({
+                "video_path": None,
+                "proxy_path": results["proxy"],
+                "thumbnail_path": results["thumbnail"],
+                "assets_dir": results["assets"],
+                "render_profile": self.video_service.proxy_profile,
+                "status": "proxy"
+            })
+        return video_doc
+
+    async def run(self, job: Dict, progress) -> Dict:
+        """Exécute la génération complète pour un job `generate_video`"""
+        request = job["payload"]
+        video_id = str(uuid.uuid4())
+
+        results = {}
+        try:
+            outcome = await self.build_graph(request, video_id).run(progress, results)
+            # Sauvegarde dans la DB
+            video_doc = self._video_doc(job, request, video_id, outcome)
+            await self.db.videos.insert_one(video_doc)
+        except (Exception, asyncio.CancelledError):
+            # Fichiers des étapes terminées avant l'échec (proxy, miniature, assets, rendu)
+            self.video_service.delete_files({
+                "video_path": results.get("render"),
+                "proxy_path": results.get("proxy"),
+                "thumbnail_path": results.get("thumbnail"),
+                "assets_dir": results.get("assets")
+            })
+            raise
+
+        # Obtient des suggestions d'amélioration
+        suggestions = await self.learning_service.suggest_improvements(video_doc)
+
+        return {
+            "video_id": video_id,
+            "script": video_doc["script_data"],
+            "virality_score": video_doc["virality_score"],
+            "video_url": video_doc['video_url'],
+            "status": video_doc['status'],
+            "stage_timings": outcome["timings"],
+            "suggestions": suggestions,
+            "message": "Vidéo générée avec succès!" if video_doc['status'] == "completed"
+            else "Aperçu généré: finalisez la vidéo pour le rendu complet"
+        }
+
+    async def finalize(self, job: Dict, progress) -> Dict:
+        """Rendu final d'une vidéo en statut proxy (job `finalize_video`), depuis les assets conservés"""
+        payload = job["payload"]
+        video = await self.db.videos.find_one({"_id": payload["video_id"]})
+        if not video or not video.get("assets_dir"):
+            raise ValueError("Vidéo ou assets introuvables pour le rendu final")
+
+        profile = payload.get("render_profile") or self.video_service.profile
+        try:
+            async with progress.track("render") as details:
+                images, audio_bytes = await asyncio.to_thread(self.video_service.load_assets, video["assets_dir"])
+                video_path = await self.video_service.create_video(
+                    images, audio_bytes, video["script_data"],
+                    backend=payload.get("render_backend") or video.get("render_backend"),
+                    profile=profile
+                )
+                details["profile"] = profile
+        except Exception:
+            # Le proxy reste disponible: la finalisation pourra être relancée
+            await self.db.videos.update_one({"_id": video["_id"]}, {"$set": {"status": "proxy"}})
+            raise
+
+        # Le rendu final remplace le proxy; assets et proxy ne sont plus nécessaires
+        await self.db.videos.update_one({"_id": video["_id"]}, {
+            "$set": {
+                "video_path": video_path,
+                "proxy_path": None,
+                "assets_dir": None,
+                "render_profile": profile,
+                "status": "completed",
+                "finalized_at": datetime.utcnow()
+            }
+        })
+        self.video_service.delete_files({"proxy_path": video.get("proxy_path"), "assets_dir": video["assets_dir"]})
+
+        return {
+            "video_id": video["_id"],
+            "video_url": video["video_url"],
+            "status": "completed",
+            "message": "Rendu final terminé"
+        }
@@ -0,0 +1,56 @@
+import os
+import asyncio
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+class RenderError(Exception):
+    """Levée quand un rendu échoue à cause du processus de rendu lui-même"""
+
+
+def _init_render_process(threads: int):
+    """Limite les bibliothèques natives au nombre de threads alloué par rendu"""
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = str(threads)
+
+
+class RenderEngine:
+    """Exécute les rendus vidéo dans un pool de processus, hors de la boucle d'événements"""
+
+    def __init__(self, processes: int = None, threads: int = None):
+        self.processes = processes or int(os.getenv("RENDER_PROCESSES", "2"))
+        self.threads = threads or int(os.getenv("RENDER_THREADS", "2"))
+        self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # "spawn" évite d'hériter de l'état de la boucle asyncio et du client Mongo
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_render_process,
+                initargs=(self.threads,)
+            )
+        return self._executor
+
+    async def run(self, func, *args, **kwargs):
+        """Exécute `func` dans un processus de rendu et retourne son résultat"""
+        executor = self._get_executor()
+        loop = asyncio.get_running_loop()
+
+        try:
+            return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+        except BrokenProcessPool as e:
+            # Un processus a crashé (segfault ffmpeg, OOM...): on recrée le pool
+            if self._executor is executor:
+                self._executor = None
+                executor.shutdown(wait=False, cancel_futures=True)
+            raise RenderError("Le processus de rendu s'est arrêté de façon inattendue") from e
+
+    def shutdown(self):
+        """Arrête le pool de processus"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
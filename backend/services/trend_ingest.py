@@ -0,0 +1,180 @@
+import os
+import csv
+import json
+import uuid
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, List, Tuple
+from datetime import datetime
+from pydantic import ValidationError
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+# Code MongoDB d'une violation d'index unique
+DUPLICATE_KEY = 11000
+
+
+async def iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Découpe un flux d'octets en lignes décodées (UTF-8), sans tout charger en mémoire"""
+    buffer = b""
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8-sig").rstrip("\r")
+    if buffer:
+        yield buffer.decode("utf-8-sig").rstrip("\r")
+
+
+def parse_json_array(body: bytes) -> List:
+    """Décode un corps JSON qui doit être un tableau (ValueError sinon)"""
+    rows = json.loads(body)
+    if not isinstance(rows, list):
+        raise ValueError("Le corps JSON doit être un tableau")
+    return rows
+
+
+async def iter_json_array(rows: List) -> AsyncIterator[Dict]:
+    """Lignes d'un tableau JSON déjà décodé"""
+    for row in rows:
+        yield row
+
+
+async def iter_ndjson(stream: AsyncIterator[bytes]) -> AsyncIterator[Dict]:
+    """Lignes d'un flux NDJSON (un objet JSON par ligne); une ligne invalide donne une erreur de ligne"""
+    async for line in iter_lines(stream):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            yield {"__error__": f"JSON invalide: {e}"}
+
+
+async def iter_csv(stream: AsyncIterator[bytes]) -> AsyncIterator[Dict]:
+    """Lignes d'un flux CSV avec en-tête (les champs entre guillemets ne peuvent pas contenir de saut de ligne)"""
+    header = None
+    async for line in iter_lines(stream):
+        if not line.strip():
+            continue
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [h.strip() for h in values]
+            continue
+        # Cellules vides = champs absents (ex: url optionnelle)
+        yield {key: value for key, value in zip(header, values) if value != ""}
+
+
+class ChunkedIngestService(ABC):
+    """Base des imports en masse: découpe le flux de lignes en lots et tient le rapport d'import"""
+
+    MAX_REPORTED_ERRORS = 1000
+
+    def __init__(self, db, chunk_size: int = None):
+        self.db = db
+        self.chunk_size = chunk_size or int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+
+    async def ingest(self, rows: AsyncIterator[Dict], model) -> Dict:
+        """Valide et insère les lignes; retourne un rapport avec les erreurs par ligne (numérotées à partir de 1)"""
+        report = {"received": 0, "inserted": 0, "duplicates": 0, "failed": 0, "errors": []}
+        chunk: List[Tuple[int, Dict]] = []
+
+        async for row in rows:
+            report["received"] += 1
+            chunk.append((report["received"], row))
+            if len(chunk) >= self.chunk_size:
+                await self._process_chunk(chunk, model, report)
+                chunk = []
+        if chunk:
+            await self._process_chunk(chunk, model, report)
+
+        return report
+
+    def _error(self, report: Dict, row_number: int, error):
+        report["failed"] += 1
+        if len(report["errors"]) < self.MAX_REPORTED_ERRORS:
+            report["errors"].append({"row": row_number, "error": error})
+
+    def _validate(self, report: Dict, row_number: int, row, model):
+        """Valide une ligne avec le modèle; retourne le dict validé ou None (erreur enregistrée)"""
+        if not isinstance(row, dict):
+            self._error(report, row_number, "La ligne doit être un objet")
+            return None
+        if "__error__" in row:
+            self._error(report, row_number, row["__error__"])
+            return None
+        try:
+            return model(**row).dict()
+        except ValidationError as e:
+            self._error(report, row_number, json.loads(e.json()))
+            return None
+
+    @abstractmethod
+    async def _process_chunk(self, chunk: List[Tuple[int, Dict]], model, report: Dict):
+        """Valide et écrit un lot de lignes numérotées, en mettant à jour le rapport"""
+
+
+class TrendIngestService(ChunkedIngestService):
+    """Import en masse de tendances: validation par lots, upsert sur l'URL, agrégats de niche par lot"""
+
+    def __init__(self, db, niche_analyzer, chunk_size: int = None):
+        super().__init__(db, chunk_size)
+        self.niche_analyzer = niche_analyzer
+
+    async def _process_chunk(self, chunk: List[Tuple[int, Dict]], model, report: Dict):
+        now = datetime.utcnow()
+        operations = []
+        op_rows: List[Tuple[int, Dict]] = []
+        seen_urls = set()
+
+        for row_number, row in chunk:
+            trend_data = self._validate(report, row_number, row, model)
+            if trend_data is None:
+                continue
+
+            if not trend_data.get('date_added'):
+                trend_data['date_added'] = now
+            trend_data['_id'] = str(uuid.uuid4())
+
+            url = trend_data.get('url')
+            if url:
+                # Déduplication dans le lot, puis en base via upsert sur l'URL
+                if url in seen_urls:
+                    report["duplicates"] += 1
+                    continue
+                seen_urls.add(url)
+                operations.append(UpdateOne({"url": url}, {"$setOnInsert": trend_data}, upsert=True))
+            else:
+                operations.append(InsertOne(trend_data))
+            op_rows.append((row_number, trend_data))
+
+        if not operations:
+            return
+
+        # Écriture et deltas de niche ensemble: exclusifs avec un recalcul complet des niches
+        async with self.niche_analyzer.writing():
+            failed_ops = set()
+            try:
+                result = await self.db.trends.bulk_write(operations, ordered=False)
+                upserted = set(result.upserted_ids.keys())
+            except BulkWriteError as e:
+                upserted = {item['index'] for item in e.details.get('upserted', [])}
+                for error in e.details.get('writeErrors', []):
+                    failed_ops.add(error['index'])
+                    if error.get('code') == DUPLICATE_KEY:
+                        # URL insérée entre-temps par un import concurrent (index unique)
+                        report["duplicates"] += 1
+                    else:
+                        self._error(report, op_rows[error['index']][0], error.get('errmsg', 'Erreur d\'écriture'))
+
+            inserted_docs = []
+            for i, (operation, (_, trend_data)) in enumerate(zip(operations, op_rows)):
+                if i in failed_ops:
+                    continue
+                if isinstance(operation, InsertOne) or i in upserted:
+                    inserted_docs.append(trend_data)
+                else:
+                    report["duplicates"] += 1
+
+            report["inserted"] += len(inserted_docs)
+            # Une seule mise à jour des agrégats de niche par lot
+            await self.niche_analyzer.apply_trends(inserted_docs)
@@ -0,0 +1,197 @@
+import os
+import hashlib
+import asyncio
+from collections import OrderedDict
+from datetime import timezone
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional, Tuple
+from urllib.parse import quote
+from starlette.requests import Request
+from starlette.responses import Response
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Décode un en-tête Range à plage unique en (début, fin incluse)
+
+    Retourne None si l'en-tête est ignoré (autre unité, plages multiples),
+    RangeNotSatisfiable si la plage est hors du fichier.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    start, sep, end = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if not start:
+            # Suffixe: les N derniers octets
+            length = int(end)
+            if length <= 0:
+                raise RangeNotSatisfiable()
+            return max(size - length, 0), size - 1
+        first = int(start)
+        last = int(end) if end else size - 1
+    except ValueError:
+        return None
+
+    if first >= size or first > last:
+        raise RangeNotSatisfiable()
+    return first, min(last, size - 1)
+
+
+class FileRangeResponse(Response):
+    """Réponse qui envoie une plage d'un fichier, en zéro-copie si le serveur ASGI le permet"""
+
+    def __init__(self, path: str, start: int, length: int, status_code: int, headers: dict,
+                 chunk_size: int, send_body: bool = True):
+        super().__init__(status_code=status_code, headers=headers)
+        self.path = path
+        self.start = start
+        self.length = length
+        self.chunk_size = chunk_size
+        self.send_body = send_body
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+
+        if not self.send_body or self.length == 0:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        with open(self.path, "rb") as file:
+            # Extension ASGI zerocopysend: le serveur utilise sendfile() sur le descripteur
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": file,
+                    "offset": self.start,
+                    "count": self.length
+                })
+                return
+
+            file.seek(self.start)
+            remaining = self.length
+            while remaining > 0:
+                chunk = await asyncio.to_thread(file.read, min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                # Fichier tronqué pendant l'envoi: termine proprement la réponse
+                await send({"type": "http.response.body", "body": b""})
+
+
+class VideoDelivery:
+    """Diffusion des vidéos: requêtes Range (206), ETag fort sur le contenu et requêtes conditionnelles"""
+
+    MAX_ETAGS = 1024
+
+    def __init__(self, chunk_size: int = None):
+        self.chunk_size = chunk_size or int(os.getenv("VIDEO_CHUNK_SIZE", str(256 * 1024)))
+        # Empreintes par chemin, invalidées si la taille ou la date de modification changent
+        self._etags: "OrderedDict[str, Tuple[int, int, str]]" = OrderedDict()
+
+    @staticmethod
+    def _hash_file(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()[:32]
+
+    async def etag(self, path: str, stat: os.stat_result) -> str:
+        """ETag fort dérivé du hash du contenu (calculé une fois par version du fichier)"""
+        cached = self._etags.get(path)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            self._etags.move_to_end(path)
+            return cached[2]
+
+        etag = f'"{await asyncio.to_thread(self._hash_file, path)}"'
+        self._etags[path] = (stat.st_mtime_ns, stat.st_size, etag)
+        if len(self._etags) > self.MAX_ETAGS:
+            self._etags.popitem(last=False)
+        return etag
+
+    def forget(self, path: str):
+        """À appeler quand un fichier est supprimé ou remplacé"""
+        self._etags.pop(path, None)
+
+    @staticmethod
+    def _etag_matches(header: str, etag: str) -> bool:
+        tags = [tag.strip() for tag in header.split(",")]
+        # Comparaison faible pour If-None-Match (RFC 9110): W/"x" correspond à "x"
+        return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+    @staticmethod
+    def _not_modified_since(header: str, mtime: float) -> bool:
+        try:
+            since = parsedate_to_datetime(header)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return int(mtime) <= since.timestamp()
+
+    def _range_applies(self, request: Request, etag: str, last_modified: str) -> bool:
+        """If-Range: la plage n'est servie que si le fichier n'a pas changé"""
+        if_range = request.headers.get("if-range")
+        if not if_range:
+            return True
+        return if_range.strip() in (etag, last_modified)
+
+    async def serve(self, request: Request, path: str, media_type: str = "video/mp4",
+                    filename: Optional[str] = None, inline: bool = False) -> Response:
+        """Réponse 200, 206, 304 ou 416 pour un fichier selon les en-têtes de la requête"""
+        stat = await asyncio.to_thread(os.stat, path)
+        size = stat.st_size
+        etag = await self.etag(path, stat)
+        last_modified = formatdate(stat.st_mtime, usegmt=True)
+
+        headers = {
+            "accept-ranges": "bytes",
+            "etag": etag,
+            "last-modified": last_modified,
+            # Revalidation systématique: l'ETag rend la revalidation quasi gratuite
+            "cache-control": "public, no-cache",
+        }
+
+        # If-None-Match prévaut sur If-Modified-Since
+        if_none_match = request.headers.get("if-none-match")
+        if_modified_since = request.headers.get("if-modified-since")
+        if (if_none_match and self._etag_matches(if_none_match, etag)) or \
+                (not if_none_match and if_modified_since and self._not_modified_since(if_modified_since, stat.st_mtime)):
+            return Response(status_code=304, headers=headers)
+
+        headers["content-type"] = media_type
+        if filename:
+            disposition = "inline" if inline else "attachment"
+            quoted = quote(filename)
+            if quoted != filename:
+                headers["content-disposition"] = f"{disposition}; filename*=utf-8''{quoted}"
+            else:
+                headers["content-disposition"] = f'{disposition}; filename="{filename}"'
+
+        start, end, status_code = 0, size - 1, 200
+        range_header = request.headers.get("range")
+        if range_header and self._range_applies(request, etag, last_modified):
+            try:
+                byte_range = parse_range(range_header, size)
+            except RangeNotSatisfiable:
+                return Response(status_code=416, headers={**headers, "content-range": f"bytes */{size}"})
+            if byte_range:
+                start, end = byte_range
+                status_code = 206
+                headers["content-range"] = f"bytes {start}-{end}/{size}"
+
+        length = end - start + 1 if size else 0
+        headers["content-length"] = str(length)
+        return FileRangeResponse(
+            path, start, length, status_code, headers, self.chunk_size,
+            send_body=request.method != "HEAD"
+        )
@@ -1,92 +1,410 @@
+import io
 import os
 import uuid
 import base64
+import itertools
+import json
+import shutil
+import threading
+import subprocess
+import numpy as np
+import ffmpeg
+from PIL import Image, ImageOps
 from moviepy.editor import *
 from pydub import AudioSegment
-import tempfile
-import shutil
 
-class VideoService:
-    def __init__(self):
-        self.output_dir = "/app/backend/generated_videos"
-        os.makedirs(self.output_dir, exist_ok=True)
-    
-    async def create_video(self, images: list, audio_bytes: bytes, script_data: dict) -> str:
-        """Assemble une vidéo complète avec images, audio, et sous-titres"""
-        video_id = str(uuid.uuid4())
-        temp_dir = tempfile.mkdtemp()
-        
+from services.render_engine import RenderEngine
+
+
+# Profils de rendu: brouillon/aperçu rapides pour la relecture, production pour la publication.
+# Seuls les réglages x264 portables (preset, CRF) sont utilisés: pas d'encodeur matériel requis.
+RENDER_PROFILES = {
+    "draft": {"width": 360, "height": 640, "fps": 15, "preset": "ultrafast", "crf": 32, "audio_bitrate": "64k"},
+    "preview": {"width": 540, "height": 960, "fps": 24, "preset": "ultrafast", "crf": 28, "audio_bitrate": "96k"},
+    "production": {"width": 1080, "height": 1920, "fps": 30, "preset": "medium", "crf": 20, "audio_bitrate": "160k"},
+    # Une seule image JPEG, sans audio ni encodage vidéo
+    "thumbnail": {"width": 540, "height": 960, "thumbnail": True, "quality": 85},
+}
+
+
+def decode_image(img_data: dict) -> np.ndarray:
+    """Décode une image base64 directement en tableau RGB, sans fichier intermédiaire"""
+    with Image.open(io.BytesIO(base64.b64decode(img_data['data']))) as img:
+        return np.array(img.convert("RGB"))
+
+
+def decode_audio(audio_bytes: bytes, frame_rate: int = 44100, channels: int = 2) -> AudioSegment:
+    """Décode l'audio en PCM 16 bits par pipes ffmpeg (stdin → stdout), sans fichier temporaire"""
+    pcm, _ = (
+        ffmpeg
+        .input('pipe:0')
+        .output('pipe:1', format='s16le', acodec='pcm_s16le', ar=frame_rate, ac=channels)
+        .global_args('-loglevel', 'error')
+        .run(input=audio_bytes, capture_stdout=True, capture_stderr=True)
+    )
+    return AudioSegment(data=pcm, sample_width=2, frame_rate=frame_rate, channels=channels)
+
+
+def encode_audio(audio: AudioSegment, bitrate: str = "128k") -> bytes:
+    """Encode un audio PCM en MP3 par pipes ffmpeg (stdin → stdout), sans fichier temporaire"""
+    mp3, _ = (
+        ffmpeg
+        .input('pipe:0', format='s16le', ar=audio.frame_rate, ac=audio.channels)
+        .output('pipe:1', format='mp3', audio_bitrate=bitrate)
+        .global_args('-loglevel', 'error')
+        .run(input=audio.raw_data, capture_stdout=True, capture_stderr=True)
+    )
+    return mp3
+
+
+def _write_pipe(fd: int, data: bytes):
+    try:
+        with os.fdopen(fd, "wb") as pipe:
+            pipe.write(data)
+    except BrokenPipeError:
+        # ffmpeg s'est arrêté: l'erreur est remontée par le processus principal
+        pass
+
+
+def _run_ffmpeg(args: list, pipes: list, frames=None):
+    """Lance ffmpeg avec des entrées en pipes: `pipes` = [(fd lecture, fd écriture, données)]
+
+    Les données de chaque pipe sont écrites par un thread (ffmpeg lit ses entrées de façon
+    entrelacée); `frames`, s'il est fourni, est envoyé sur stdin depuis le thread courant.
+    """
+    read_fds = tuple(read_fd for read_fd, _, _ in pipes)
+    try:
+        process = subprocess.Popen(
+            args,
+            stdin=subprocess.PIPE if frames is not None else subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            pass_fds=read_fds
+        )
+    except Exception:
+        for _, write_fd, _ in pipes:
+            os.close(write_fd)
+        raise
+    finally:
+        for read_fd in read_fds:
+            os.close(read_fd)
+
+    writers = [
+        threading.Thread(target=_write_pipe, args=(write_fd, data), daemon=True)
+        for _, write_fd, data in pipes
+    ]
+    for writer in writers:
+        writer.start()
+
+    if frames is not None:
+        try:
+            for frame in frames:
+                process.stdin.write(frame.tobytes())
+        except BrokenPipeError:
+            pass
+        finally:
+            process.stdin.close()
+
+    stderr = process.stderr.read()
+    process.wait()
+    for writer in writers:
+        writer.join()
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg a échoué: {stderr.decode(errors='replace').strip()}")
+
+
+def _close_pipes(pipes: list):
+    """Ferme les deux extrémités de pipes non transmis à _run_ffmpeg (échec avant le lancement)"""
+    for read_fd, write_fd, _ in pipes:
+        os.close(read_fd)
+        os.close(write_fd)
+
+
+def _audio_input(audio: AudioSegment, pipes: list):
+    """Entrée ffmpeg lisant l'audio PCM depuis un nouveau pipe"""
+    read_fd, write_fd = os.pipe()
+    pipes.append((read_fd, write_fd, audio.raw_data))
+    return ffmpeg.input(f'pipe:{read_fd}', format='s16le', ar=audio.frame_rate, ac=audio.channels)
+
+
+def _output_args(video, audio_in, output_path: str, threads: int, profile: dict) -> list:
+    return (
+        ffmpeg
+        .output(video, audio_in.audio, output_path,
+                vcodec='libx264', preset=profile['preset'], crf=profile['crf'], pix_fmt='yuv420p',
+                acodec='aac', audio_bitrate=profile['audio_bitrate'], threads=threads, movflags='+faststart')
+        .global_args('-loglevel', 'error')
+        .overwrite_output()
+        .compile()
+    )
+
+
+def encode_stream(frames, audio: AudioSegment, output_path: str, profile: dict, threads: int):
+    """Encode des images brutes (RGB) et l'audio PCM vers un MP4 via des pipes ffmpeg
+
+    Les images passent par stdin, l'audio par un second pipe hérité par ffmpeg (pass_fds):
+    aucune donnée ne transite par le disque avant le fichier final.
+    """
+    frames = iter(frames)
+    first_frame = next(frames)
+    height, width = first_frame.shape[:2]
+
+    pipes = []
+    try:
+        video_in = ffmpeg.input('pipe:0', format='rawvideo', pix_fmt='rgb24', s=f'{width}x{height}', framerate=profile['fps'])
+        audio_in = _audio_input(audio, pipes)
+        # libx264 en yuv420p exige des dimensions paires
+        video = video_in.video.filter('scale', 'trunc(iw/2)*2', 'trunc(ih/2)*2')
+        args = _output_args(video, audio_in, output_path, threads, profile)
+
+        # À partir d'ici, _run_ffmpeg ferme lui-même les pipes
+        owned, pipes = pipes, []
+        _run_ffmpeg(args, owned, itertools.chain([first_frame], frames))
+    finally:
+        _close_pipes(pipes)
+
+
+def image_cuts(total_duration: float, count: int, timings: list = None) -> list:
+    """Bornes (en secondes) des `count` images sur la durée de l'audio
+
+    Chaque coupe est placée sur la fin de phrase la plus proche d'une répartition uniforme,
+    dans une fenêtre d'une demi-image autour; sans phrase dans la fenêtre, la coupe reste uniforme.
+    """
+    step = total_duration / count
+    ends = [segment['end'] for segment in timings or []]
+    cuts = [0.0]
+    for k in range(1, count):
+        uniform = k * step
+        nearby = [end for end in ends if uniform - step / 2 <= end < uniform + step / 2]
+        cuts.append(min(nearby, key=lambda end: abs(end - uniform)) if nearby else uniform)
+    cuts.append(total_duration)
+    return cuts
+
+
+def _center_crop(frame: np.ndarray, width: int, height: int) -> np.ndarray:
+    """Recadre une image au centre aux dimensions données"""
+    top = (frame.shape[0] - height) // 2
+    left = (frame.shape[1] - width) // 2
+    return frame[top:top + height, left:left + width]
+
+
+def render_video(images: list, audio_bytes: bytes, script_data: dict, output_dir: str, threads: int,
+                 profile: dict = None) -> str:
+    """Assemble la vidéo de manière synchrone (exécuté dans un processus de rendu)"""
+    video_id = str(uuid.uuid4())
+    profile = profile or RENDER_PROFILES["production"]
+    fps = profile['fps']
+    width, height = profile['width'], profile['height']
+
+    try:
+        # Décode l'audio en mémoire
+        audio = decode_audio(audio_bytes)
+        total_duration = audio.duration_seconds
+
+        # Prépare les images
+        image_clips = []
+        cuts = image_cuts(total_duration, len(images), script_data.get('sentence_timings')) if images else []
+
+        for i, img_data in enumerate(images):
+            # Crée un clip d'image à partir du tableau décodé
+            duration = cuts[i + 1] - cuts[i]
+            img_clip = ImageClip(decode_image(img_data), duration=duration)
+            # Format vertical 9:16: remplit le cadre (comme le rendu ffmpeg), arrondi au pixel supérieur
+            scale = max(width / img_clip.w, height / img_clip.h)
+            img_clip = img_clip.resize((max(width, round(img_clip.w * scale)), max(height, round(img_clip.h * scale))))
+
+            # Ajoute un effet de zoom léger, puis recadre au centre aux dimensions du profil
+            img_clip = img_clip.fx(vfx.resize, lambda t, duration=duration: 1 + 0.05 * t / duration)
+            img_clip = img_clip.fl(lambda get_frame, t: _center_crop(get_frame(t), width, height))
+            img_clip.size = (width, height)
+
+            image_clips.append(img_clip)
+
+        # Concatène les clips d'images
+        if image_clips:
+            video_clip = concatenate_videoclips(image_clips, method="compose")
+        else:
+            # Fallback: clip noir si pas d'images
+            video_clip = ColorClip(size=(width, height), color=(0, 0, 0), duration=total_duration)
+
+        # TODO: Ajouter les sous-titres (nécessite moviepy avec TextClip)
+        # Pour l'instant, on skip les sous-titres pour éviter les dépendances ImageMagick
+
+        # Export final: les images sont envoyées à ffmpeg au fil du rendu
+        output_path = os.path.join(output_dir, f"{video_id}.mp4")
+        encode_stream(video_clip.iter_frames(fps=fps, dtype='uint8'), audio, output_path, profile, threads)
+
+        # Cleanup
+        video_clip.close()
+
+        return output_path
+
+    except Exception as e:
+        print(f"Error creating video: {e}")
+        raise
+
+def render_video_ffmpeg(images: list, audio_bytes: bytes, script_data: dict, output_dir: str, threads: int,
+                        profile: dict = None) -> str:
+    """Assemble la vidéo avec un seul graphe de filtres ffmpeg (zoompan, concat, audio)
+
+    Même contrat que render_video; le zoom et l'enchaînement sont calculés par ffmpeg
+    au lieu d'un rééchantillonnage image par image en Python.
+    """
+    video_id = str(uuid.uuid4())
+    profile = profile or RENDER_PROFILES["production"]
+    fps = profile['fps']
+    width, height = profile['width'], profile['height']
+
+    try:
+        audio = decode_audio(audio_bytes)
+        total_duration = audio.duration_seconds
+        total_frames = max(1, round(total_duration * fps))
+
+        segments = []
+        cuts = image_cuts(total_duration, len(images), script_data.get('sentence_timings')) if images else []
+        # Bornes en images, strictement croissantes, couvrant exactement la durée de l'audio
+        bounds = [0]
+        for cut in cuts[1:-1]:
+            bounds.append(max(bounds[-1] + 1, round(cut * fps)))
+        bounds.append(max(bounds[-1] + 1, total_frames))
+
+        pipes = []
         try:
-            # Sauvegarde l'audio
-            audio_path = os.path.join(temp_dir, "audio.mp3")
-            with open(audio_path, "wb") as f:
-                f.write(audio_bytes)
-            
-            # Get audio duration
-            audio_clip = AudioFileClip(audio_path)
-            total_duration = audio_clip.duration
-            
-            # Prépare les images
-            image_clips = []
-            duration_per_image = total_duration / len(images) if images else 5
-            
             for i, img_data in enumerate(images):
-                # Décode et sauvegarde l'image
-                img_path = os.path.join(temp_dir, f"image_{i}.png")
-                img_bytes = base64.b64decode(img_data['data'])
-                with open(img_path, "wb") as f:
-                    f.write(img_bytes)
-                
-                # Crée un clip d'image
-                img_clip = ImageClip(img_path, duration=duration_per_image)
-                img_clip = img_clip.resize(height=1920)  # Format vertical 9:16
-                
-                # Ajoute un effet de zoom léger
-                img_clip = img_clip.fx(vfx.resize, lambda t: 1 + 0.05 * t / duration_per_image)
-                
-                image_clips.append(img_clip)
-            
-            # Concatène les clips d'images
-            if image_clips:
-                video_clip = concatenate_videoclips(image_clips, method="compose")
+                frames = bounds[i + 1] - bounds[i]
+                image_bytes = base64.b64decode(img_data['data'])
+                read_fd, write_fd = os.pipe()
+                pipes.append((read_fd, write_fd, image_bytes))
+
+                segment = (
+                    ffmpeg.input(f'pipe:{read_fd}', format='image2pipe')
+                    # Format vertical 9:16: remplit le cadre puis recadre au centre
+                    .filter('scale', width, height, force_original_aspect_ratio='increase')
+                    .filter('crop', width, height)
+                    # Zoom léger de 1 à 1.05 sur la durée de l'image
+                    .filter('zoompan', z=f'1+0.05*on/{frames}', d=frames, s=f'{width}x{height}', fps=fps,
+                            x='iw/2-(iw/zoom/2)', y='ih/2-(ih/zoom/2)')
+                    .filter('setsar', 1)
+                )
+                segments.append(segment)
+
+            if segments:
+                video = ffmpeg.concat(*segments, v=1, a=0) if len(segments) > 1 else segments[0]
             else:
                 # Fallback: clip noir si pas d'images
-                video_clip = ColorClip(size=(1080, 1920), color=(0, 0, 0), duration=total_duration)
-            
-            # Ajoute l'audio
-            video_clip = video_clip.set_audio(audio_clip)
-            
-            # TODO: Ajouter les sous-titres (nécessite moviepy avec TextClip)
-            # Pour l'instant, on skip les sous-titres pour éviter les dépendances ImageMagick
-            
-            # Export final
-            output_path = os.path.join(self.output_dir, f"{video_id}.mp4")
-            video_clip.write_videofile(
-                output_path,
-                fps=30,
-                codec='libx264',
-                audio_codec='aac',
-                temp_audiofile=os.path.join(temp_dir, 'temp-audio.m4a'),
-                remove_temp=True,
-                threads=4
-            )
-            
-            # Cleanup
-            audio_clip.close()
-            video_clip.close()
-            
-            return output_path
-        
-        except Exception as e:
-            print(f"Error creating video: {e}")
-            raise
+                video = ffmpeg.input(f'color=c=black:s={width}x{height}:r={fps}:d={total_duration}', format='lavfi')
+
+            audio_in = _audio_input(audio, pipes)
+            output_path = os.path.join(output_dir, f"{video_id}.mp4")
+            args = _output_args(video, audio_in, output_path, threads, profile)
+
+            # À partir d'ici, _run_ffmpeg ferme lui-même les pipes
+            owned, pipes = pipes, []
+            _run_ffmpeg(args, owned)
         finally:
-            # Nettoyage du répertoire temporaire
-            try:
-                shutil.rmtree(temp_dir)
-            except:
-                pass
-    
+            _close_pipes(pipes)
+
+        return output_path
+
+    except Exception as e:
+        print(f"Error creating video: {e}")
+        raise
+
+
+def render_thumbnail(images: list, audio_bytes: bytes, script_data: dict, output_dir: str, threads: int,
+                     profile: dict = None) -> str:
+    """Produit uniquement une miniature JPEG à partir de la première image (profil thumbnail)"""
+    video_id = str(uuid.uuid4())
+    profile = profile or RENDER_PROFILES["thumbnail"]
+    size = (profile['width'], profile['height'])
+
+    if images:
+        with Image.open(io.BytesIO(base64.b64decode(images[0]['data']))) as img:
+            # Remplit le cadre 9:16 puis recadre au centre
+            thumbnail = ImageOps.fit(img.convert("RGB"), size, Image.LANCZOS)
+    else:
+        thumbnail = Image.new("RGB", size, (0, 0, 0))
+
+    output_path = os.path.join(output_dir, f"{video_id}.jpg")
+    thumbnail.save(output_path, "JPEG", quality=profile.get('quality', 85))
+    return output_path
+
+
+# Moteurs de rendu disponibles (RENDER_BACKEND ou champ render_backend de la requête)
+RENDER_BACKENDS = {
+    "moviepy": render_video,
+    "ffmpeg": render_video_ffmpeg,
+}
+
+
+class VideoService:
+    def __init__(self, render_engine: RenderEngine = None):
+        self.output_dir = "/app/backend/generated_videos"
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.render_engine = render_engine or RenderEngine()
+        self.backend = os.getenv("RENDER_BACKEND", "moviepy")
+        if self.backend not in RENDER_BACKENDS:
+            raise ValueError(f"RENDER_BACKEND inconnu: {self.backend}")
+        self.profile = os.getenv("RENDER_PROFILE", "production")
+        # Profil du proxy basse résolution produit avant le rendu final
+        self.proxy_profile = os.getenv("RENDER_PROXY_PROFILE", "preview")
+        for name in (self.profile, self.proxy_profile):
+            if name not in RENDER_PROFILES:
+                raise ValueError(f"Profil de rendu inconnu: {name}")
+
+    async def create_video(self, images: list, audio_bytes: bytes, script_data: dict, backend: str = None,
+                           profile: str = None) -> str:
+        """Assemble une vidéo complète avec images, audio, et sous-titres selon le profil de rendu"""
+        render_profile = RENDER_PROFILES[profile or self.profile]
+        render = render_thumbnail if render_profile.get('thumbnail') else RENDER_BACKENDS[backend or self.backend]
+        return await self.render_engine.run(
+            render,
+            images,
+            audio_bytes,
+            script_data,
+            self.output_dir,
+            self.render_engine.threads,
+            render_profile
+        )
+
+    def save_assets(self, video_id: str, images: list, audio_bytes: bytes) -> str:
+        """Conserve images et voix d'une vidéo pour un rendu final ultérieur; retourne le dossier"""
+        assets_dir = os.path.join(self.output_dir, "assets", video_id)
+        os.makedirs(assets_dir, exist_ok=True)
+
+        manifest = []
+        for i, img_data in enumerate(images):
+            with open(os.path.join(assets_dir, f"image_{i}.bin"), "wb") as f:
+                f.write(base64.b64decode(img_data['data']))
+            manifest.append({"file": f"image_{i}.bin", "mime_type": img_data.get('mime_type', 'image/png')})
+        with open(os.path.join(assets_dir, "voiceover.bin"), "wb") as f:
+            f.write(audio_bytes)
+        with open(os.path.join(assets_dir, "manifest.json"), "w") as f:
+            json.dump({"images": manifest}, f)
+
+        return assets_dir
+
+    def load_assets(self, assets_dir: str) -> tuple:
+        """Relit les images (format de l'IA: base64) et la voix conservées par save_assets"""
+        with open(os.path.join(assets_dir, "manifest.json")) as f:
+            manifest = json.load(f)
+
+        images = []
+        for image in manifest["images"]:
+            with open(os.path.join(assets_dir, image["file"]), "rb") as f:
+                images.append({"data": base64.b64encode(f.read()).decode(), "mime_type": image["mime_type"]})
+        with open(os.path.join(assets_dir, "voiceover.bin"), "rb") as f:
+            audio_bytes = f.read()
+
+        return images, audio_bytes
+
+    def delete_files(self, video: dict):
+        """Supprime tous les fichiers d'une vidéo (rendu final, proxy, miniature, assets)"""
+        for field in ("video_path", "proxy_path", "thumbnail_path"):
+            if video.get(field) and os.path.exists(video[field]):
+                os.remove(video[field])
+        if video.get("assets_dir"):
+            shutil.rmtree(video["assets_dir"], ignore_errors=True)
+
     def get_video_path(self, video_id: str) -> str:
         """Retourne le chemin d'une vidéo générée"""
-        return os.path.join(self.output_dir, f"{video_id}.mp4")
\ No newline at end of file
+        return os.path.join(self.output_dir, f"{video_id}.mp4")
@@ -0,0 +1,248 @@
+import os
+import re
+import time
+import zlib
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+
+# Version des features: la changer repart d'un modèle vide (document distinct)
+FEATURE_VERSION = 1
+NICHE_BUCKETS = 16
+SECOND_PERSON = re.compile(r"\b(tu|toi|ton|ta|tes|vous|votre|vos)\b", re.IGNORECASE)
+
+
+def featurize(script_data: Dict, niche: Optional[str]) -> np.ndarray:
+    """Vecteur de features d'un script: structure, texte et niche (hachée), avec un biais en tête"""
+    hook = script_data.get('hook') or ''
+    script = script_data.get('script') or ''
+    title = script_data.get('title') or ''
+
+    features = [
+        1.0,  # biais
+        len(hook) / 100,
+        len(hook.split()) / 10,
+        float('?' in hook),
+        float('!' in hook),
+        float(any(c.isdigit() for c in hook)),
+        len(script.split()) / 100,
+        script.count('!') / 5,
+        script.count('?') / 5,
+        float(bool(SECOND_PERSON.search(script))),
+        len(script_data.get('hashtags') or []) / 10,
+        float(script_data.get('duration_seconds') or 0) / 60,
+        float(bool(script_data.get('call_to_action'))),
+        len(title) / 50,
+    ]
+    # Niche en one-hot haché (crc32: stable entre processus, contrairement à hash())
+    niche_features = [0.0] * NICHE_BUCKETS
+    if niche:
+        niche_features[zlib.crc32(niche.lower().encode()) % NICHE_BUCKETS] = 1.0
+
+    return np.array(features + niche_features, dtype=np.float64)
+
+
+DIMENSIONS = len(featurize({}, None))
+
+
+class ViralityModel:
+    """Régression ridge locale des vues (log) à partir des features d'un script
+
+    Le modèle ne stocke que des statistiques suffisantes (XᵀX, Xᵀy, n, Σy, Σy²) dans la
+    collection `models`: chaque nouvelle performance les incrémente atomiquement, et les
+    poids sont recalculés à la lecture (résolution d'un système de la taille des features).
+
+    Les scores sont exprimés sur l'échelle de la grille LLM (0-100): une régression linéaire
+    des scores LLM sur les vues prédites (centrées réduites) convertit la prédiction. Les
+    derniers scripts notés par le LLM sont conservés (features, score) et la régression est
+    réajustée avec les poids courants à chaque relecture: elle suit le modèle quand il évolue.
+    Sans calibration suffisante, pas de score local.
+    """
+
+    def __init__(self, db, ridge: float = None, min_samples: int = None, refresh_seconds: float = None,
+                 calibration_min_samples: int = None, calibration_max_samples: int = None):
+        self.db = db
+        self.model_id = f"virality_v{FEATURE_VERSION}"
+        self.ridge = ridge if ridge is not None else float(os.getenv("VIRALITY_MODEL_RIDGE", "1.0"))
+        self.min_samples = min_samples or int(os.getenv("VIRALITY_MODEL_MIN_SAMPLES", "50"))
+        self.calibration_min_samples = calibration_min_samples or \
+            int(os.getenv("VIRALITY_CALIBRATION_MIN_SAMPLES", "20"))
+        self.calibration_max_samples = calibration_max_samples or \
+            int(os.getenv("VIRALITY_CALIBRATION_MAX_SAMPLES", "500"))
+        self.refresh_seconds = refresh_seconds if refresh_seconds is not None else \
+            float(os.getenv("VIRALITY_MODEL_REFRESH_SECONDS", "60"))
+        self._weights: Optional[np.ndarray] = None
+        self._mean = 0.0
+        self._std = 1.0
+        self._samples = 0
+        self._calibration: Optional[Tuple[float, float]] = None
+        self._calibration_samples = 0
+        self._loaded_at = 0.0
+        self._initialized = False
+
+    @staticmethod
+    def _statistics(samples: Iterable[Tuple[Dict, Optional[str], float]]) -> Dict:
+        """Statistiques suffisantes d'un lot de (script_data, niche, vues)"""
+        rows = [(featurize(script_data, niche), math.log1p(max(views, 0))) for script_data, niche, views in samples]
+        if not rows:
+            return {"n": 0}
+        X = np.vstack([x for x, _ in rows])
+        y = np.array([target for _, target in rows])
+        return {"n": len(rows), "xtx": X.T @ X, "xty": X.T @ y, "y_sum": float(y.sum()), "y_sq_sum": float(y @ y)}
+
+    async def _ensure_document(self):
+        if self._initialized:
+            return
+        await self.db.models.update_one(
+            {"_id": self.model_id},
+            {"$setOnInsert": {
+                "dims": DIMENSIONS,
+                "xtx": [0.0] * (DIMENSIONS * DIMENSIONS),
+                "xty": [0.0] * DIMENSIONS,
+                "n": 0,
+                "y_sum": 0.0,
+                "y_sq_sum": 0.0,
+                "calibration_samples": []
+            }},
+            upsert=True
+        )
+        self._initialized = True
+
+    async def update(self, samples: Iterable[Tuple[Dict, Optional[str], float]]):
+        """Ajoute des observations (script_data, niche, vues) au modèle, en une écriture atomique"""
+        stats = self._statistics(samples)
+        if not stats["n"]:
+            return
+        await self._ensure_document()
+
+        increments = {"n": stats["n"], "y_sum": stats["y_sum"], "y_sq_sum": stats["y_sq_sum"]}
+        increments.update({f"xtx.{i}": float(v) for i, v in enumerate(stats["xtx"].ravel()) if v})
+        increments.update({f"xty.{i}": float(v) for i, v in enumerate(stats["xty"]) if v})
+        await self.db.models.update_one({"_id": self.model_id}, {"$inc": increments})
+        # Les prochains scores relisent le modèle
+        self._loaded_at = 0.0
+
+    async def calibrate(self, samples: Iterable[Tuple[Dict, Optional[str], float]]):
+        """Ajoute des scripts notés par le LLM (script_data, niche, score) à la calibration
+
+        Seuls les `calibration_max_samples` derniers scripts sont conservés; les scores None
+        (réponse LLM inexploitable) sont ignorés.
+        """
+        entries = [{"x": featurize(script_data, niche).tolist(), "s": float(score)}
+                   for script_data, niche, score in samples if score is not None]
+        if not entries:
+            return
+        await self._ensure_document()
+        await self.db.models.update_one({"_id": self.model_id}, {"$push": {
+            "calibration_samples": {"$each": entries, "$slice": -self.calibration_max_samples}
+        }})
+        self._loaded_at = 0.0
+
+    async def rebuild(self, batch_size: int = 1000) -> int:
+        """Réentraîne le modèle depuis learning_data (vues observées) et les scripts des vidéos
+
+        Les scripts notés par le LLM sont conservés: la calibration est réajustée sur les nouveaux poids.
+        """
+        totals = {"n": 0, "xtx": np.zeros((DIMENSIONS, DIMENSIONS)), "xty": np.zeros(DIMENSIONS),
+                  "y_sum": 0.0, "y_sq_sum": 0.0}
+
+        async def add(entries: List[Dict]):
+            ids = list({entry['video_id'] for entry in entries})
+            cursor = self.db.videos.find({"_id": {"$in": ids}}, {"niche": 1, "script_data": 1})
+            videos = {video['_id']: video async for video in cursor}
+            stats = self._statistics(
+                (videos[e['video_id']].get('script_data') or {}, videos[e['video_id']].get('niche'),
+                 e.get('performance', {}).get('views', 0))
+                for e in entries if e['video_id'] in videos
+            )
+            if stats["n"]:
+                for key in totals:
+                    totals[key] = totals[key] + stats[key]
+
+        entries = []
+        async for entry in self.db.learning_data.find({}, {"video_id": 1, "performance.views": 1}):
+            entries.append(entry)
+            if len(entries) >= batch_size:
+                await add(entries)
+                entries = []
+        if entries:
+            await add(entries)
+
+        await self.db.models.update_one({"_id": self.model_id}, {
+            "$set": {
+                "dims": DIMENSIONS,
+                "xtx": totals["xtx"].ravel().tolist(),
+                "xty": totals["xty"].tolist(),
+                "n": totals["n"],
+                "y_sum": totals["y_sum"],
+                "y_sq_sum": totals["y_sq_sum"]
+            },
+            # Ancien format (sommes cumulées sous des poids périmés)
+            "$unset": {"calibration": ""}
+        }, upsert=True)
+        self._initialized = True
+        self._loaded_at = 0.0
+        return totals["n"]
+
+    async def refresh(self):
+        """Recalcule les poids depuis les statistiques persistées si le cache est trop ancien"""
+        if time.monotonic() - self._loaded_at < self.refresh_seconds:
+            return
+        doc = await self.db.models.find_one({"_id": self.model_id})
+        self._loaded_at = time.monotonic()
+        self._calibration = None
+        if not doc or doc.get("n", 0) < self.min_samples:
+            self._weights = None
+            self._samples = doc.get("n", 0) if doc else 0
+            self._calibration_samples = len(doc.get("calibration_samples") or []) if doc else 0
+            return
+
+        n = doc["n"]
+        xtx = np.array(doc["xtx"]).reshape(DIMENSIONS, DIMENSIONS)
+        penalty = self.ridge * np.eye(DIMENSIONS)
+        penalty[0, 0] = 0.0  # le biais n'est pas régularisé
+        self._weights = np.linalg.solve(xtx + penalty, np.array(doc["xty"]))
+        self._mean = doc["y_sum"] / n
+        self._std = math.sqrt(max(doc["y_sq_sum"] / n - self._mean ** 2, 1e-9))
+        self._samples = n
+
+        self._calibration = self._fit_calibration(doc.get("calibration_samples") or [])
+
+    def _fit_calibration(self, samples: List[Dict]) -> Optional[Tuple[float, float]]:
+        """Régression des scores LLM sur les prédictions des poids courants (ordonnée, pente)"""
+        samples = [sample for sample in samples if len(sample["x"]) == DIMENSIONS]
+        self._calibration_samples = len(samples)
+        if len(samples) < self.calibration_min_samples:
+            return None
+        z = (np.array([sample["x"] for sample in samples]) @ self._weights - self._mean) / self._std
+        scores = np.array([sample["s"] for sample in samples])
+        if z.var() <= 1e-9:
+            return None
+        slope = float(((z - z.mean()) * (scores - scores.mean())).mean() / z.var())
+        return float(scores.mean()) - slope * float(z.mean()), slope
+
+    def _z(self, script_data: Dict, niche: Optional[str]) -> float:
+        """Vues prédites (log), centrées réduites sur la distribution observée"""
+        return (float(featurize(script_data, niche) @ self._weights) - self._mean) / self._std
+
+    def predict(self, script_data: Dict, niche: Optional[str]) -> Optional[float]:
+        """Score 0-100 sur l'échelle de la grille LLM, None si non entraîné ou non calibré"""
+        if self._weights is None or self._calibration is None:
+            return None
+        intercept, slope = self._calibration
+        return round(min(100.0, max(0.0, intercept + slope * self._z(script_data, niche))), 2)
+
+    async def score(self, script_data: Dict, niche: Optional[str]) -> Optional[float]:
+        await self.refresh()
+        return self.predict(script_data, niche)
+
+    def stats(self) -> Dict:
+        return {
+            "trained": self._weights is not None,
+            "samples": self._samples,
+            "min_samples": self.min_samples,
+            "calibrated": self._calibration is not None,
+            "calibration_samples": self._calibration_samples,
+            "calibration_min_samples": self.calibration_min_samples
+        }
@@ -0,0 +1,78 @@
+import re
+from typing import Dict, List, Tuple
+from pydub import AudioSegment
+from pydub.silence import detect_leading_silence
+
+from services.video_service import decode_audio, encode_audio
+
+SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+LAST_WORD = re.compile(r"(\w+)\.$")
+# Mots suivis d'un point qui ne terminent pas une phrase (titres, abréviations courantes)
+ABBREVIATIONS = {"m", "mm", "mme", "mmes", "mlle", "mlles", "dr", "pr", "st", "ste", "etc", "ex", "cf", "env", "vs", "av", "apr", "p"}
+
+
+def _ends_with_abbreviation(text: str) -> bool:
+    """Vrai si le texte finit par une abréviation ou une initiale (ex: "M.", "Dr.", "J.")"""
+    match = LAST_WORD.search(text)
+    if not match:
+        return False
+    word = match.group(1)
+    return word.lower() in ABBREVIATIONS or (len(word) == 1 and word.isupper())
+
+
+def split_sentences(text: str, min_chars: int = 20) -> List[str]:
+    """Découpe un script en phrases; les fragments trop courts sont rattachés à la phrase suivante"""
+    text = text.strip()
+    sentences = []
+    start = 0
+    for match in SENTENCE_END.finditer(text):
+        if _ends_with_abbreviation(text[start:match.start()]):
+            continue
+        sentences.append(text[start:match.start()])
+        start = match.end()
+    sentences.append(text[start:])
+    sentences = [s.strip() for s in sentences if s.strip()]
+    chunks: List[str] = []
+    pending = ""
+    for sentence in sentences:
+        pending = f"{pending} {sentence}".strip()
+        if len(pending) >= min_chars:
+            chunks.append(pending)
+            pending = ""
+    if pending:
+        if chunks:
+            chunks[-1] = f"{chunks[-1]} {pending}"
+        else:
+            chunks.append(pending)
+    return chunks
+
+
+def _trim_silence(segment: AudioSegment, threshold: float = -50.0) -> AudioSegment:
+    start = detect_leading_silence(segment, silence_threshold=threshold)
+    end = len(segment) - detect_leading_silence(segment.reverse(), silence_threshold=threshold)
+    return segment[start:end] if end > start else segment
+
+
+def assemble_segments(segments: List[Tuple[str, bytes]], pause_ms: int = 0) -> Tuple[bytes, List[Dict]]:
+    """Concatène les voix de chaque phrase bout à bout (silences de bord retirés, pause optionnelle)
+
+    Retourne l'audio MP3 (encodé en mémoire) et les timings [{"text", "start", "end"}] en secondes.
+    """
+    if len(segments) == 1:
+        # Une seule phrase: l'audio d'origine est conservé tel quel
+        text, audio_bytes = segments[0]
+        return audio_bytes, [{"text": text, "start": 0.0, "end": round(decode_audio(audio_bytes).duration_seconds, 3)}]
+
+    voices = [_trim_silence(decode_audio(audio_bytes)) for _, audio_bytes in segments]
+    pause = AudioSegment.silent(duration=pause_ms, frame_rate=voices[0].frame_rate).set_channels(voices[0].channels)
+
+    combined = voices[0][:0]
+    timings = []
+    for i, ((text, _), voice) in enumerate(zip(segments, voices)):
+        if i and pause_ms:
+            combined += pause
+        start = len(combined)
+        combined += voice
+        timings.append({"text": text, "start": round(start / 1000, 3), "end": round(len(combined) / 1000, 3)})
+
+    return encode_audio(combined), timings
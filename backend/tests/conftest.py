@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Les tests unitaires importent les services comme le serveur, depuis backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
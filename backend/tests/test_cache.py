@@ -0,0 +1,226 @@
+"""
+Unit tests for the AI response cache (services/cache.py)
+Tests: memory and disk tiers, DiskCache size accounting, tiered lookups, JSON value encoding, shared in-flight calls
+"""
+import os
+import asyncio
+import pytest
+
+from services.cache import CacheBackend, DiskCache, MemoryCache, ResponseCache, decode_value, encode_value
+
+
+def disk_usage(directory):
+    return sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+
+
+class TestMemoryCache:
+    """Entries are evicted least recently used first"""
+
+    def test_lru_eviction_by_entry_count(self):
+        cache = MemoryCache(max_entries=2)
+
+        async def scenario():
+            await cache.set("a", b"a", 60)
+            await cache.set("b", b"b", 60)
+            await cache.get("a")
+            await cache.set("c", b"c", 60)
+            return [(await cache.get(key))[0] for key in ("a", "b", "c")]
+
+        assert asyncio.run(scenario()) == [True, False, True]
+        assert cache.stats() == {"entries": 2, "bytes": 2}
+
+
+class TestDiskCache:
+    """Entries survive on disk until they expire or are evicted; the tracked size matches the disk"""
+
+    def test_round_trip(self, tmp_path):
+        cache = DiskCache(str(tmp_path))
+
+        async def scenario():
+            await cache.set("key", b"\x00valeur", 60)
+            return await cache.get("key")
+
+        assert asyncio.run(scenario()) == (True, b"\x00valeur")
+
+    def test_overwrite_replaces_previous_size(self, tmp_path):
+        cache = DiskCache(str(tmp_path))
+
+        async def scenario():
+            await cache.set("key", b"x" * 1000, 60)
+            await cache.set("other", b"y" * 10, 60)
+            await cache.set("key", b"z" * 1000, 60)
+            await cache.set("key", b"z" * 200, 60)
+
+        asyncio.run(scenario())
+        assert cache.stats()["bytes"] == disk_usage(tmp_path)
+
+    def test_expired_entry_is_removed(self, tmp_path):
+        cache = DiskCache(str(tmp_path))
+
+        async def scenario():
+            await cache.set("old", b"x" * 500, -1)
+            await cache.set("new", b"y" * 100, 60)
+            return await cache.get("old")
+
+        assert asyncio.run(scenario()) == (False, None)
+        assert not os.path.exists(os.path.join(tmp_path, "old.bin"))
+        assert cache.stats()["bytes"] == disk_usage(tmp_path)
+
+    def test_eviction_drops_least_recently_used(self, tmp_path):
+        cache = DiskCache(str(tmp_path), max_bytes=2500)
+
+        async def scenario():
+            await cache.set("a", b"a" * 1000, 60)
+            os.utime(os.path.join(tmp_path, "a.bin"), (1, 1))
+            await cache.set("b", b"b" * 1000, 60)
+            await cache.set("c", b"c" * 1000, 60)
+            return [(await cache.get(key))[0] for key in ("a", "b", "c")]
+
+        assert asyncio.run(scenario()) == [False, True, True]
+        assert cache.stats()["bytes"] == disk_usage(tmp_path)
+        assert cache.stats()["bytes"] <= 2500
+
+
+class TestResponseCache:
+    """Values are computed once, and lower-tier hits repopulate upper tiers"""
+
+    def test_get_or_compute_calls_once(self):
+        cache = ResponseCache([MemoryCache()])
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            return {"script": "texte"}
+
+        async def scenario():
+            first = await cache.get_or_compute("key", compute)
+            second = await cache.get_or_compute("key", compute)
+            return first, second
+
+        assert asyncio.run(scenario()) == ({"script": "texte"}, {"script": "texte"})
+        assert len(calls) == 1
+        assert cache.stats()["hits"] == {"memory": 1}
+
+    def test_uncacheable_values_are_recomputed(self):
+        cache = ResponseCache([MemoryCache()])
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            return "invalide"
+
+        async def scenario():
+            for _ in range(2):
+                await cache.get_or_compute("key", compute, cacheable=lambda value: False)
+
+        asyncio.run(scenario())
+        assert len(calls) == 2
+
+    def test_lower_tier_hit_repopulates_memory(self, tmp_path):
+        memory, disk = MemoryCache(), DiskCache(str(tmp_path))
+
+        async def scenario():
+            await ResponseCache([disk]).set("key", [1, 2])
+            cache = ResponseCache([memory, disk])
+            return await cache.get("key"), await memory.get("key")
+
+        value, (in_memory, _) = asyncio.run(scenario())
+        assert value == (True, [1, 2])
+        assert in_memory
+
+
+class TestValueEncoding:
+    """Cached values round-trip through JSON, bytes included; nothing is unpickled"""
+
+    def test_round_trip_with_bytes(self):
+        value = {"audio": b"\x00\xffmp3", "images": [{"data": "abc"}], "score": 72.5}
+        assert decode_value(encode_value(value)) == value
+
+    def test_unserializable_value_is_not_cached(self):
+        cache = ResponseCache([MemoryCache()])
+
+        async def scenario():
+            await cache.set("key", object())
+            return await cache.get("key")
+
+        assert asyncio.run(scenario()) == (False, None)
+        assert cache.errors == 1
+
+    def test_unreadable_entry_is_a_miss(self):
+        memory = MemoryCache()
+
+        async def scenario():
+            await memory.set("key", b"\x80\x04pickle", 60)
+            return await ResponseCache([memory]).get("key")
+
+        assert asyncio.run(scenario()) == (False, None)
+
+    def test_incomplete_backend_cannot_be_created(self):
+        class ReadOnly(CacheBackend):
+            async def get(self, key):
+                return False, None
+
+        with pytest.raises(TypeError):
+            ReadOnly()
+
+
+class TestSharedCalls:
+    """AIService shares identical in-flight calls and cancels them once nobody waits"""
+
+    @pytest.fixture
+    def ai_service(self, monkeypatch):
+        monkeypatch.setenv("EMERGENT_LLM_KEY", "test")
+        from services.ai_service import AIService
+        return AIService()
+
+    def test_identical_calls_share_one_request(self, ai_service):
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "réponse"
+
+        async def scenario():
+            return await asyncio.gather(*[
+                ai_service._cached("chat", "model", "prompt", {}, compute) for _ in range(3)
+            ])
+
+        assert asyncio.run(scenario()) == ["réponse"] * 3
+        assert len(calls) == 1
+        assert ai_service.shared_requests == 2
+
+    def test_shared_call_survives_one_cancelled_waiter(self, ai_service):
+        async def compute():
+            await asyncio.sleep(0.05)
+            return "réponse"
+
+        async def scenario():
+            first = asyncio.ensure_future(ai_service._cached("chat", "model", "prompt", {}, compute))
+            second = asyncio.ensure_future(ai_service._cached("chat", "model", "prompt", {}, compute))
+            await asyncio.sleep(0.01)
+            first.cancel()
+            return await second
+
+        assert asyncio.run(scenario()) == "réponse"
+
+    def test_call_is_cancelled_with_its_last_waiter(self, ai_service):
+        cancelled = []
+
+        async def compute():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+
+        async def scenario():
+            waiter = asyncio.ensure_future(ai_service._cached("chat", "model", "prompt", {}, compute))
+            await asyncio.sleep(0.01)
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+            await asyncio.sleep(0)
+
+        asyncio.run(scenario())
+        assert cancelled == [1]
+        assert ai_service._inflight == {}
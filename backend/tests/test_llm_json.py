@@ -0,0 +1,110 @@
+"""
+Unit tests for LLM JSON parsing (services/llm_json.py)
+Tests: extraction around prose and fences, truncation repair, streamed field extraction, script validation
+"""
+import pytest
+
+from services.llm_json import (
+    IncrementalJsonExtractor, JsonExtractionError, ScriptValidationError,
+    _repair, extract_json, validate_script
+)
+
+
+class TestExtractJson:
+    """Valid JSON is found in fences and prose; truncated objects are not silently closed"""
+
+    def test_fenced_block_with_prose(self):
+        text = 'Voici le script:\n```json\n{"title": "T", "script": "S"}\n```\nBonne chance!'
+        assert extract_json(text) == {"title": "T", "script": "S"}
+
+    def test_braces_in_leading_prose_are_skipped(self):
+        text = 'Format {titre, script} demandé: {"title": "T", "script": "S"}'
+        assert extract_json(text, (dict,)) == {"title": "T", "script": "S"}
+
+    def test_trailing_comma_is_removed(self):
+        assert extract_json('{"title": "T", "script": "S",}') == {"title": "T", "script": "S"}
+
+    def test_truncated_object_is_rejected(self):
+        with pytest.raises(JsonExtractionError):
+            extract_json('{"title":"a","script":"trunc', (dict,))
+
+    def test_truncated_object_can_be_closed_on_request(self):
+        result = extract_json('{"title":"a","script":"trunc', (dict,), allow_truncated=True)
+        assert result == {"title": "a", "script": "trunc"}
+
+    def test_truncated_array_keeps_whole_elements(self):
+        text = '[{"title": "A", "script": "a"}, {"title": "B", "script": "b"}, {"title": "C", "scr'
+        assert extract_json(text, (list,)) == [{"title": "A", "script": "a"}, {"title": "B", "script": "b"}]
+
+    def test_wrapped_array_is_found(self):
+        assert extract_json('{"scripts": [{"title": "A"}]}', (list,)) == [{"title": "A"}]
+
+    def test_no_json(self):
+        with pytest.raises(JsonExtractionError):
+            extract_json("Désolé, je ne peux pas.")
+
+
+class TestRepair:
+    """Each repair says whether it had to close a truncated string or structure"""
+
+    def test_unterminated_string_is_incomplete(self):
+        repairs = _repair('{"title":"a","script":"trunc')
+        assert repairs[0] == ('{"title":"a","script":"trunc"}', False)
+        assert all(not complete for _, complete in repairs)
+
+    def test_trailing_comma_only_is_complete(self):
+        assert _repair('{"a": 1, "b": [1, 2,],}')[0] == ('{"a": 1, "b": [1, 2]}', True)
+
+    def test_root_array_cut_between_elements_is_complete(self):
+        repairs = _repair('[{"a": 1}, {"b": 2, "c": "x')
+        assert ('[{"a": 1}]', True) in repairs
+
+
+class TestIncrementalJsonExtractor:
+    """Watched top-level fields are reported as soon as they are complete in the stream"""
+
+    @staticmethod
+    def feed(text, fields=("script",)):
+        reported = []
+        extractor = IncrementalJsonExtractor(fields, lambda field, value: reported.append((field, value)))
+        for char in text:
+            extractor.feed(char)
+        return extractor, reported
+
+    def test_field_reported_before_end_of_response(self):
+        extractor, reported = self.feed('{"title": "T", "script": "Le \\"texte\\"", "hashtags": ["#a"')
+        assert reported == [("script", 'Le "texte"')]
+        assert extractor.fields == {"script": 'Le "texte"'}
+
+    def test_nested_fields_are_ignored(self):
+        _, reported = self.feed('{"meta": {"script": "non"}, "script": "oui"}')
+        assert reported == [("script", "oui")]
+
+    def test_prose_before_object_is_ignored(self):
+        _, reported = self.feed('Voici le script demandé: {"title": "T", "script": "S"}')
+        assert reported == [("script", "S")]
+
+    def test_recovers_after_stray_brace_in_prose(self):
+        _, reported = self.feed('Voici {le script} demandé: {"title": "T", "n": 3, "script": "S"}')
+        assert reported == [("script", "S")]
+
+    def test_recovers_after_prose_key_without_colon(self):
+        _, reported = self.feed('Exemple {"note"} puis ```json\n{"script": "ok"}```')
+        assert reported == [("script", "ok")]
+
+
+class TestValidateScript:
+    """Required fields are enforced; tolerated formats are normalized"""
+
+    def test_defaults_and_coercions(self):
+        script = validate_script({
+            "title": "T", "script": "Première phrase. Suite.", "duration_seconds": "30s", "hashtags": "#a, #b"
+        })
+        assert script["hook"] == "Première phrase."
+        assert script["duration_seconds"] == 30.0
+        assert script["hashtags"] == ["#a", "#b"]
+        assert script["call_to_action"] == ""
+
+    def test_missing_required_field(self):
+        with pytest.raises(ScriptValidationError, match="script manquant"):
+            validate_script({"title": "T"})
@@ -0,0 +1,52 @@
+"""
+Unit tests for the LLM client pool (services/llm_pool.py)
+Tests: client reuse per configuration, history reset between calls, discarded clients
+"""
+import asyncio
+import pytest
+
+from services.llm_pool import LlmClientPool
+
+
+class TestLlmClientPool:
+    """A released client is handed out again for the same configuration, with a clean history"""
+
+    def test_client_is_reused_with_initial_history(self):
+        pool = LlmClientPool("key", max_concurrency=2, max_idle=2)
+
+        async def scenario():
+            async with pool.client("openai", "gpt-5.2", "system") as first:
+                first.messages.append({"role": "user", "content": "bonjour"})
+            async with pool.client("openai", "gpt-5.2", "system") as second:
+                return first, second
+
+        first, second = asyncio.run(scenario())
+        assert second is first
+        assert second.messages == []
+        assert pool.stats() == {"created": 1, "reused": 1, "discarded": 0, "idle": 1}
+
+    def test_distinct_configurations_get_distinct_clients(self):
+        pool = LlmClientPool("key", max_concurrency=2)
+
+        async def scenario():
+            async with pool.client("openai", "gpt-5.2", "system") as first:
+                pass
+            async with pool.client("openai", "gpt-5.2", "system", temperature=0.2) as second:
+                return first, second
+
+        first, second = asyncio.run(scenario())
+        assert second is not first
+        assert pool.stats()["created"] == 2
+
+    def test_client_is_discarded_after_an_error(self):
+        pool = LlmClientPool("key", max_concurrency=2)
+
+        async def scenario():
+            with pytest.raises(RuntimeError):
+                async with pool.client("openai", "gpt-5.2", "system"):
+                    raise RuntimeError("timeout")
+            async with pool.client("openai", "gpt-5.2", "system"):
+                pass
+
+        asyncio.run(scenario())
+        assert pool.stats() == {"created": 2, "reused": 0, "discarded": 1, "idle": 1}
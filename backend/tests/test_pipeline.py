@@ -0,0 +1,130 @@
+"""
+Unit tests for the generation stage graph (services/pipeline.py)
+Tests: dependency order, concurrency, failure and cancellation of parallel stages
+"""
+import asyncio
+import pytest
+
+from services.job_queue import JobProgress
+from services.pipeline import StageGraph
+
+
+class FakeJobs:
+    """Collection `jobs` minimale: garde le dernier état de chaque étape"""
+
+    def __init__(self):
+        self.stages = {}
+
+    async def update_one(self, query, update):
+        for field, value in update["$set"].items():
+            parts = field.split(".")
+            if parts[0] == "stages" and parts[2] == "status":
+                self.stages[parts[1]] = value
+
+
+class FakeDb:
+    def __init__(self):
+        self.jobs = FakeJobs()
+
+
+def run_graph(graph, progress=None, results=None):
+    return asyncio.run(graph.run(progress, results))
+
+
+class TestStageGraphOrder:
+    """Stages start once their dependencies are done and receive their results"""
+
+    def test_dependencies_receive_results(self):
+        order = []
+
+        async def script():
+            order.append("script")
+            return "texte"
+
+        async def images(script):
+            order.append("images")
+            return f"images({script})"
+
+        async def voiceover(script):
+            order.append("voiceover")
+            return f"voix({script})"
+
+        async def render(images, voiceover):
+            order.append("render")
+            return f"{images}+{voiceover}"
+
+        graph = (
+            StageGraph()
+            .add("script", script)
+            .add("images", images, deps=["script"])
+            .add("voiceover", voiceover, deps=["script"])
+            .add("render", render, deps=["images", "voiceover"])
+        )
+        outcome = run_graph(graph)
+
+        assert outcome["results"]["render"] == "images(texte)+voix(texte)"
+        assert order[0] == "script" and order[-1] == "render"
+        assert set(outcome["timings"]) == {"script", "images", "voiceover", "render", "total"}
+
+    def test_independent_stages_run_concurrently(self):
+        async def slow():
+            await asyncio.sleep(0.2)
+
+        graph = StageGraph().add("a", slow).add("b", slow).add("c", slow)
+        outcome = run_graph(graph)
+
+        assert outcome["timings"]["total"]["duration"] < 0.5
+
+    def test_unknown_dependency_is_rejected(self):
+        async def stage(missing):
+            return None
+
+        with pytest.raises(ValueError):
+            StageGraph().add("render", stage, deps=["missing"])
+
+
+class TestStageGraphFailure:
+    """A failing stage cancels the others; job progress records each outcome"""
+
+    @staticmethod
+    def failing_graph():
+        async def ok():
+            return "fichier"
+
+        async def slow(ok):
+            await asyncio.sleep(5)
+
+        async def fail(ok):
+            await asyncio.sleep(0.05)
+            raise RuntimeError("boom")
+
+        return StageGraph().add("ok", ok).add("slow", slow, deps=["ok"]).add("fail", fail, deps=["ok"])
+
+    def test_failure_propagates_and_cancels_siblings(self):
+        db = FakeDb()
+        with pytest.raises(RuntimeError, match="boom"):
+            run_graph(self.failing_graph(), JobProgress(db, "job"))
+
+        assert db.jobs.stages == {"ok": "completed", "slow": "cancelled", "fail": "failed"}
+
+    def test_results_of_finished_stages_stay_available(self):
+        results = {}
+        with pytest.raises(RuntimeError):
+            run_graph(self.failing_graph(), results=results)
+
+        assert results == {"ok": "fichier"}
+
+    def test_summary_is_recorded_with_stage(self):
+        recorded = {}
+
+        class Progress(JobProgress):
+            async def stage(self, name, status, **details):
+                recorded[name] = (status, details)
+
+        async def images():
+            return ["a", "b"]
+
+        graph = StageGraph().add("images", images, summary=lambda r: {"generated": len(r)})
+        run_graph(graph, Progress(None, "job"))
+
+        assert recorded["images"] == ("completed", {"generated": 2})
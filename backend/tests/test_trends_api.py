@@ -1,9 +1,10 @@
 """
 Backend API Tests for TikTok Automation App
-Tests: Trends CRUD, Niches Recommended, Dashboard Stats
+Tests: Trends CRUD, Niches Recommended, Dashboard Stats, Jobs
 """
 import pytest
 import requests
+import json
 import os
 import uuid
 
@@ -94,6 +95,33 @@ class TestTrendsAPI:
         # Cleanup
         requests.delete(f"{BASE_URL}/api/trends/{trend_id}")
     
+    def test_add_trends_without_url(self, test_trend_data):
+        """Test POST /api/trends and /api/trends/bulk accept several trends without URL"""
+        payload = {k: v for k, v in test_trend_data.items() if k != "url"}
+        trend_ids = []
+        for _ in range(2):
+            response = requests.post(f"{BASE_URL}/api/trends", json=payload)
+            assert response.status_code == 200, f"Expected 200, got {response.status_code}: {response.text}"
+            trend_ids.append(response.json()["id"])
+        
+        body = "\n".join(json.dumps(payload) for _ in range(2))
+        response = requests.post(
+            f"{BASE_URL}/api/trends/bulk",
+            data=body.encode(),
+            headers={"Content-Type": "application/x-ndjson"}
+        )
+        assert response.status_code == 200
+        report = response.json()
+        assert report["inserted"] == 2
+        assert report["duplicates"] == 0
+        print(f"✓ Trends without URL are not treated as duplicates")
+        
+        # Cleanup
+        trends = requests.get(f"{BASE_URL}/api/trends", params={"niche": test_trend_data["niche"], "limit": 200}).json()
+        for trend in trends["trends"]:
+            if trend["_id"] in trend_ids or trend["title"] == payload["title"]:
+                requests.delete(f"{BASE_URL}/api/trends/{trend['_id']}")
+    
     def test_add_trend_missing_required_fields(self):
         """Test POST /api/trends with missing required fields"""
         incomplete_data = {
@@ -152,6 +180,101 @@ class TestTrendsAPI:
         # Cleanup
         requests.delete(f"{BASE_URL}/api/trends/{trend_id}")
     
+    def test_list_trends_cursor_pagination(self, test_trend_data):
+        """Test GET /api/trends pages through results with next_cursor"""
+        niche = f"pagination_test_{uuid.uuid4().hex[:8]}"
+        trend_ids = []
+        for views in (3000, 2000, 1000):
+            payload = {**test_trend_data, "niche": niche, "views": views,
+                       "url": f"https://www.tiktok.com/@test/video/{uuid.uuid4().hex}"}
+            trend_ids.append(requests.post(f"{BASE_URL}/api/trends", json=payload).json()["id"])
+        
+        first_page = requests.get(f"{BASE_URL}/api/trends", params={"niche": niche, "limit": 2}).json()
+        assert first_page["count"] == 2
+        assert first_page["next_cursor"]
+        assert [t["views"] for t in first_page["trends"]] == [3000, 2000]
+        
+        second_page = requests.get(
+            f"{BASE_URL}/api/trends",
+            params={"niche": niche, "limit": 2, "cursor": first_page["next_cursor"]}
+        ).json()
+        assert [t["views"] for t in second_page["trends"]] == [1000]
+        assert second_page["next_cursor"] is None
+        
+        print(f"✓ Cursor pagination returned all trends across pages")
+        
+        # Cleanup
+        for trend_id in trend_ids:
+            requests.delete(f"{BASE_URL}/api/trends/{trend_id}")
+    
+    def test_list_trends_ndjson_stream(self, test_trend_data):
+        """Test GET /api/trends?format=ndjson streams one JSON document per line"""
+        create_response = requests.post(f"{BASE_URL}/api/trends", json=test_trend_data)
+        trend_id = create_response.json()["id"]
+        
+        response = requests.get(
+            f"{BASE_URL}/api/trends",
+            params={"niche": test_trend_data["niche"], "format": "ndjson", "limit": 0},
+            stream=True
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        
+        ids = [json.loads(line)["_id"] for line in response.iter_lines() if line]
+        assert trend_id in ids
+        print(f"✓ NDJSON stream returned {len(ids)} trends")
+        
+        # Cleanup
+        requests.delete(f"{BASE_URL}/api/trends/{trend_id}")
+    
+    def test_list_trends_invalid_cursor(self):
+        """Test GET /api/trends with a malformed cursor"""
+        response = requests.get(f"{BASE_URL}/api/trends", params={"cursor": "not-a-cursor"})
+        
+        assert response.status_code == 400
+        print(f"✓ 400 returned for invalid cursor")
+    
+    def test_bulk_add_trends_ndjson(self, test_trend_data):
+        """Test POST /api/trends/bulk with NDJSON, a duplicate URL and an invalid row"""
+        url = f"https://www.tiktok.com/@test/video/{uuid.uuid4().hex}"
+        rows = [
+            {**test_trend_data, "url": url},
+            {**test_trend_data, "url": url},  # Doublon dans le lot
+            {"title": "TEST_invalid"},  # Champs requis manquants
+        ]
+        body = "\n".join(json.dumps(row) for row in rows)
+        response = requests.post(
+            f"{BASE_URL}/api/trends/bulk",
+            data=body.encode(),
+            headers={"Content-Type": "application/x-ndjson"}
+        )
+        
+        assert response.status_code == 200, f"Expected 200, got {response.status_code}: {response.text}"
+        report = response.json()
+        assert report["received"] == 3
+        assert report["inserted"] == 1
+        assert report["duplicates"] == 1
+        assert report["failed"] == 1
+        assert report["errors"][0]["row"] == 3
+        print(f"✓ Bulk import report: {report['inserted']} inserted, {report['duplicates']} duplicates")
+        
+        # Cleanup
+        trends = requests.get(f"{BASE_URL}/api/trends", params={"niche": test_trend_data["niche"], "limit": 200}).json()
+        for trend in trends["trends"]:
+            if trend.get("url") == url:
+                requests.delete(f"{BASE_URL}/api/trends/{trend['_id']}")
+    
+    def test_bulk_add_trends_unsupported_content_type(self):
+        """Test POST /api/trends/bulk with an unsupported Content-Type"""
+        response = requests.post(
+            f"{BASE_URL}/api/trends/bulk",
+            data=b"<trends/>",
+            headers={"Content-Type": "application/xml"}
+        )
+        
+        assert response.status_code == 415
+        print(f"✓ 415 returned for unsupported Content-Type")
+    
     def test_delete_trend_success(self, test_trend_data):
         """Test DELETE /api/trends/{id} - Delete a trend"""
         # First create a trend
@@ -261,11 +384,53 @@ class TestAnalyticsAPI:
         assert isinstance(data["analytics"], list)
         
         print(f"✓ Listed {data['count']} analytics records")
+    
+    def test_bulk_add_analytics_reports_row_errors(self):
+        """Test POST /api/analytics/bulk reports validation errors per row"""
+        rows = [
+            {"video_id": "TEST_missing_metrics"},
+            {"video_id": "TEST_bad_views", "views": "many", "likes": 1, "shares": 1, "comments": 1, "revenue": 0},
+        ]
+        response = requests.post(f"{BASE_URL}/api/analytics/bulk", json=rows)
+        
+        assert response.status_code == 200, f"Expected 200, got {response.status_code}: {response.text}"
+        report = response.json()
+        assert report["received"] == 2
+        assert report["inserted"] == 0
+        assert report["failed"] == 2
+        assert [e["row"] for e in report["errors"]] == [1, 2]
+        print(f"✓ Bulk analytics reported {report['failed']} row errors")
 
 
 class TestVideosAPI:
     """Tests for /api/videos endpoints (excluding generation which is skeleton)"""
     
+    def test_download_video_not_found(self):
+        """Test GET /api/videos/{id}/download with non-existent ID"""
+        fake_id = str(uuid.uuid4())
+        response = requests.get(f"{BASE_URL}/api/videos/{fake_id}/download", headers={"Range": "bytes=0-99"})
+        
+        assert response.status_code == 404
+        print(f"✓ 404 returned for non-existent video download")
+    
+    def test_generate_video_unknown_render_backend(self):
+        """Test POST /api/videos/generate with an unknown render backend"""
+        response = requests.post(
+            f"{BASE_URL}/api/videos/generate",
+            json={"niche": "TEST_niche", "render_backend": "unknown"}
+        )
+        
+        assert response.status_code == 400
+        print(f"✓ 400 returned for unknown render backend")
+    
+    def test_finalize_video_not_found(self):
+        """Test POST /api/videos/{id}/finalize with non-existent ID"""
+        fake_id = str(uuid.uuid4())
+        response = requests.post(f"{BASE_URL}/api/videos/{fake_id}/finalize")
+        
+        assert response.status_code == 404
+        print(f"✓ 404 returned for finalizing non-existent video")
+    
     def test_list_videos(self):
         """Test GET /api/videos"""
         response = requests.get(f"{BASE_URL}/api/videos")
@@ -280,5 +445,76 @@ class TestVideosAPI:
         print(f"✓ Listed {data['count']} videos")
 
 
+class TestBatchesAPI:
+    """Tests for batch generation endpoints"""
+    
+    def test_generate_batch_empty(self):
+        """Test POST /api/videos/generate/batch without items"""
+        response = requests.post(f"{BASE_URL}/api/videos/generate/batch", json={"items": []})
+        
+        assert response.status_code == 400
+        print(f"✓ 400 returned for empty batch")
+    
+    def test_get_batch_not_found(self):
+        """Test GET /api/batches/{id} with non-existent ID"""
+        fake_id = str(uuid.uuid4())
+        response = requests.get(f"{BASE_URL}/api/batches/{fake_id}")
+        
+        assert response.status_code == 404
+        print(f"✓ 404 returned for non-existent batch")
+
+
+class TestJobsAPI:
+    """Tests for /api/jobs endpoints"""
+    
+    def test_get_job_not_found(self):
+        """Test GET /api/jobs/{id} with non-existent ID"""
+        fake_id = str(uuid.uuid4())
+        response = requests.get(f"{BASE_URL}/api/jobs/{fake_id}")
+        
+        assert response.status_code == 404
+        assert "detail" in response.json()
+        print(f"✓ 404 returned for non-existent job")
+
+
+class TestLearningAPI:
+    """Tests for /api/learning endpoints"""
+    
+    def test_get_full_insights(self):
+        """Test GET /api/learning/insights?mode=full"""
+        response = requests.get(f"{BASE_URL}/api/learning/insights", params={"mode": "full", "days": 90})
+        
+        assert response.status_code == 200
+        data = response.json()
+        
+        assert "recommendations" in data
+        if "total_videos" in data:
+            assert "correlations" in data
+            assert "thresholds" in data
+            assert isinstance(data["niches"], list)
+        
+        print(f"✓ Full insights returned ({data.get('total_videos', 0)} entries)")
+    
+    def test_get_insights_unknown_mode(self):
+        """Test GET /api/learning/insights with an unknown mode"""
+        response = requests.get(f"{BASE_URL}/api/learning/insights", params={"mode": "fast"})
+        
+        assert response.status_code == 400
+        print(f"✓ 400 returned for unknown insights mode")
+
+    def test_get_virality_model_stats(self):
+        """Test GET /api/learning/virality-model"""
+        response = requests.get(f"{BASE_URL}/api/learning/virality-model")
+
+        assert response.status_code == 200
+        data = response.json()
+
+        assert isinstance(data["trained"], bool)
+        assert data["samples"] >= 0
+        assert "local_scores" in data and "llm_scores" in data
+
+        print(f"✓ Virality model stats returned (trained={data['trained']}, samples={data['samples']})")
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
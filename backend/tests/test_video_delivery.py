@@ -0,0 +1,40 @@
+"""
+Unit tests for video delivery (services/video_delivery.py)
+Tests: Range header parsing
+"""
+import pytest
+
+from services.video_delivery import RangeNotSatisfiable, parse_range
+
+
+class TestParseRange:
+    """Single byte ranges are decoded to (start, inclusive end) within the file"""
+
+    @pytest.mark.parametrize("header,expected", [
+        ("bytes=0-99", (0, 99)),
+        ("bytes=100-", (100, 999)),
+        ("bytes=-200", (800, 999)),
+        ("bytes=900-5000", (900, 999)),
+        ("bytes=-5000", (0, 999)),
+        ("BYTES = 0-0", (0, 0)),
+    ])
+    def test_valid_ranges(self, header, expected):
+        assert parse_range(header, 1000) == expected
+
+    @pytest.mark.parametrize("header", [
+        "items=0-10",
+        "bytes=0-10,20-30",
+        "bytes=abc-",
+        "bytes=10",
+    ])
+    def test_ignored_headers(self, header):
+        assert parse_range(header, 1000) is None
+
+    @pytest.mark.parametrize("header", [
+        "bytes=1000-",
+        "bytes=500-100",
+        "bytes=-0",
+    ])
+    def test_unsatisfiable_ranges(self, header):
+        with pytest.raises(RangeNotSatisfiable):
+            parse_range(header, 1000)
@@ -0,0 +1,33 @@
+"""
+Unit tests for rendering helpers (services/video_service.py)
+Tests: image cut placement on sentence ends
+"""
+import pytest
+
+from services.video_service import image_cuts
+
+
+class TestImageCuts:
+    """Cuts cover the whole audio and snap to nearby sentence ends"""
+
+    def test_uniform_without_timings(self):
+        assert image_cuts(10.0, 4) == [0.0, 2.5, 5.0, 7.5, 10.0]
+
+    def test_cuts_snap_to_nearest_sentence_end(self):
+        timings = [{"end": 2.2}, {"end": 4.8}, {"end": 5.6}, {"end": 9.0}]
+        assert image_cuts(10.0, 2, timings) == [0.0, 4.8, 10.0]
+
+    def test_sentence_end_outside_window_is_ignored(self):
+        timings = [{"end": 1.0}, {"end": 8.0}]
+        assert image_cuts(10.0, 2, timings) == [0.0, 5.0, 10.0]
+
+    def test_single_image_spans_audio(self):
+        assert image_cuts(7.0, 1, [{"end": 3.0}]) == [0.0, 7.0]
+
+    @pytest.mark.parametrize("count", [2, 3, 5, 8])
+    def test_cuts_are_increasing(self, count):
+        timings = [{"end": end / 2} for end in range(1, 40)]
+        cuts = image_cuts(20.0, count, timings)
+        assert len(cuts) == count + 1
+        assert cuts[0] == 0.0 and cuts[-1] == 20.0
+        assert all(a < b for a, b in zip(cuts, cuts[1:]))
@@ -0,0 +1,57 @@
+"""
+Unit tests for sentence-level voiceover helpers (services/voiceover.py)
+Tests: sentence splitting, abbreviations, short fragment merging, gap-free assembly
+"""
+import io
+
+from pydub.generators import Sine
+
+from services.video_service import decode_audio
+from services.voiceover import assemble_segments, split_sentences
+
+
+def tone_mp3(duration_ms):
+    output = io.BytesIO()
+    Sine(440).to_audio_segment(duration=duration_ms).set_channels(2).export(output, format="mp3")
+    return output.getvalue()
+
+
+class TestSplitSentences:
+    """Scripts are split on sentence ends, never after abbreviations or initials"""
+
+    def test_splits_on_sentence_punctuation(self):
+        text = "Tu ne vas pas le croire! Voici pourquoi ça marche. Et toi, tu testes quand?"
+        assert split_sentences(text, min_chars=1) == [
+            "Tu ne vas pas le croire!", "Voici pourquoi ça marche.", "Et toi, tu testes quand?"
+        ]
+
+    def test_abbreviations_and_initials_do_not_end_a_sentence(self):
+        text = "M. Dupont et le Dr. Martin en parlent. J. K. Rowling aussi, etc. sans fin."
+        assert split_sentences(text, min_chars=1) == [
+            "M. Dupont et le Dr. Martin en parlent.", "J. K. Rowling aussi, etc. sans fin."
+        ]
+
+    def test_short_fragments_join_the_next_sentence(self):
+        assert split_sentences("Stop. Regarde bien cette astuce incroyable.", min_chars=20) == [
+            "Stop. Regarde bien cette astuce incroyable."
+        ]
+
+    def test_short_tail_joins_the_previous_sentence(self):
+        assert split_sentences("Regarde bien cette astuce incroyable. Abonne-toi!", min_chars=20) == [
+            "Regarde bien cette astuce incroyable. Abonne-toi!"
+        ]
+
+    def test_empty_script(self):
+        assert split_sentences("   ") == []
+
+
+class TestAssembleSegments:
+    """Sentence audio is joined end to end and timings follow the assembled audio"""
+
+    def test_sentences_are_joined_without_gaps(self):
+        audio, timings = assemble_segments([("Une.", tone_mp3(1000)), ("Deux.", tone_mp3(500))])
+
+        assert [t["text"] for t in timings] == ["Une.", "Deux."]
+        assert timings[0]["start"] == 0.0
+        assert timings[1]["start"] == timings[0]["end"]
+        assert abs(decode_audio(audio).duration_seconds - timings[-1]["end"]) < 0.1
@@ -1,5 +1,9 @@
+import json
+import base64
 from bson import ObjectId
-from typing import Any, Dict, List
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
 
 def serialize_doc(doc: Dict) -> Dict:
     """Convertit un document MongoDB en dict JSON-serializable"""
@@ -22,3 +26,95 @@ def serialize_doc(doc: Dict) -> Dict:
 def serialize_docs(docs: List[Dict]) -> List[Dict]:
     """Convertit une liste de documents MongoDB"""
     return [serialize_doc(doc) for doc in docs]
+
+
+def get_database_name(mongo_url: str) -> str:
+    """Extrait le nom de la base depuis l'URL de connexion MongoDB"""
+    return urlparse(mongo_url).path.lstrip('/') or 'tiktok_automation'
+
+
+def _json_default(value: Any):
+    """Encode les types MongoDB/Python non gérés par json (datetime, ObjectId)"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Type non sérialisable: {type(value).__name__}")
+
+
+def encode_cursor(doc: Dict, sort_field: str) -> str:
+    """Construit un curseur opaque à partir des clés de tri du dernier document d'une page"""
+    value = doc.get(sort_field)
+    if isinstance(value, datetime):
+        value = {"$date": value.isoformat()}
+    raw = json.dumps([value, doc['_id']], default=_json_default)
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+# Valeurs acceptées dans un curseur: jamais de dict ni de liste (opérateurs de requête)
+CURSOR_SCALARS = (str, int, float, bool, type(None))
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, Any]:
+    """Décode un curseur produit par encode_cursor (ValueError si invalide)
+
+    Le curseur vient du client: seuls des scalaires et des dates ISO sont acceptés.
+    """
+    try:
+        value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError("Curseur invalide")
+    if isinstance(value, dict) and list(value) == ["$date"] and isinstance(value["$date"], str):
+        try:
+            value = datetime.fromisoformat(value["$date"])
+        except ValueError:
+            raise ValueError("Curseur invalide")
+    elif not isinstance(value, CURSOR_SCALARS):
+        raise ValueError("Curseur invalide")
+    if not isinstance(last_id, CURSOR_SCALARS):
+        raise ValueError("Curseur invalide")
+    return value, last_id
+
+
+def keyset_query(query: Dict, sort_field: str, cursor: str, direction: int = -1) -> Dict:
+    """Restreint la requête aux documents situés après le curseur dans l'ordre de tri"""
+    value, last_id = decode_cursor(cursor)
+    op = "$lt" if direction < 0 else "$gt"
+    return {"$and": [query, {"$or": [
+        {sort_field: {op: value}},
+        {sort_field: value, "_id": {op: last_id}}
+    ]}]}
+
+
+async def paginate(collection, query: Dict, sort_field: str, limit: int,
+                   cursor: Optional[str] = None, direction: int = -1) -> Tuple[List[Dict], Optional[str]]:
+    """Pagination par clé (keyset) sur (sort_field, _id)
+
+    Retourne les documents de la page et le curseur de la page suivante (None
+    s'il n'y en a plus). Le coût d'une page ne dépend pas de sa position.
+    """
+    if cursor:
+        query = keyset_query(query, sort_field, cursor, direction)
+
+    db_cursor = collection.find(query).sort([(sort_field, direction), ("_id", direction)]).limit(limit + 1)
+    docs = await db_cursor.to_list(length=limit + 1)
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1], sort_field)
+    return docs, next_cursor
+
+
+async def ndjson_stream(collection, query: Dict, sort_field: str, limit: int = 0,
+                        cursor: Optional[str] = None, direction: int = -1) -> AsyncIterator[bytes]:
+    """Produit les documents en NDJSON au fil du curseur Motor (mémoire constante)"""
+    if cursor:
+        query = keyset_query(query, sort_field, cursor, direction)
+
+    db_cursor = collection.find(query).sort([(sort_field, direction), ("_id", direction)])
+    if limit:
+        db_cursor = db_cursor.limit(limit)
+
+    async for doc in db_cursor:
+        yield (json.dumps(serialize_doc(doc), default=_json_default, ensure_ascii=False) + "\n").encode()
@@ -1,6 +1,8 @@
 import React, { useState, useEffect } from 'react';
 import { Sparkles, Loader, AlertCircle } from 'lucide-react';
-import { videosAPI, nichesAPI, learningAPI, API_BASE_URL } from '../services/api';
+import { videosAPI, nichesAPI, learningAPI, jobsAPI, API_BASE_URL } from '../services/api';
+
+const JOB_POLL_INTERVAL_MS = 3000;
 
 function VideoGenerator() {
   const [niches, setNiches] = useState([]);
@@ -11,9 +13,12 @@ function VideoGenerator() {
     niche: '',
     inspiration_url: '',
     tone: 'engageant',
-    voice: 'nova'
+    voice: 'nova',
+    render_profile: '',
+    candidates: 1
   });
   const [insights, setInsights] = useState(null);
+  const [jobStages, setJobStages] = useState({});
 
   useEffect(() => {
     loadNiches();
@@ -38,19 +43,38 @@ function VideoGenerator() {
     }
   };
 
+  const waitForJob = async (jobId) => {
+    // Interroge le job jusqu'à ce qu'il soit terminé ou en échec
+    while (true) {
+      await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+      const response = await jobsAPI.get(jobId);
+      const job = response.data;
+      setJobStages(job.stages || {});
+
+      if (job.status === 'completed') {
+        return job.result;
+      }
+      if (job.status === 'failed') {
+        throw new Error(job.error || 'Erreur lors de la génération de la vidéo');
+      }
+    }
+  };
+
   const handleGenerate = async (e) => {
     e.preventDefault();
     setGenerating(true);
     setResult(null);
+    setJobStages({});
 
     try {
       const response = await videosAPI.generate(formData);
-      setResult(response.data);
+      const jobResult = await waitForJob(response.data.job_id);
+      setResult(jobResult);
     } catch (error) {
       console.error('Error generating video:', error);
       setResult({
         error: true,
-        message: error.response?.data?.detail || 'Erreur lors de la génération de la vidéo'
+        message: error.response?.data?.detail || error.message || 'Erreur lors de la génération de la vidéo'
       });
     } finally {
       setGenerating(false);
@@ -74,6 +98,14 @@ function VideoGenerator() {
     { value: 'onyx', label: 'Onyx (Autoritaire)' }
   ];
 
+  const renderProfileOptions = [
+    { value: '', label: 'Aperçu rapide, rendu final à la demande' },
+    { value: 'production', label: 'Production (1080x1920)' },
+    { value: 'preview', label: 'Aperçu (540x960, rapide)' },
+    { value: 'draft', label: 'Brouillon (360x640, très rapide)' },
+    { value: 'thumbnail', label: 'Miniature seule' }
+  ];
+
   return (
     <div className="video-generator" data-testid="video-generator">
       <h1 className="text-4xl font-bold mb-8">
@@ -178,6 +210,38 @@ function VideoGenerator() {
               </select>
             </div>
 
+            <div className="form-group">
+              <label className="form-label">Qualité de rendu</label>
+              <select
+                className="form-select"
+                value={formData.render_profile}
+                onChange={(e) => setFormData({ ...formData, render_profile: e.target.value })}
+                disabled={generating}
+                data-testid="render-profile-select"
+              >
+                {renderProfileOptions.map(opt => (
+                  <option key={opt.value} value={opt.value}>{opt.label}</option>
+                ))}
+              </select>
+            </div>
+
+            <div className="form-group">
+              <label className="form-label">Scripts candidats</label>
+              <select
+                className="form-select"
+                value={formData.candidates}
+                onChange={(e) => setFormData({ ...formData, candidates: Number(e.target.value) })}
+                disabled={generating}
+                data-testid="candidates-select"
+              >
+                {[1, 3, 5].map(n => (
+                  <option key={n} value={n}>
+                    {n === 1 ? '1 script' : `${n} scripts, le meilleur est rendu`}
+                  </option>
+                ))}
+              </select>
+            </div>
+
             <button 
               type="submit" 
               className="btn btn-primary w-full mt-4"
@@ -210,6 +274,15 @@ function VideoGenerator() {
               <p className="text-sm text-gray-500 mt-2">
                 Cela peut prendre 1-2 minutes (script + images + voix + vidéo)
               </p>
+              {Object.keys(jobStages).length > 0 && (
+                <ul className="text-sm text-gray-400 mt-4 space-y-1" data-testid="job-stages">
+                  {Object.entries(jobStages).map(([stage, info]) => (
+                    <li key={stage}>
+                      {stage}: {info.status}
+                    </li>
+                  ))}
+                </ul>
+              )}
             </div>
           )}
 
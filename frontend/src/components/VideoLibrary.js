@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { Video, Trash2, Download, Eye } from 'lucide-react';
+import { Video, Trash2, Download, Eye, Sparkles } from 'lucide-react';
 import { videosAPI } from '../services/api';
 
 function VideoLibrary() {
@@ -39,6 +39,18 @@ function VideoLibrary() {
     }
   };
 
+  const handleFinalize = async (id) => {
+    try {
+      await videosAPI.finalize(id);
+      showMessage('Rendu final lancé', 'success');
+      setSelectedVideo(null);
+      loadVideos();
+    } catch (error) {
+      console.error('Error finalizing video:', error);
+      showMessage(error.response?.data?.detail || 'Erreur lors de la finalisation', 'error');
+    }
+  };
+
   const showMessage = (text, type) => {
     setMessage({ text, type });
     setTimeout(() => setMessage(null), 3000);
@@ -84,15 +96,29 @@ function VideoLibrary() {
               onClick={() => setSelectedVideo(video)}
               data-testid={`video-card-${video._id}`}
             >
-              {/* Thumbnail placeholder */}
-              <div className="bg-gradient-to-br from-gray-800 to-gray-900 aspect-[9/16] rounded-lg mb-4 flex items-center justify-center">
-                <Video size={48} className="text-gray-600" />
-              </div>
+              {video.thumbnail_path ? (
+                <img
+                  src={videosAPI.thumbnailUrl(video._id)}
+                  alt={video.title}
+                  loading="lazy"
+                  className="aspect-[9/16] w-full object-cover rounded-lg mb-4"
+                />
+              ) : (
+                /* Thumbnail placeholder */
+                <div className="bg-gradient-to-br from-gray-800 to-gray-900 aspect-[9/16] rounded-lg mb-4 flex items-center justify-center">
+                  <Video size={48} className="text-gray-600" />
+                </div>
+              )}
 
               <h3 className="font-semibold text-lg mb-2 line-clamp-2">{video.title}</h3>
 
               <div className="flex items-center justify-between text-sm mb-3">
                 <span className="badge badge-primary">{video.niche}</span>
+                {video.status !== 'completed' && (
+                  <span className="badge" data-testid={`video-status-${video._id}`}>
+                    {video.status === 'proxy' ? 'Aperçu' : 'Finalisation…'}
+                  </span>
+                )}
                 <span className="text-gray-400">{formatDate(video.created_at)}</span>
               </div>
 
@@ -152,6 +178,24 @@ function VideoLibrary() {
               </button>
             </div>
 
+            {selectedVideo.render_profile === 'thumbnail' ? (
+              /* Profil miniature seule: le fichier rendu est une image JPEG */
+              <img
+                src={videosAPI.streamUrl(selectedVideo._id)}
+                alt={selectedVideo.title}
+                className="w-full max-h-[50vh] object-contain rounded mb-6 bg-black"
+                data-testid="video-preview-image"
+              />
+            ) : (
+              <video
+                src={videosAPI.streamUrl(selectedVideo._id)}
+                controls
+                preload="metadata"
+                className="w-full max-h-[50vh] rounded mb-6 bg-black"
+                data-testid="video-preview"
+              />
+            )}
+
             <div className="grid grid-2 gap-6 mb-6">
               <div>
                 <div className="text-sm text-gray-400 mb-1">Niche</div>
@@ -204,6 +248,16 @@ function VideoLibrary() {
                 <Download size={20} />
                 Télécharger la Vidéo
               </a>
+              {selectedVideo.status === 'proxy' && (
+                <button
+                  onClick={() => handleFinalize(selectedVideo._id)}
+                  className="btn btn-secondary"
+                  data-testid="finalize-video-btn"
+                >
+                  <Sparkles size={20} />
+                  Rendu final
+                </button>
+              )}
               <button
                 onClick={() => handleDelete(selectedVideo._id)}
                 className="btn btn-secondary"
@@ -17,6 +17,7 @@ export { API_BASE_URL }; // Export pour utilisation dans les composants
 
 export const trendsAPI = {
   add: (data) => api.post('/trends', data),
+  bulk: (rows) => api.post('/trends/bulk', rows),
   list: (niche = null, limit = 50) => api.get('/trends', { params: { niche, limit } }),
   delete: (id) => api.delete(`/trends/${id}`),
 };
@@ -34,10 +35,22 @@ export const nichesAPI = {
 
 export const videosAPI = {
   generate: (data) => api.post('/videos/generate', data),
+  generateBatch: (data) => api.post('/videos/generate/batch', data),
   list: (niche = null, limit = 20) => api.get('/videos', { params: { niche, limit } }),
   get: (id) => api.get(`/videos/${id}`),
   delete: (id) => api.delete(`/videos/${id}`),
   downloadUrl: (id) => `${API_BASE_URL}/api/videos/${id}/download`,
+  streamUrl: (id) => `${API_BASE_URL}/api/videos/${id}/download?inline=true`,
+  thumbnailUrl: (id) => `${API_BASE_URL}/api/videos/${id}/thumbnail`,
+  finalize: (id) => api.post(`/videos/${id}/finalize`),
+};
+
+export const batchesAPI = {
+  get: (id) => api.get(`/batches/${id}`),
+};
+
+export const jobsAPI = {
+  get: (id) => api.get(`/jobs/${id}`),
 };
 
 export const learningAPI = {